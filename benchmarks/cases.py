@@ -0,0 +1,242 @@
+import itertools
+import json
+import random
+import tempfile
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+SRC_ASSETS_DIR = project_root / "src" / "assets"
+ASSETS_DIR = project_root / "assets"
+
+# Benchmark cases of the CPU hot paths. A case's setup(scale) prepares its input once, outside the timing,
+# and returns the function that is timed. "records" cases multiply the number of records by the scale,
+# "text" cases the length of the texts. Imports happen in setup: a case whose dependencies are missing is
+# reported as skipped, which fails the run when the case has a baseline (run_benchmarks.py).
+
+RECORDS = "records"
+TEXT = "text"
+SEED = 0
+# setup_qdrant loads the cl100k_base BPE file (a download) when it is imported. The text cases register a
+# byte-level stand-in under that name first: same pre-tokenization, no merges. They run offline and every
+# machine times the same encoding, its token counts are about 4x those of cl100k_base.
+TOKENIZER_ENCODING = "cl100k_base"
+CL100K_PATTERN = r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+
+
+class Case:
+    def __init__(self, name: str, setup, kind: str = RECORDS, max_scale: int | None = None, threshold: float | None = None, description: str = ""):
+        self.name = name
+        self.setup = setup
+        self.kind = kind
+        # None: every requested scale, otherwise larger scales are skipped (memory / run time)
+        self.max_scale = max_scale
+        # allowed slowdown against the baseline, None for the suite default
+        self.threshold = threshold
+        self.description = description
+
+
+_data = {}
+
+
+def load_asset(name: str)-> list[dict]:
+    if name not in _data:
+        with open(SRC_ASSETS_DIR / name if (SRC_ASSETS_DIR / name).exists() else ASSETS_DIR / name, 'r') as file:
+            _data[name] = json.load(file)
+    return _data[name]
+
+
+def scale_records(records: list[dict], scale: int, name_field: str | None = "name")-> list[dict]:
+    """`scale` copies of the records, copies get distinct names (and ids) so indexes and lookups see a bigger corpus"""
+    scaled = list(records)
+    for copy in range(1, scale):
+        for record in records:
+            record = dict(record)
+            if name_field and record.get(name_field):
+                record[name_field] = f"{record[name_field]} {copy}"
+            if "id" in record:
+                record["id"] = f"{record['id']}-{copy}"
+            scaled.append(record)
+    return scaled
+
+
+def scale_text(text: str | None, scale: int)-> str | None:
+    return " ".join([text] * scale) if text else text
+
+
+def longest_text(field: str = "biography")-> str:
+    return max((character.get(field) or "" for character in load_asset("lotr_characters.json")), key=len)
+
+
+def use_offline_tokenizer():
+    import tiktoken
+    import tiktoken.registry
+    tiktoken.registry.ENCODINGS[TOKENIZER_ENCODING] = tiktoken.Encoding(
+        name=f"{TOKENIZER_ENCODING}_bytes",
+        pat_str=CL100K_PATTERN,
+        mergeable_ranks={bytes([byte]): byte for byte in range(256)},
+        special_tokens={}
+    )
+
+
+def setup_truncate_text_smart(scale: int):
+    use_offline_tokenizer()
+    from setup_qdrant import truncate_text_smart, count_token
+    text = scale_text(longest_text(), scale)
+    # half of the text survives, so every scale walks and counts the same share of sentences
+    max_tokens = count_token(text) // 2
+    return lambda: truncate_text_smart(text=text, max_tokens=max_tokens)
+
+
+def setup_create_character_text_safe(scale: int):
+    use_offline_tokenizer()
+    from setup_qdrant import create_character_text_safe, MAX_TOKENS_PER_TEXT
+    characters = sorted(load_asset("lotr_characters.json"), key=lambda character: len(character.get("biography") or ""), reverse=True)[:20]
+    characters = [{**character, "biography": scale_text(character.get("biography"), scale), "history": scale_text(character.get("history"), scale)} for character in characters]
+    return lambda: [create_character_text_safe(character=character, max_tokens=MAX_TOKENS_PER_TEXT) for character in characters]
+
+
+def setup_build_token_batches(scale: int):
+    use_offline_tokenizer()
+    from setup_qdrant import build_token_batches, MAX_TOKENS_PER_BATCH
+    from composables.rate_limit import estimate_tokens
+    records = scale_records(load_asset("qdrant_records.json"), scale, name_field=None)
+    prepared_data = [{"id": record["id"], "text": record["payload"].get("embedded_text") or "", "token_count": record["payload"].get("token_count") or estimate_tokens(record["payload"].get("embedded_text"))} for record in records]
+    return lambda: build_token_batches(prepared_data=prepared_data, max_tokens_per_batch=MAX_TOKENS_PER_BATCH)
+
+
+def setup_format_hits_response(scale: int):
+    from composables.search import format_hits_response
+    records = scale_records(load_asset("qdrant_records.json"), scale, name_field=None)
+    # hits as search returned them before payloads were slimmed: large fields present, no content store lookup
+    hits = [{"id": record["id"], "score": 0.5, "biography": None, "history": None, **record["payload"]} for record in records]
+    hit_lists = [hits[start:start + 5] for start in range(0, len(hits), 5)]
+    return lambda: [format_hits_response(hits=hit_list) for hit_list in hit_lists]
+
+
+def synthetic_search_results(scale: int)-> list[dict]:
+    """One row per golden question with 5 results, the expected id at a random rank (or missing), scores descending"""
+    rng = random.Random(SEED)
+    golden_questions = scale_records(load_asset("golden_questions.json"), scale, name_field=None)
+    ids = [entry["id"] for entry in golden_questions]
+    rows = []
+    for entry in golden_questions:
+        for question in entry["questions"]:
+            results = [{"id": rng.choice(ids), "score": round(0.9 - rank * 0.1 + rng.uniform(-0.05, 0.05), 3)} for rank in range(5)]
+            rank = rng.randrange(7)
+            if rank < 5:
+                results[rank]["id"] = entry["id"]
+            rows.append({"id": entry["id"], "question": question, "search_results": results})
+    return rows
+
+
+def setup_filter_results(scale: int):
+    from retrieval_evaluation import filter_results
+    rows = synthetic_search_results(scale)
+    return lambda: filter_results(data=rows, filters={"limit": 3, "threshold": 0.6})
+
+
+def setup_make_relevance_matrix(scale: int):
+    from retrieval_evaluation import make_relevance_matrix
+    rows = synthetic_search_results(scale)
+    return lambda: make_relevance_matrix(data=rows)
+
+
+def setup_mrr(scale: int):
+    from retrieval_evaluation import make_relevance_matrix, mrr, hit_rate
+    relevance_total = make_relevance_matrix(data=synthetic_search_results(scale))
+    return lambda: (mrr(relevance_total=relevance_total), hit_rate(relevance_total=relevance_total))
+
+
+def name_queries(items: list[dict], count: int = 200)-> list[str]:
+    """Names as the scraper sees them: exact, different case / spacing, and with a typo"""
+    rng = random.Random(SEED)
+    names = [item["name"] for item in rng.sample(items, min(count, len(items))) if item.get("name")]
+    queries = []
+    for index, name in enumerate(names):
+        if index % 3 == 0:
+            queries.append(name)
+        elif index % 3 == 1:
+            queries.append(f"  {name.upper()} ")
+        else:
+            position = rng.randrange(len(name))
+            queries.append(name[:position] + "x" + name[position + 1:])
+    return queries
+
+
+def setup_normalize_name(scale: int):
+    from composables.name_index import normalize_name
+    names = [item["name"] for item in scale_records(load_asset("characters_detail.json"), scale) if item.get("name")]
+    return lambda: [normalize_name(name) for name in names]
+
+
+def setup_name_index_build(scale: int):
+    from composables.name_index import NameIndex
+    items = scale_records(load_asset("characters_detail.json"), scale)
+    return lambda: NameIndex(items=items, name_field="name")
+
+
+def setup_get_character_detail(scale: int):
+    # scrape_data builds its index from assets at import time, get_character_detail is index.resolve(name)["item"]
+    from composables.name_index import NameIndex
+    items = scale_records(load_asset("characters_detail.json"), scale)
+    index = NameIndex(items=items, name_field="name")
+    queries = name_queries(items)
+    return lambda: [index.resolve(query) for query in queries]
+
+
+_work_dir = None
+_file_numbers = itertools.count()
+
+
+def _temporary_path(suffix: str)-> Path:
+    global _work_dir
+    if _work_dir is None:
+        _work_dir = tempfile.TemporaryDirectory(prefix="lotr-bench-")
+    return Path(_work_dir.name) / f"data_{next(_file_numbers)}{suffix}"
+
+
+def cleanup():
+    """Remove the files written by the file cases"""
+    global _work_dir
+    if _work_dir is not None:
+        _work_dir.cleanup()
+        _work_dir = None
+
+
+def setup_save_json_file(scale: int):
+    from composables.files import save_json_file
+    records = scale_records(load_asset("qdrant_records.json"), scale, name_field=None)
+    path = _temporary_path(".json")
+    return lambda: save_json_file(file_path=path, data=records)
+
+
+def setup_open_json_file(scale: int):
+    from composables.files import save_json_file, open_json_file
+    path = _temporary_path(".json")
+    save_json_file(file_path=path, data=scale_records(load_asset("qdrant_records.json"), scale, name_field=None))
+    return lambda: open_json_file(file_path=path)
+
+
+def setup_jsonl_round_trip(scale: int):
+    from composables.files import save_jsonl_file, open_jsonl_file
+    records = scale_records(load_asset("qdrant_records.json"), scale, name_field=None)
+    path = _temporary_path(".jsonl")
+    return lambda: (save_jsonl_file(file_path=path, data=records), open_jsonl_file(file_path=path))
+
+
+CASES = [
+    Case("truncate_text_smart", setup_truncate_text_smart, kind=TEXT, description="longest biography, cut to half its tokens"),
+    Case("create_character_text_safe", setup_create_character_text_safe, kind=TEXT, description="20 longest characters"),
+    Case("build_token_batches", setup_build_token_batches, description="batching of upsert_to_qdrant_adaptive"),
+    Case("format_hits_response", setup_format_hits_response, description="every record, 5 hits per call"),
+    Case("filter_results", setup_filter_results, description="5 results per golden question"),
+    Case("make_relevance_matrix", setup_make_relevance_matrix),
+    Case("mrr", setup_mrr, description="mrr and hit_rate"),
+    Case("normalize_name", setup_normalize_name),
+    Case("name_index_build", setup_name_index_build),
+    Case("get_character_detail", setup_get_character_detail, description="200 exact, case / spacing and typo lookups"),
+    # a 100x qdrant_records.json is a 240 MB file, the file cases stop at 10x
+    Case("save_json_file", setup_save_json_file, max_scale=10, threshold=0.5),
+    Case("open_json_file", setup_open_json_file, max_scale=10, threshold=0.5),
+    Case("jsonl_round_trip", setup_jsonl_round_trip, max_scale=10, threshold=0.5)
+]
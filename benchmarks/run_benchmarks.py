@@ -0,0 +1,178 @@
+import argparse
+import contextlib
+import io
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "src"))
+# progress bars of the evaluation helpers would be timed too
+os.environ.setdefault("TQDM_DISABLE", "1")
+# modules of the benchmarked functions create their API clients when imported, the functions never call them
+for key in ("OPENAI_API_KEY", "JINA_API_KEY", "ANTHROPIC_API_KEY"):
+    os.environ.setdefault(key, "benchmark")
+from composables.files import open_json_file, save_json_file
+import cases
+
+# Micro-benchmarks of the CPU hot paths on src/assets and on 10x / 100x synthetic corpora.
+#   python benchmarks/run_benchmarks.py                       (compare with benchmarks/baselines.json, exit 1 on a regression)
+#   python benchmarks/run_benchmarks.py --only mrr --scales 1 10
+#   python benchmarks/run_benchmarks.py --update-baseline     (after an intended change, or on a new machine)
+# Baselines are machine specific, record them on the machine that runs the comparison.
+
+BASELINE_FILE_PATH = Path(__file__).resolve().parent / "baselines.json"
+RESULTS_DIR = project_root / ".cache" / "benchmarks"
+DEFAULT_SCALES = (1, 10, 100)
+# a case may take this much longer than its baseline before it counts as a regression
+DEFAULT_THRESHOLD = 0.25
+# run time growing faster than scale ** SUPERLINEAR_EXPONENT is reported
+SUPERLINEAR_EXPONENT = 1.3
+MIN_TIME = 0.2
+MIN_REPEATS = 3
+MAX_REPEATS = 50
+
+
+def result_key(name: str, scale: int)-> str:
+    return f"{name}@{scale}x"
+
+
+def measure(fn, min_time: float = MIN_TIME, min_repeats: int = MIN_REPEATS, max_repeats: int = MAX_REPEATS)-> list[float]:
+    """Durations of repeated calls, at least min_repeats of them (one when a call alone takes min_time) and min_time in total"""
+    durations = []
+    # what the functions print (e.g. "built N batches") is not part of the measurement
+    with contextlib.redirect_stdout(io.StringIO()):
+        while len(durations) < max_repeats:
+            start = time.perf_counter()
+            fn()
+            durations.append(time.perf_counter() - start)
+            enough_repeats = len(durations) >= min_repeats or durations[0] >= min_time
+            if enough_repeats and sum(durations) >= min_time:
+                break
+    return durations
+
+
+def run_case(case: cases.Case, scale: int)-> dict:
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn = case.setup(scale)
+    except Exception as e:
+        return {"status": "skipped", "reason": f"{type(e).__name__}: {str(e)}"}
+    durations = measure(fn)
+    return {
+        "status": "ok",
+        "median_ms": round(statistics.median(durations) * 1000, 4),
+        "min_ms": round(min(durations) * 1000, 4),
+        "repeats": len(durations)
+    }
+
+
+def growth_exponent(results: dict, name: str, scales: list[int])-> float | None:
+    """Slope of log(time) over log(scale) between the smallest and largest measured scale, 1 is linear"""
+    measured = [scale for scale in scales if results.get(result_key(name, scale), {}).get("status") == "ok"]
+    if len(measured) < 2:
+        return None
+    low, high = min(measured), max(measured)
+    low_ms, high_ms = results[result_key(name, low)]["median_ms"], results[result_key(name, high)]["median_ms"]
+    if low_ms <= 0 or high_ms <= 0:
+        return None
+    return math.log(high_ms / low_ms) / math.log(high / low)
+
+
+def compare(results: dict, baseline: dict, default_threshold: float)-> list[dict]:
+    thresholds = {case.name: case.threshold for case in cases.CASES}
+    rows = []
+    for key, result in results.items():
+        base = baseline.get("results", {}).get(key)
+        if result.get("status") != "ok" or base is None:
+            continue
+        name = key.split("@")[0]
+        threshold = thresholds.get(name) or default_threshold
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else None
+        rows.append({"key": key, "baseline_ms": base["median_ms"], "median_ms": result["median_ms"], "ratio": ratio, "threshold": threshold, "regression": ratio is not None and ratio > 1 + threshold})
+    return rows
+
+
+def environment()-> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(), "processor": platform.processor(), "system": platform.system()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU hot path micro-benchmarks with baselines and regression thresholds")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="corpus multipliers")
+    parser.add_argument("--only", nargs="+", default=None, help="case names to run")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown for cases without their own threshold")
+    parser.add_argument("--baseline", default=BASELINE_FILE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline instead of comparing")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = parser.parse_args()
+
+    selected = [case for case in cases.CASES if args.only is None or case.name in args.only]
+    if args.list or not selected:
+        for case in cases.CASES:
+            print(f"{case.name:<28} {case.kind:<8} {case.description}")
+        sys.exit(0 if args.list else 2)
+
+    scales = sorted(set(args.scales))
+    results = {}
+    print(f"{'case':<28} {'scale':>6} {'median ms':>11} {'min ms':>10} {'runs':>5}")
+    try:
+        for case in selected:
+            for scale in scales:
+                if case.max_scale is not None and scale > case.max_scale:
+                    continue
+                result = results[result_key(case.name, scale)] = run_case(case, scale)
+                if result["status"] == "ok":
+                    print(f"{case.name:<28} {scale:>5}x {result['median_ms']:>11.3f} {result['min_ms']:>10.3f} {result['repeats']:>5}")
+                else:
+                    print(f"{case.name:<28} {scale:>5}x skipped: {result['reason'][:100]}")
+    finally:
+        cases.cleanup()
+
+    for case in selected:
+        exponent = growth_exponent(results, case.name, scales)
+        if exponent is not None and exponent > SUPERLINEAR_EXPONENT:
+            print(f"super-linear: {case.name} grows like scale^{exponent:.2f}")
+
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "environment": environment(), "results": results}
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    save_json_file(file_path=RESULTS_DIR / f"benchmarks_{time.strftime('%Y%m%d_%H%M%S')}.json", data=report)
+
+    skipped = [key for key, result in results.items() if result["status"] != "ok"]
+    if args.update_baseline:
+        if skipped:
+            # a baseline missing a case would let that case be skipped silently afterwards
+            print(f"Baseline not updated, {len(skipped)} case(s) skipped: {', '.join(skipped)}")
+            sys.exit(1)
+        baseline = open_json_file(file_path=args.baseline) if Path(args.baseline).exists() else {"results": {}}
+        baseline["results"].update({key: {"median_ms": result["median_ms"]} for key, result in results.items() if result["status"] == "ok"})
+        baseline.update({"created_at": report["created_at"], "environment": report["environment"]})
+        save_json_file(file_path=args.baseline, data=baseline)
+        print(f"Baseline updated: {args.baseline}")
+        sys.exit(0)
+
+    if not Path(args.baseline).exists():
+        print(f"No baseline at {args.baseline}, run with --update-baseline to create one")
+        sys.exit(0)
+    baseline = open_json_file(file_path=args.baseline)
+    if baseline.get("environment") != report["environment"]:
+        print(f"Baseline recorded on {baseline.get('environment')}, timings may not be comparable")
+    rows = compare(results, baseline, default_threshold=args.threshold)
+    regressions = [row for row in rows if row["regression"]]
+    print(f"\n{'case':<36} {'baseline ms':>12} {'now ms':>10} {'change':>8}")
+    for row in rows:
+        print(f"{row['key']:<36} {row['baseline_ms']:>12.3f} {row['median_ms']:>10.3f} {row['ratio'] - 1:>+8.1%}{'  REGRESSION' if row['regression'] else ''}")
+    print(f"{len(regressions)} regression(s) out of {len(rows)} compared cases")
+    # a baselined case that could not run is not a pass
+    skipped_baselined = [key for key in skipped if key in baseline.get("results", {})]
+    if skipped_baselined:
+        print(f"{len(skipped_baselined)} case(s) with a baseline skipped: {', '.join(skipped_baselined)}")
+    unbaselined = [key for key, result in results.items() if result["status"] == "ok" and key not in baseline.get("results", {})]
+    if unbaselined:
+        print(f"No baseline for {', '.join(unbaselined)}, run with --update-baseline --only <case> to add one")
+    sys.exit(1 if regressions or skipped_baselined else 0)
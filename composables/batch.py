@@ -0,0 +1,283 @@
+"""
+Batch execution for large LLM runs (e.g. LLM-as-Judge over thousands of items).
+
+Every request is a plain dict:
+    {"custom_id": str, "model": str, "system_prompt": str, "user_prompt": str,
+     "temperature": float | None, "max_tokens": int | None}
+
+run_batch_job() writes the requests to a JSONL job file, submits it through a backend,
+polls until it finishes and returns {custom_id: response text | None}.
+A backend implements submit(job_file) -> job_id, poll(job_id) -> status and fetch_results(job_id).
+"""
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from composables.cache import llm_cache, make_cache_key
+
+
+JOB_IN_PROGRESS = "in_progress"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+def request_cache_key(request: dict)-> str:
+    """Same key llm() / llm_anthropic() use, so batch and interactive runs share the cache"""
+    extra = {"max_tokens": request["max_tokens"]} if request.get("max_tokens") is not None else {}
+    return make_cache_key(
+        model=request["model"],
+        temperature=request.get("temperature"),
+        system_prompt=request["system_prompt"],
+        user_prompt=request["user_prompt"],
+        **extra
+    )
+
+
+def write_job_file(file_path: str | Path, requests: list[dict]):
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, 'w') as file:
+        for request in requests:
+            file.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+
+def read_job_file(file_path: str | Path)-> list[dict]:
+    with open(file_path, 'r') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def file_digest(file_path: str | Path)-> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LocalBatchBackend:
+    """
+    File based stand-in for a provider batch API, used for testing and dry runs.
+    The job is processed in a background thread with `responder(request) -> str`,
+    results are written to <job>.output.jsonl next to the job file.
+    """
+    name = "local"
+
+    def __init__(self, responder: Callable[[dict], str]):
+        self.responder = responder
+        self._threads: dict[str, threading.Thread] = {}
+
+    def _output_path(self, job_id: str)-> Path:
+        return Path(job_id).with_suffix(".output.jsonl")
+
+    def _process(self, job_file: Path):
+        output_path = self._output_path(str(job_file))
+        tmp_path = output_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as output:
+            for request in read_job_file(job_file):
+                try:
+                    line = {"custom_id": request["custom_id"], "content": self.responder(request), "error": None}
+                except Exception as e:
+                    line = {"custom_id": request["custom_id"], "content": None, "error": f"{type(e).__name__}: {str(e)}"}
+                output.write(json.dumps(line, ensure_ascii=False) + "\n")
+        tmp_path.replace(output_path)
+
+    def submit(self, job_file: str | Path)-> str:
+        job_id = str(Path(job_file))
+        # drop the output of a previous job written to the same file
+        self._output_path(job_id).unlink(missing_ok=True)
+        thread = threading.Thread(target=self._process, args=(Path(job_file),), daemon=True)
+        thread.start()
+        self._threads[job_id] = thread
+        return job_id
+
+    def poll(self, job_id: str)-> str:
+        if self._output_path(job_id).exists():
+            return JOB_COMPLETED
+        thread = self._threads.get(job_id)
+        if thread is not None and thread.is_alive():
+            return JOB_IN_PROGRESS
+        # the thread may have written the output between the first check and is_alive()
+        return JOB_COMPLETED if self._output_path(job_id).exists() else JOB_FAILED
+
+    def fetch_results(self, job_id: str)-> dict[str, str | None]:
+        results = {}
+        for line in read_job_file(self._output_path(job_id)):
+            if line.get("error"):
+                print(f"Request {line['custom_id']} failed: {line['error']}")
+            results[line["custom_id"]] = line.get("content")
+        return results
+
+
+class OpenAIBatchBackend:
+    """Submits jobs to the OpenAI Batch API (/v1/chat/completions, 24h completion window)"""
+    name = "openai"
+
+    def __init__(self, client=None):
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI()
+        self.client = client
+
+    def submit(self, job_file: str | Path)-> str:
+        job_file = Path(job_file)
+        upload_path = job_file.with_suffix(".openai.jsonl")
+        with open(upload_path, 'w') as upload:
+            for request in read_job_file(job_file):
+                body = {
+                    "model": request["model"],
+                    "messages": [
+                        {"role": "system", "content": request["system_prompt"]},
+                        {"role": "user", "content": request["user_prompt"]}
+                    ]
+                }
+                if request.get("temperature") is not None:
+                    body["temperature"] = request["temperature"]
+                if request.get("max_tokens") is not None:
+                    body["max_tokens"] = request["max_tokens"]
+                line = {"custom_id": request["custom_id"], "method": "POST", "url": "/v1/chat/completions", "body": body}
+                upload.write(json.dumps(line, ensure_ascii=False) + "\n")
+        with open(upload_path, 'rb') as upload:
+            input_file = self.client.files.create(file=upload, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+
+    def poll(self, job_id: str)-> str:
+        batch = self.client.batches.retrieve(job_id)
+        if batch.status == "completed":
+            return JOB_COMPLETED
+        if batch.status in ("failed", "expired", "cancelled"):
+            # expired batches may still carry partial results
+            return JOB_COMPLETED if batch.output_file_id else JOB_FAILED
+        return JOB_IN_PROGRESS
+
+    def fetch_results(self, job_id: str)-> dict[str, str | None]:
+        batch = self.client.batches.retrieve(job_id)
+        results = {}
+        if batch.output_file_id:
+            content = self.client.files.content(batch.output_file_id).text
+            for raw_line in content.splitlines():
+                if not raw_line.strip():
+                    continue
+                line = json.loads(raw_line)
+                response = line.get("response") or {}
+                if response.get("status_code") == 200:
+                    results[line["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+                else:
+                    print(f"Request {line['custom_id']} failed: {line.get('error') or response.get('status_code')}")
+                    results[line["custom_id"]] = None
+        if batch.error_file_id:
+            content = self.client.files.content(batch.error_file_id).text
+            for raw_line in content.splitlines():
+                if raw_line.strip():
+                    line = json.loads(raw_line)
+                    print(f"Request {line['custom_id']} failed: {line.get('error')}")
+                    results.setdefault(line["custom_id"], None)
+        return results
+
+
+class AnthropicBatchBackend:
+    """Submits jobs to the Anthropic Message Batches API"""
+    name = "anthropic"
+
+    def __init__(self, client=None):
+        if client is None:
+            from anthropic import Anthropic
+            client = Anthropic()
+        self.client = client
+
+    def submit(self, job_file: str | Path)-> str:
+        batch_requests = []
+        for request in read_job_file(job_file):
+            params = {
+                "model": request["model"],
+                "max_tokens": request.get("max_tokens") or 1024,
+                "system": request["system_prompt"],
+                "messages": [{"role": "user", "content": request["user_prompt"]}]
+            }
+            if request.get("temperature") is not None:
+                params["temperature"] = request["temperature"]
+            batch_requests.append({"custom_id": request["custom_id"], "params": params})
+        batch = self.client.messages.batches.create(requests=batch_requests)
+        return batch.id
+
+    def poll(self, job_id: str)-> str:
+        batch = self.client.messages.batches.retrieve(job_id)
+        return JOB_COMPLETED if batch.processing_status == "ended" else JOB_IN_PROGRESS
+
+    def fetch_results(self, job_id: str)-> dict[str, str | None]:
+        results = {}
+        for entry in self.client.messages.batches.results(job_id):
+            if entry.result.type == "succeeded":
+                results[entry.custom_id] = entry.result.message.content[0].text
+            else:
+                print(f"Request {entry.custom_id} failed: {entry.result.type}")
+                results[entry.custom_id] = None
+        return results
+
+
+def run_batch_job(requests: list[dict], backend, job_dir: str | Path, job_name: str = "batch_job", poll_interval: float = 30.0, use_cache: bool = True)-> dict[str, str | None]:
+    """
+    Run requests through a batch backend and return {custom_id: response text | None}.
+    Requests already present in the LLM cache are answered from it and not submitted,
+    new responses are written back to the cache.
+    The submitted job id is stored in <job_name>.job.json so an interrupted run resumes polling
+    the same job instead of submitting it again.
+    """
+    job_dir = Path(job_dir)
+    results = {}
+    pending = []
+    for request in requests:
+        cached = llm_cache.get(request_cache_key(request)) if use_cache else None
+        if cached is not None:
+            results[request["custom_id"]] = cached
+        else:
+            pending.append(request)
+    print(f"{len(results)} requests answered from cache, {len(pending)} to submit")
+    if not pending:
+        return results
+
+    job_file = job_dir / f"{job_name}.jsonl"
+    meta_file = job_dir / f"{job_name}.job.json"
+    write_job_file(file_path=job_file, requests=pending)
+    digest = file_digest(job_file)
+
+    job_id = None
+    if meta_file.exists():
+        with open(meta_file, 'r') as file:
+            meta = json.load(file)
+        if meta.get("backend") == backend.name and meta.get("digest") == digest:
+            job_id = meta["job_id"]
+            print(f"Resuming batch job {job_id}")
+    if job_id is None:
+        job_id = backend.submit(job_file)
+        with open(meta_file, 'w') as file:
+            json.dump({"backend": backend.name, "digest": digest, "job_id": job_id, "submitted_at": time.time()}, file, indent=2)
+        print(f"Submitted batch job {job_id} with {len(pending)} requests")
+
+    status = backend.poll(job_id)
+    while status == JOB_IN_PROGRESS:
+        time.sleep(poll_interval)
+        status = backend.poll(job_id)
+    if status == JOB_FAILED:
+        meta_file.unlink(missing_ok=True)
+        raise RuntimeError(f"Batch job {job_id} failed")
+
+    job_results = backend.fetch_results(job_id)
+    pending_by_id = {request["custom_id"]: request for request in pending}
+    for custom_id, content in job_results.items():
+        request = pending_by_id.get(custom_id)
+        if request is None:
+            continue
+        results[custom_id] = content
+        if use_cache and content is not None:
+            llm_cache.set(request_cache_key(request), content, model=request["model"])
+    meta_file.unlink(missing_ok=True)
+    return results
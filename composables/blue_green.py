@@ -0,0 +1,238 @@
+"""
+Blue/green rebuilds of a Qdrant collection behind an alias.
+
+Readers only ever use the alias name (e.g. 'lotr-characters'). A rebuild goes into a new versioned
+collection ('lotr-characters-v20250101120000'), is validated (point count, golden queries) while the
+live version keeps serving, and the alias is then moved to it in one atomic alias update. The previous
+version stays around for rollback, older ones are deleted (KEEP_COLLECTION_VERSIONS). A collection created
+before aliases is copied to the oldest version name before it makes room for the alias, its single unnamed
+vector becomes the "full" and "small" named vectors searches use (composables/vectors.py).
+
+With a content store (composables/content_store.py) every version has its own content: moving the alias
+also makes that version's content live, and deleted or rejected versions take their content with them.
+"""
+
+import re
+import time
+import uuid
+from os import environ
+
+from qdrant_client import QdrantClient, models
+
+from composables.content_store import ContentStore
+from composables.vectors import named_vectors, query_arguments, vectors_config
+
+KEEP_COLLECTION_VERSIONS = int(environ.get('KEEP_COLLECTION_VERSIONS', 2))
+VALIDATION_SAMPLE_SIZE = int(environ.get('VALIDATION_SAMPLE_SIZE', 20))
+VALIDATION_MIN_HIT_RATE = float(environ.get('VALIDATION_MIN_HIT_RATE', 0.5))
+# a new version may score this much below the live one on the sampled golden queries
+VALIDATION_HIT_RATE_TOLERANCE = 0.1
+VALIDATION_TOP_K = 5
+VERSION_FORMAT = "%Y%m%d%H%M%S"
+# a collection created before blue/green rebuilds becomes the oldest version, lotr-characters-v19700101000000
+LEGACY_VERSION_TIMESTAMP = 0
+MIGRATION_BATCH_SIZE = 256
+
+
+class ValidationError(Exception):
+    pass
+
+
+def version_name(alias: str, timestamp: float | None = None)-> str:
+    return f"{alias}-v{time.strftime(VERSION_FORMAT, time.gmtime(timestamp))}"
+
+
+def collection_versions(client: QdrantClient, alias: str)-> list[str]:
+    """Versioned collections of an alias, oldest first"""
+    pattern = re.compile(rf"^{re.escape(alias)}-v\d{{14}}$")
+    return sorted(collection.name for collection in client.get_collections().collections if pattern.match(collection.name))
+
+
+def alias_target(client: QdrantClient, alias: str)-> str | None:
+    """Collection the alias points to, None when there is no such alias"""
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+
+def vector_schema(client: QdrantClient, collection_name: str)-> dict[str, str]:
+    """{vector name: "<size>d <distance>"} of a collection, a single unnamed vector is named ''"""
+    vectors = client.get_collection(collection_name=collection_name).config.params.vectors
+    if isinstance(vectors, models.VectorParams):
+        vectors = {'': vectors}
+    return {name: f"{params.size}d {models.Distance(params.distance).value}" for name, params in (vectors or {}).items()}
+
+
+def migrate_legacy_collection(client: QdrantClient, alias: str, store: ContentStore | None = None)-> str | None:
+    """
+    Copy a collection created before blue/green rebuilds, which holds the alias name, into the oldest version
+    name (LEGACY_VERSION_TIMESTAMP) so it can make room for the alias and stays there for rollback.
+    A single unnamed vector is copied as the named vectors of composables/vectors.py, so searches work on the
+    copy after a rollback. The live content goes with it. Returns the version name, None when there is nothing
+    to migrate. The collection itself is left as it is.
+    """
+    if alias_target(client, alias) is not None or not client.collection_exists(collection_name=alias):
+        return None
+    legacy_version = version_name(alias, LEGACY_VERSION_TIMESTAMP)
+    params = client.get_collection(collection_name=alias).config.params
+    unnamed = isinstance(params.vectors, models.VectorParams)
+    if not client.collection_exists(collection_name=legacy_version):
+        vectors = vectors_config(full_dimension=params.vectors.size) if unnamed else params.vectors
+        client.create_collection(collection_name=legacy_version, vectors_config=vectors, sparse_vectors_config=params.sparse_vectors, on_disk_payload=params.on_disk_payload)
+    offset = None
+    while True:
+        records, offset = client.scroll(collection_name=alias, limit=MIGRATION_BATCH_SIZE, offset=offset, with_payload=True, with_vectors=True)
+        if records:
+            client.upsert(collection_name=legacy_version, points=[models.PointStruct(id=record.id, vector=named_vectors(record.vector) if unnamed else record.vector, payload=record.payload) for record in records])
+        if offset is None:
+            break
+    expected, copied = client.count(collection_name=alias, exact=True).count, client.count(collection_name=legacy_version, exact=True).count
+    if copied != expected:
+        raise RuntimeError(f"copied {copied} of {expected} points of {alias} to {legacy_version}, {alias} is left in place")
+    if store is not None:
+        store.snapshot_version(legacy_version)
+    print(f"Migrated the collection {alias} to {legacy_version} ({copied} points)")
+    return legacy_version
+
+
+def switch_alias(client: QdrantClient, alias: str, collection_name: str, store: ContentStore | None = None):
+    """
+    Point the alias to collection_name in one alias update, readers see either the old or the new collection, never none.
+    With a store, the content of collection_name becomes the live content right after.
+    """
+    legacy_version = migrate_legacy_collection(client, alias, store=store)
+    operations = []
+    if alias_target(client, alias) is not None:
+        operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+    operations.append(models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=collection_name, alias_name=alias)))
+    if legacy_version is None:
+        client.update_collection_aliases(change_aliases_operations=operations)
+    else:
+        # an alias cannot take the name of an existing collection: the migrated copy is safe, the legacy collection
+        # is dropped right before the alias is created, searches fail for the time between the two calls only
+        client.delete_collection(collection_name=alias)
+        try:
+            client.update_collection_aliases(change_aliases_operations=operations)
+        except Exception:
+            client.update_collection_aliases(change_aliases_operations=[models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=legacy_version, alias_name=alias))])
+            print(f"Alias {alias} -> {legacy_version} (the migrated collection), switching to {collection_name} failed")
+            raise
+    print(f"Alias {alias} -> {collection_name}")
+    if store is not None and not store.activate_version(collection_name):
+        print(f"{collection_name} has no content of its own ({store.version_path(collection_name)}), the live content is left as it is")
+
+
+def live_collection(client: QdrantClient, alias: str)-> str | None:
+    """Collection readers of `alias` get: the alias target, or a collection created before blue/green rebuilds under that name"""
+    target = alias_target(client, alias)
+    if target is None and client.collection_exists(collection_name=alias):
+        return alias
+    return target
+
+
+def missing_probe_ids(client: QdrantClient, collection_name: str, probes: list[dict])-> list[str]:
+    """Expected ids of the probes that are not points of the collection, golden questions referring to ids a rebuild did not keep"""
+    expected = [str(probe["id"]) for probe in probes]
+    found = {uuid.UUID(str(point.id)) for point in client.retrieve(collection_name=collection_name, ids=expected, with_payload=False, with_vectors=False)}
+    return [point_id for point_id in expected if uuid.UUID(point_id) not in found]
+
+
+def probe_hit_rate(client: QdrantClient, collection_name: str, probes: list[dict], limit: int = VALIDATION_TOP_K)-> float:
+    """
+    Share of probes ({"id", "embedding"}) whose expected point is in the top `limit` results.
+    A collection with a single unnamed vector (created before named vectors) is searched on that vector.
+    """
+    if not probes:
+        return 0.0
+    unnamed = '' in vector_schema(client, collection_name=collection_name)
+    hits = 0
+    for probe in probes:
+        arguments = {"query": probe["embedding"]} if unnamed else query_arguments(embedding=probe["embedding"], limit=limit)
+        response = client.query_points(collection_name=collection_name, **arguments, limit=limit, with_payload=False)
+        expected = uuid.UUID(str(probe["id"]))
+        hits += any(uuid.UUID(str(point.id)) == expected for point in response.points)
+    return hits / len(probes)
+
+
+def validate_version(client: QdrantClient, alias: str, collection_name: str, expected_points: int, probes: list[dict] | None = None, min_hit_rate: float = VALIDATION_MIN_HIT_RATE)-> dict:
+    """
+    Checks a new version before it goes live, raises ValidationError with every failed check.
+    An empty version never passes, whatever expected_points says.
+    Golden query probes must reach min_hit_rate and stay within VALIDATION_HIT_RATE_TOLERANCE of the live version.
+    """
+    points = client.count(collection_name=collection_name, exact=True).count
+    report = {"collection": collection_name, "points": points, "expected_points": expected_points}
+    failures = []
+    if points == 0:
+        failures.append("no points")
+    elif points != expected_points:
+        failures.append(f"{points} points instead of {expected_points}")
+    if probes:
+        report["hit_rate"] = probe_hit_rate(client, collection_name=collection_name, probes=probes)
+        live = live_collection(client, alias)
+        if live is not None:
+            report["live_collection"] = live
+            report["live_hit_rate"] = probe_hit_rate(client, collection_name=live, probes=probes)
+        missing = missing_probe_ids(client, collection_name=collection_name, probes=probes)
+        if missing:
+            report["missing_probe_ids"] = missing
+            failures.append(f"{len(missing)} of {len(probes)} golden query ids are not points of {collection_name}, e.g. {missing[0]} (point ids changed?)")
+        if report["hit_rate"] < min_hit_rate:
+            failures.append(f"hit rate {report['hit_rate']:.2f} on {len(probes)} golden queries is below {min_hit_rate:.2f}")
+        if live is not None and report["hit_rate"] < report["live_hit_rate"] - VALIDATION_HIT_RATE_TOLERANCE:
+            failures.append(f"hit rate {report['hit_rate']:.2f} is below the live version's {report['live_hit_rate']:.2f}")
+    if failures:
+        raise ValidationError(f"{collection_name}: " + "; ".join(failures))
+    return report
+
+
+def garbage_collect(client: QdrantClient, alias: str, keep: int = KEEP_COLLECTION_VERSIONS, store: ContentStore | None = None)-> list[str]:
+    """Delete versions older than the live one and the keep - 1 before it, returns the deleted names"""
+    versions = collection_versions(client, alias)
+    live = alias_target(client, alias)
+    if live not in versions:
+        return []
+    # versions newer than the live one may be rebuilds in progress, they are left alone
+    deleted = versions[:max(versions.index(live) - max(keep, 1) + 1, 0)]
+    for name in deleted:
+        client.delete_collection(collection_name=name)
+        if store is not None:
+            store.drop_version(name)
+        print(f"Deleted old version {name}")
+    return deleted
+
+
+def publish_version(client: QdrantClient, alias: str, collection_name: str, expected_points: int, probes: list[dict] | None = None, keep: int = KEEP_COLLECTION_VERSIONS, min_hit_rate: float = VALIDATION_MIN_HIT_RATE, store: ContentStore | None = None)-> dict:
+    """
+    Validate, switch the alias (and the live content of `store`), garbage collect.
+    A version that fails validation, or that validation fails on, is deleted with its content and the alias is not touched.
+    """
+    try:
+        report = validate_version(client, alias=alias, collection_name=collection_name, expected_points=expected_points, probes=probes, min_hit_rate=min_hit_rate)
+    except Exception:
+        client.delete_collection(collection_name=collection_name)
+        if store is not None:
+            store.drop_version(collection_name)
+        print(f"Deleted {collection_name}, {alias} still points to {live_collection(client, alias)}")
+        raise
+    switch_alias(client, alias=alias, collection_name=collection_name, store=store)
+    report["deleted_versions"] = garbage_collect(client, alias=alias, keep=keep, store=store)
+    return report
+
+
+def rollback(client: QdrantClient, alias: str, store: ContentStore | None = None)-> str:
+    """
+    Point the alias (and the live content of `store`) back to the version before the live one, returns its name.
+    A version whose vectors differ from the live one's is refused, searches of the alias would fail on it.
+    """
+    versions = collection_versions(client, alias)
+    live = alias_target(client, alias)
+    if live not in versions or versions.index(live) == 0:
+        raise ValueError(f"No version of {alias} older than {live} to roll back to")
+    previous = versions[versions.index(live) - 1]
+    previous_schema, live_schema = vector_schema(client, collection_name=previous), vector_schema(client, collection_name=live)
+    if previous_schema != live_schema:
+        raise ValueError(f"{previous} has the vectors {previous_schema}, not those of {live} ({live_schema}), {alias} is left on {live}")
+    switch_alias(client, alias=alias, collection_name=previous, store=store)
+    return previous
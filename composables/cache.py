@@ -0,0 +1,115 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from os import environ
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+
+DEFAULT_CACHE_PATH = environ.get('LLM_CACHE_PATH') or project_root / ".cache" / "llm_cache.sqlite"
+CACHE_DISABLED = environ.get('LLM_CACHE_DISABLED', '').lower() in ('1', 'true', 'yes')
+DEFAULT_EMBEDDING_CACHE_PATH = environ.get('EMBEDDING_CACHE_PATH') or project_root / ".cache" / "embedding_cache.sqlite"
+
+
+def make_cache_key(model: str, temperature: float | None, system_prompt: str, user_prompt: str, **params)-> str:
+    """
+    Content-addressed key for a completion.
+    Any change in model, temperature, prompts or extra params gives a new key.
+    """
+    key_data = {
+        "model": model,
+        "temperature": temperature,
+        "system_prompt": system_prompt,
+        "user_prompt": user_prompt,
+        **params
+    }
+    raw_key = json.dumps(key_data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent key/value store for LLM responses.
+    Values are zlib compressed and kept in a single sqlite file.
+    """
+    def __init__(self, path: str | Path = DEFAULT_CACHE_PATH, enabled: bool = not CACHE_DISABLED):
+        self.path = Path(path)
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self)-> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    value BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                ) WITHOUT ROWID
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str)-> str | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def set(self, key: str, value: str, model: str | None = None):
+        if not self.enabled or value is None:
+            return
+        compressed = zlib.compress(value.encode('utf-8'), 6)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, created_at) VALUES (?, ?, ?, ?)",
+                (key, model, compressed, time.time())
+            )
+            conn.commit()
+            self.writes += 1
+
+    def count(self)-> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+            conn.execute("VACUUM")
+
+    def stats(self)-> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self.count() if self.enabled else 0
+        }
+
+
+llm_cache = ResponseCache()
+# last good embedding of every text, used as a fallback when the embedding provider is down
+embedding_cache = ResponseCache(path=DEFAULT_EMBEDDING_CACHE_PATH)
+
+
+def print_cache_stats(cache: ResponseCache = llm_cache):
+    stats = cache.stats()
+    print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses (hit rate {stats['hit_rate']:.1%}), {stats['entries']} entries stored at {cache.path}")
@@ -0,0 +1,173 @@
+"""
+Local store for the large text fields of qdrant points.
+
+Qdrant payloads only keep the small fields (name, race, realm...). Biography, history and the embedded
+text live here, keyed by point id, zlib compressed JSON in one sqlite file. Searches ask Qdrant for the
+fields they need (projection), and only the hits that end up in a prompt are hydrated from this store.
+
+A blue/green rebuild (composables/blue_green.py) writes its content to a store of its own collection version
+(for_version), the live store is only replaced by it when the alias moves to that version, and the file
+stays next to its collection for rollback.
+"""
+
+import json
+import sqlite3
+import threading
+import uuid
+import zlib
+from os import environ
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+
+DEFAULT_CONTENT_STORE_PATH = environ.get('CONTENT_STORE_PATH') or project_root / ".cache" / "content_store.sqlite"
+# fields kept out of the qdrant payload
+LARGE_FIELDS = ("biography", "history", "embedded_text")
+# fields that go into a prompt
+CONTEXT_FIELDS = ("biography", "history")
+# payload fields returned by default, enough to show and format a hit
+SUMMARY_FIELDS = ('name', 'race', 'gender', 'realm', 'culture', 'birth', 'death', 'spouse', 'hair', 'height')
+SQLITE_MAX_VARIABLES = 900
+
+
+def content_key(point_id)-> str:
+    """Qdrant returns uuid ids dashed whatever form they were upserted in, both map to the same key"""
+    try:
+        return str(uuid.UUID(str(point_id)))
+    except ValueError:
+        return str(point_id)
+
+
+class ContentStore:
+    def __init__(self, path: str | Path = DEFAULT_CONTENT_STORE_PATH):
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self)-> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS content (
+                    point_id TEXT PRIMARY KEY,
+                    value BLOB NOT NULL
+                ) WITHOUT ROWID
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def put_many(self, records: dict[str, dict]):
+        """{point_id: {field: text}}, replaces what was stored for these ids"""
+        rows = [(content_key(point_id), zlib.compress(json.dumps(fields, ensure_ascii=False).encode('utf-8'), 6)) for point_id, fields in records.items()]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO content (point_id, value) VALUES (?, ?)", rows)
+            conn.commit()
+
+    def get_many(self, point_ids: list[str], fields: tuple[str, ...] = CONTEXT_FIELDS)-> dict[str, dict]:
+        """{point_id: {field: text}} for the ids found, limited to `fields`"""
+        point_ids = list(dict.fromkeys(content_key(point_id) for point_id in point_ids))
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(point_ids), SQLITE_MAX_VARIABLES):
+                chunk = point_ids[start:start + SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(chunk))
+                for point_id, value in conn.execute(f"SELECT point_id, value FROM content WHERE point_id IN ({placeholders})", chunk):
+                    stored = json.loads(zlib.decompress(value).decode('utf-8'))
+                    found[point_id] = {field: stored.get(field) for field in fields}
+            self.hits += len(found)
+            self.misses += len(point_ids) - len(found)
+        return found
+
+    def count(self)-> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM content").fetchone()[0]
+
+    def backup(self, path: str | Path):
+        """Consistent copy of the store to `path` (sqlite online backup)"""
+        with self._lock:
+            target = sqlite3.connect(path)
+            try:
+                self._connect().backup(target)
+            finally:
+                target.close()
+
+    def restore(self, path: str | Path):
+        """Replace the whole store with the backup at `path`"""
+        with self._lock:
+            source = sqlite3.connect(path)
+            try:
+                source.backup(self._connect())
+            finally:
+                source.close()
+
+    def version_path(self, collection_name: str)-> Path:
+        """Content of one collection version: content_store.sqlite -> content_store_versions/<collection>.sqlite"""
+        return self.path.parent / f"{self.path.stem}_versions" / f"{collection_name}.sqlite"
+
+    def for_version(self, collection_name: str)-> "ContentStore":
+        return ContentStore(path=self.version_path(collection_name))
+
+    def snapshot_version(self, collection_name: str):
+        """Keep the live content as the content of `collection_name`"""
+        path = self.version_path(collection_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.backup(path)
+
+    def restore_version(self, collection_name: str, path: str | Path):
+        """The backup at `path` becomes the content of `collection_name`, the live content is not touched"""
+        version_store = self.for_version(collection_name)
+        try:
+            version_store.restore(path)
+        finally:
+            version_store.close()
+
+    def activate_version(self, collection_name: str)-> bool:
+        """Replace the live content with that of `collection_name`, False (live content unchanged) when it has none"""
+        path = self.version_path(collection_name)
+        if not path.is_file():
+            return False
+        self.restore(path)
+        return True
+
+    def drop_version(self, collection_name: str):
+        self.version_path(collection_name).unlink(missing_ok=True)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM content")
+            conn.commit()
+
+
+content_store = ContentStore()
+
+
+def split_payload(record: dict)-> tuple[dict, dict]:
+    """(slim qdrant payload, large fields for the content store)"""
+    payload = {field: value for field, value in record.items() if field not in LARGE_FIELDS}
+    content = {field: record[field] for field in LARGE_FIELDS if record.get(field) is not None}
+    return payload, content
+
+
+def hydrate(hits: list[dict], fields: tuple[str, ...] = CONTEXT_FIELDS, store: ContentStore = content_store)-> list[dict]:
+    """
+    Copies of the hits with `fields` filled in from the content store, in one lookup.
+    Hits that already carry the fields (results saved before payloads were slimmed) and passage-level hits,
+    whose context is their passages, are left as they are.
+    """
+    missing_ids = [hit["id"] for hit in hits if "passages" not in hit and any(field not in hit for field in fields)]
+    if not missing_ids:
+        return hits
+    content = store.get_many(point_ids=missing_ids, fields=fields)
+    return [{**content.get(content_key(hit["id"]), {}), **hit} for hit in hits]
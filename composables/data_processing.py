@@ -1,14 +1,16 @@
-def format_list_in_batch(data: list, batch_size:int = 100)-> list[list]:
-    total_entries = len(data)
-    print(f"Total entries: {total_entries}")
-    batch_idx = []
-    for batch_num in range(0, total_entries, batch_size):
-        batch_end = min(batch_num + batch_size, total_entries)
-        batch_idx.append([batch_num, batch_end])
-    
-    formatted_data = []
-    for batch in batch_idx:
-        batched_data = data[batch[0]:batch[1]]
-        formatted_data.append(batched_data)
-        
-    return formatted_data
\ No newline at end of file
+from itertools import islice
+from typing import Iterable, Iterator
+
+def format_list_in_batch(data: Iterable, batch_size:int = 100)-> Iterator[list]:
+    """
+    Lazily yield consecutive batches of at most batch_size items.
+    Works on any iterable, slices are only built when requested.
+    """
+    if hasattr(data, '__len__'):
+        print(f"Total entries: {len(data)}")
+    iterator = iter(data)
+    while True:
+        batched_data = list(islice(iterator, batch_size))
+        if not batched_data:
+            return
+        yield batched_data
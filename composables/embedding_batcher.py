@@ -0,0 +1,191 @@
+"""
+Cross-request micro-batching of query embeddings.
+
+Concurrent callers of embed_one() are queued for at most max_wait_ms (counted from the oldest queued
+text) or until max_batch_size texts / max_batch_tokens estimated tokens are waiting, then sent to Jina
+as one request with a list `input`. Every caller gets its own vector back. Identical texts in a batch are
+embedded once. Under load one request per batch instead of one per query keeps the requests/min limit
+from becoming the bottleneck, a lone caller pays at most max_wait_ms of extra latency.
+
+The client must not use late chunking: with it Jina embeds all inputs of a request as one context,
+so a query's vector would depend on the other queries it was batched with.
+
+Every queued future is completed, with the vector or with the error of its batch. At most max_in_flight
+batches are sent at a time, later ones wait for a free slot. A caller's timeout (the client deadline by
+default) starts when its batch is sent, so waiting behind other batches never times it out.
+
+Configuration: EMBEDDING_BATCH_WAIT_MS, EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_TOKENS.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from os import environ
+
+from composables.embedding_client import EmbeddingClient, EmbeddingError, LatencyTracker
+from composables.rate_limit import estimate_tokens
+from composables.tracing import span
+
+DEFAULT_MAX_WAIT_MS = float(environ.get('EMBEDDING_BATCH_WAIT_MS', 5))
+DEFAULT_MAX_BATCH_SIZE = int(environ.get('EMBEDDING_BATCH_SIZE', 32))
+DEFAULT_MAX_BATCH_TOKENS = int(environ.get('EMBEDDING_BATCH_TOKENS', 8000))
+DEFAULT_MAX_IN_FLIGHT = 8
+
+FLUSH_SIZE = "size"
+FLUSH_TOKENS = "tokens"
+FLUSH_TIMEOUT = "timeout"
+
+
+class _Pending:
+    __slots__ = ("text", "task", "tokens", "future", "enqueued", "dispatched")
+
+    def __init__(self, text: str, task: str, tokens: int):
+        self.text = text
+        self.task = task
+        self.tokens = tokens
+        self.future = Future()
+        self.enqueued = time.monotonic()
+        # set when the batch is sent (or failed), callers' timeouts start there
+        self.dispatched = threading.Event()
+
+
+class EmbeddingBatcher:
+    def __init__(self, client: EmbeddingClient, max_wait_ms: float = DEFAULT_MAX_WAIT_MS, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        if client.late_chunking:
+            raise ValueError("batched embeddings need a client with late_chunking=False")
+        self.client = client
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.queue_delay = LatencyTracker()
+        self.counters = Counter()
+        self._queue: deque[_Pending] = deque()
+        self._queued_tokens = 0
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embedding-batch")
+        self._thread = None
+
+    def submit(self, text: str, task: str | None = None)-> Future:
+        return self._enqueue(text=text, task=task).future
+
+    def _enqueue(self, text: str, task: str | None = None)-> _Pending:
+        pending = _Pending(text=text, task=task or self.client.task, tokens=estimate_tokens(text))
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name="embedding-batcher", daemon=True)
+                self._thread.start()
+            self._queue.append(pending)
+            self._queued_tokens += pending.tokens
+            self._condition.notify()
+        return pending
+
+    def default_timeout(self)-> float:
+        """Longest wait of a caller once its batch is sent: one client call with its deadline"""
+        return self.client.deadline
+
+    def _result(self, pending: _Pending, timeout: float | None)-> list[float]:
+        """Waits for the batch of `pending` to be sent, however long the batches ahead of it take, then `timeout` for its vector"""
+        pending.dispatched.wait()
+        try:
+            return pending.future.result(timeout=self.default_timeout() if timeout is None else timeout)
+        except FutureTimeoutError:
+            pending.future.cancel()
+            raise EmbeddingError("batched embedding timed out")
+
+    def embed_one(self, text: str, task: str | None = None, timeout: float | None = None)-> list[float]:
+        return self._result(self._enqueue(text=text, task=task), timeout=timeout)
+
+    def embed(self, texts: list[str], task: str | None = None, timeout: float | None = None)-> list[list[float]]:
+        batch = [self._enqueue(text=text, task=task) for text in texts]
+        return [self._result(pending, timeout=timeout) for pending in batch]
+
+    def _flush_reason(self)-> str | None:
+        if len(self._queue) >= self.max_batch_size:
+            return FLUSH_SIZE
+        if self._queued_tokens >= self.max_batch_tokens:
+            return FLUSH_TOKENS
+        if time.monotonic() - self._queue[0].enqueued >= self.max_wait:
+            return FLUSH_TIMEOUT
+        return None
+
+    def _take_batch(self)-> list[_Pending]:
+        """Oldest texts of the oldest text's task, within the size and token caps (at least one)"""
+        task = self._queue[0].task
+        batch, remaining = [], deque()
+        tokens = 0
+        while self._queue:
+            pending = self._queue.popleft()
+            fits = len(batch) < self.max_batch_size and (not batch or tokens + pending.tokens <= self.max_batch_tokens)
+            if pending.task == task and fits:
+                batch.append(pending)
+                tokens += pending.tokens
+                self._queued_tokens -= pending.tokens
+            else:
+                remaining.append(pending)
+        self._queue = remaining
+        return batch
+
+    def _collect(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                reason = self._flush_reason()
+                while reason is None:
+                    self._condition.wait(max(self._queue[0].enqueued + self.max_wait - time.monotonic(), 0))
+                    reason = self._flush_reason()
+                batch = self._take_batch()
+            try:
+                self._executor.submit(self._dispatch, batch, reason)
+            except Exception as e:
+                self._fail(batch, e)
+
+    @staticmethod
+    def _fail(batch: list[_Pending], error: BaseException):
+        for pending in batch:
+            try:
+                pending.future.set_exception(error)
+            except InvalidStateError:
+                pass
+            pending.dispatched.set()
+
+    def _dispatch(self, batch: list[_Pending], reason: str):
+        try:
+            started = time.monotonic()
+            for pending in batch:
+                pending.dispatched.set()
+                self.queue_delay.record(started - pending.enqueued)
+            # identical queries in one batch are embedded once
+            unique_texts = list(dict.fromkeys(pending.text for pending in batch))
+            self.counters["batches"] += 1
+            self.counters["items"] += len(batch)
+            self.counters["deduplicated"] += len(batch) - len(unique_texts)
+            self.counters[f"flush_{reason}"] += 1
+            with span("embed_batch", size=len(batch), unique=len(unique_texts), flush=reason):
+                vectors = self.client.embed(unique_texts, task=batch[0].task)
+            if len(vectors) != len(unique_texts):
+                raise EmbeddingError(f"got {len(vectors)} embeddings for {len(unique_texts)} texts")
+            vectors = dict(zip(unique_texts, vectors))
+            for pending in batch:
+                try:
+                    pending.future.set_result(vectors[pending.text])
+                except InvalidStateError:
+                    # cancelled by a caller that timed out
+                    pass
+        except BaseException as e:
+            self._fail(batch, e)
+            if not isinstance(e, Exception):
+                raise
+
+    def metrics(self)-> dict:
+        batches = self.counters["batches"]
+        as_ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+        return {
+            **self.counters,
+            "avg_batch_size": round(self.counters["items"] / batches, 2) if batches else None,
+            "avg_batch_fill": round(self.counters["items"] / (batches * self.max_batch_size), 3) if batches else None,
+            "queue_delay_p50_ms": as_ms(self.queue_delay.percentile(50)),
+            "queue_delay_p95_ms": as_ms(self.queue_delay.percentile(95)),
+            "queued": len(self._queue)
+        }
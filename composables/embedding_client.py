@@ -0,0 +1,260 @@
+"""
+Resilient client for the Jina embeddings API, shared by search (queries) and setup_qdrant (passages).
+
+- every call has a deadline, attempts get the remaining time as timeout
+- failed attempts (5xx, 429, timeouts, connection errors) are retried with jittered exponential backoff,
+  pacing and 429 handling go through the shared Jina rate limiter
+- when an attempt is slower than the p95 of recent latencies a duplicate (hedged) request is sent
+  and the first answer wins
+- a circuit breaker opens after consecutive failures: calls then fail fast, or are answered from the
+  last good embedding of the same text (embedding cache) or a local fallback function, until a probe
+  request succeeds again
+"""
+
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from composables.cache import ResponseCache, embedding_cache, make_cache_key
+from composables.run_report import run_report
+from composables.rate_limit import JINA, RETRYABLE_STATUS, TRANSIENT_ERRORS, ProviderHTTPError, error_status, estimate_tokens, get_limiter, parse_retry_after
+
+DEFAULT_JINA_URL = "https://api.jina.ai/v1/embeddings"
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_DEADLINE = 45.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30.0
+DEFAULT_POOL_SIZE = 16
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+class EmbeddingError(Exception):
+    pass
+
+
+class EmbeddingUnavailableError(EmbeddingError):
+    """The provider is failing (or the circuit is open) and no fallback embedding exists"""
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures, lets one probe through after reset_seconds"""
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self)-> bool:
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = CIRCUIT_HALF_OPEN
+                self._probing = False
+            if self.state == CIRCUIT_HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CIRCUIT_CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+class LatencyTracker:
+    """Sliding window of successful request latencies"""
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent: float, min_samples: int = 1)-> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+class EmbeddingClient:
+    def __init__(self, api_key: str | None, model: str, dimensions: int, task: str, url: str = DEFAULT_JINA_URL, late_chunking: bool = True, timeout: float = DEFAULT_TIMEOUT, deadline: float = DEFAULT_DEADLINE, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF, hedge: bool = True, breaker: CircuitBreaker | None = None, cache: ResponseCache | None = embedding_cache, local_fallback: Callable[[str], list[float]] | None = None, pool_size: int = DEFAULT_POOL_SIZE):
+        self.url = url
+        self.model = model
+        self.dimensions = dimensions
+        self.task = task
+        self.late_chunking = late_chunking
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self.cache = cache
+        self.local_fallback = local_fallback
+        self.latency = LatencyTracker()
+        self.counters = Counter()
+        self.limiter = get_limiter(JINA)
+        # keep-alive connections and request threads are sized together, so concurrent callers reuse warm connections
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="embedding")
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        }
+
+    def _cache_key(self, text: str, task: str)-> str:
+        return make_cache_key(model=self.model, temperature=None, system_prompt=task, user_prompt=text, dimensions=self.dimensions, late_chunking=self.late_chunking)
+
+    def _post(self, data: dict, timeout: float)-> dict:
+        start = time.monotonic()
+        res = self.session.post(url=self.url, headers=self.headers, json=data, timeout=timeout)
+        if res.status_code != 200:
+            raise ProviderHTTPError(f"Jina API error: {res.status_code} - {res.text}", status_code=res.status_code, retry_after=parse_retry_after(res.headers.get("Retry-After")))
+        self.latency.record(time.monotonic() - start)
+        return res.json()
+
+    def _attempt(self, data: dict, tokens: int, remaining: float)-> dict:
+        """One attempt, hedged with a duplicate request when the first one is slower than the recent p95"""
+        timeout = min(self.timeout, remaining)
+        primary = self._executor.submit(self._post, data, timeout)
+        hedge_delay = self.latency.percentile(HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES) if self.hedge else None
+        if hedge_delay is None or hedge_delay >= remaining:
+            return primary.result(timeout=remaining)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done or not self.limiter.try_acquire(tokens=tokens):
+            return primary.result(timeout=remaining)
+
+        self.counters["hedges"] += 1
+        hedged = self._executor.submit(self._post, data, max(timeout - hedge_delay, 0.1))
+        pending = {primary, hedged}
+        errors = []
+        end = time.monotonic() + remaining - hedge_delay
+        while pending:
+            done, pending = wait(pending, timeout=max(end - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"no embedding response within {remaining:.1f}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is hedged:
+                        self.counters["hedge_wins"] += 1
+                    return future.result()
+                errors.append(future.exception())
+        raise errors[0]
+
+    def _fallback(self, texts: list[str], task: str, reason: str)-> list[list[float]]:
+        if self.cache is not None:
+            cached = [self.cache.get(self._cache_key(text, task)) for text in texts]
+            if all(value is not None for value in cached):
+                self.counters["cache_fallbacks"] += 1
+                return [json.loads(value) for value in cached]
+        if self.local_fallback is not None:
+            self.counters["local_fallbacks"] += 1
+            return [self.local_fallback(text) for text in texts]
+        raise EmbeddingUnavailableError(f"Jina embeddings unavailable: {reason}")
+
+    def embed(self, texts: list[str], task: str | None = None)-> list[list[float]]:
+        """One embedding per text, in order. Raises EmbeddingError when the provider fails and no fallback exists."""
+        task = task or self.task
+        data = {
+            "input": texts,
+            "model": self.model,
+            "dimensions": self.dimensions,
+            "task": task,
+            "late_chunking": self.late_chunking,
+        }
+        tokens = estimate_tokens(*texts)
+        deadline = time.monotonic() + self.deadline
+        self.counters["calls"] += 1
+        if not self.breaker.allow():
+            self.counters["breaker_rejections"] += 1
+            return self._fallback(texts, task, reason="circuit open")
+
+        last_error = "deadline exceeded"
+        for attempt in range(self.retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.limiter.acquire(tokens=tokens)
+            self.counters["attempts"] += 1
+            try:
+                body = self._attempt(data=data, tokens=tokens, remaining=remaining)
+            except Exception as e:
+                status_code, retry_after = error_status(e)
+                last_error = f"{type(e).__name__}: {str(e)}"
+                if status_code in RETRYABLE_STATUS:
+                    # 429 slows the limiter down (and waits for Retry-After), only server errors count against the provider
+                    self.limiter.on_throttle(retry_after=retry_after, attempt=attempt)
+                    if status_code != 429:
+                        self.breaker.record_failure()
+                elif isinstance(e, TRANSIENT_ERRORS):
+                    self.counters["timeouts" if isinstance(e, (TimeoutError, requests.Timeout)) else "connection_errors"] += 1
+                    self.breaker.record_failure()
+                else:
+                    # the provider answered, the request itself is wrong (e.g. 400): retrying will not help
+                    self.breaker.record_success()
+                    raise EmbeddingError(last_error) from e
+                if attempt == self.retries or not self.breaker.allow():
+                    break
+                self.counters["retries"] += 1
+                run_report.record_retry(JINA)
+                if status_code not in RETRYABLE_STATUS:
+                    time.sleep(min(random.uniform(0, self.backoff * (2 ** attempt)), max(deadline - time.monotonic(), 0)))
+                continue
+
+            self.breaker.record_success()
+            self.limiter.on_success()
+            actual_tokens = body.get("usage", {}).get("total_tokens")
+            self.limiter.settle(estimated_tokens=tokens, actual_tokens=actual_tokens)
+            run_report.record_request(JINA, model=self.model, prompt_tokens=actual_tokens if actual_tokens is not None else tokens)
+            embeddings = [item["embedding"] for item in body["data"]]
+            if self.cache is not None:
+                for text, embedding in zip(texts, embeddings):
+                    self.cache.set(self._cache_key(text, task), json.dumps(embedding), model=self.model)
+            return embeddings
+
+        self.counters["failures"] += 1
+        run_report.record_failure(JINA)
+        return self._fallback(texts, task, reason=last_error)
+
+    def embed_one(self, text: str, task: str | None = None)-> list[float]:
+        return self.embed([text], task=task)[0]
+
+    def metrics(self)-> dict:
+        return {
+            **self.counters,
+            "circuit": self.breaker.state,
+            "latency_p50": self.latency.percentile(50),
+            "latency_p95": self.latency.percentile(95)
+        }
@@ -0,0 +1,338 @@
+"""
+Streaming analysis of LLM-as-Judge evaluation results.
+
+Result files are read in chunks (JSONL, Parquet, CSV or legacy JSON arrays) and only the
+running sums are kept in memory, so the summary of hundreds of thousands of judged items
+never needs the whole file (answers, comments, ...) at once.
+"""
+
+import json
+import sqlite3
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from composables.files import columnar_sibling, open_records
+
+SCORE_FIELDS = ["relevance", "groundedness", "completeness", "faithfulness"]
+SCORE_LEVELS = [0, 1, 2, 3]
+GROUP_FIELDS = ["race", "realm"]
+DEFAULT_CHUNK_SIZE = 50_000
+Z_95 = 1.959964
+
+JUDGE_DESCRIPTIONS = {
+    "gpt-4o-mini": """
+Evaluation using gpt-4o-mini
+Evaluate on four criteria:
+1. Relevance — Does the answer directly address the question?
+2. Groundedness — Are all facts supported by the provided context (no hallucinations)?
+3. Completeness — Does the answer include all key details from the context?
+4. Faithfulness — Does it follow the system rules (concise, factual, no invention, admits missing info)?
+
+Scoring Guide (0–3 for each):
+- 3: Excellent — fully meets the criterion
+- 2: Fair — mostly correct, minor omissions or minor unsupported detail
+- 1: Weak — noticeable errors, missing or irrelevant info
+- 0: None — fails completely or contradicts context
+""",
+    "claude-3-5-haiku-20241022": """
+Evaluation using claude-3-5-haiku-20241022
+Evaluate on four criteria:
+1. Relevance (0-3): Does the answer directly address the question?
+   - 3: Fully addresses the question
+   - 2: Mostly relevant with minor tangents
+   - 1: Partially relevant, significant gaps
+   - 0: Irrelevant or off-topic
+
+2. Groundedness (0-3): Are all facts supported by the context?
+   - 3: All claims supported, no hallucinations
+   - 2: Mostly grounded, one minor unsupported detail
+   - 1: Multiple unsupported claims
+   - 0: Significant hallucinations or contradicts context
+
+3. Completeness (0-3): Does the answer include key details from context?
+   - 3: All important information included
+   - 2: Most key details present, minor omissions
+   - 1: Missing significant information
+   - 0: Incomplete or vague
+
+4. Faithfulness (0-3): Is the answer concise, factual, and honest about limitations?
+   - 3: Concise, factual, admits gaps appropriately
+   - 2: Mostly faithful, slightly verbose or assumes minor details
+   - 1: Invents information or doesn't admit uncertainty
+   - 0: Violates multiple guidelines
+"""
+}
+
+
+def iter_eval_chunks(file_path: str | Path, columns: list[str] | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE)-> Iterator[pd.DataFrame]:
+    """
+    Yield DataFrame chunks of an evaluation file.
+    JSONL, Parquet and CSV are streamed, a plain JSON array is loaded once (legacy format)
+    unless a converted .parquet copy sits next to it.
+    """
+    file_path = Path(file_path)
+    if file_path.suffix.lower() == ".json":
+        file_path = columnar_sibling(file_path) or file_path
+    suffix = file_path.suffix.lower()
+    if suffix == ".jsonl":
+        with pd.read_json(file_path, lines=True, chunksize=chunk_size, dtype=False) as reader:
+            for chunk in reader:
+                yield chunk[[c for c in columns if c in chunk.columns]] if columns else chunk
+    elif suffix == ".parquet":
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(file_path)
+        available = set(parquet_file.schema_arrow.names)
+        selected = [c for c in columns if c in available] if columns else None
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=selected):
+            yield batch.to_pandas()
+    elif suffix == ".csv":
+        usecols = (lambda c: c in columns) if columns else None
+        for chunk in pd.read_csv(file_path, chunksize=chunk_size, usecols=usecols):
+            yield chunk
+    else:
+        with open(file_path, 'r') as file:
+            data = json.load(file)
+        for start in range(0, len(data), chunk_size):
+            chunk = pd.DataFrame(data[start:start + chunk_size])
+            yield chunk[[c for c in columns if c in chunk.columns]] if columns else chunk
+
+
+def load_group_lookup(golden_questions_path: str | Path, records_path: str | Path, group_fields: list[str] = GROUP_FIELDS)-> pd.DataFrame:
+    """
+    Map question -> character id -> group fields (race, realm, ...).
+    Used to break down results that only carry the question text.
+    """
+    golden_questions = open_records(file_path=golden_questions_path, columns=["id", "questions"])
+    records = open_records(file_path=records_path, columns=["id", *[f"payload.{field}" for field in group_fields]])
+
+    questions_df = pd.DataFrame(golden_questions).explode("questions").rename(columns={"questions": "question"})
+    questions_df = questions_df.dropna(subset=["question"]).drop_duplicates(subset=["question"])
+    attributes_df = pd.DataFrame([
+        {"id": record["id"], **{field: (record.get("payload") or record).get(field) for field in group_fields}}
+        for record in records
+    ])
+    return questions_df.merge(attributes_df, on="id", how="left")
+
+
+def _to_scores(chunk: pd.DataFrame)-> pd.DataFrame:
+    scores = chunk.reindex(columns=SCORE_FIELDS)
+    return scores.apply(pd.to_numeric, errors="coerce")
+
+
+class ScoreAccumulator:
+    """Running count / sum / sum of squares / level histogram for every score field"""
+    def __init__(self):
+        self.num_entries = 0
+        self.count = np.zeros(len(SCORE_FIELDS), dtype=np.int64)
+        self.total = np.zeros(len(SCORE_FIELDS), dtype=np.float64)
+        self.total_sq = np.zeros(len(SCORE_FIELDS), dtype=np.float64)
+        self.levels = np.zeros((len(SCORE_FIELDS), len(SCORE_LEVELS)), dtype=np.int64)
+
+    def update(self, scores: pd.DataFrame):
+        values = scores.to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        self.num_entries += len(values)
+        self.count += valid.sum(axis=0)
+        self.total += filled.sum(axis=0)
+        self.total_sq += (filled ** 2).sum(axis=0)
+        for level_idx, level in enumerate(SCORE_LEVELS):
+            self.levels[:, level_idx] += (values == level).sum(axis=0)
+
+    def summary(self)-> dict:
+        fields = {}
+        for idx, field in enumerate(SCORE_FIELDS):
+            fields[field] = _mean_with_ci(n=self.count[idx], total=self.total[idx], total_sq=self.total_sq[idx])
+            fields[field]["distribution"] = {level: int(self.levels[idx, level_idx]) for level_idx, level in enumerate(SCORE_LEVELS)}
+        total_count = self.count.sum()
+        return {
+            "num_entries": int(self.num_entries),
+            "fields": fields,
+            "total_average": float(self.total.sum() / total_count) if total_count else float("nan")
+        }
+
+
+def _mean_with_ci(n, total, total_sq)-> dict:
+    if n == 0:
+        return {"n": 0, "mean": float("nan"), "std": float("nan"), "ci95": [float("nan"), float("nan")]}
+    mean = total / n
+    variance = max(total_sq / n - mean ** 2, 0.0) * (n / (n - 1)) if n > 1 else 0.0
+    std = variance ** 0.5
+    margin = Z_95 * std / n ** 0.5
+    return {"n": int(n), "mean": float(mean), "std": float(std), "ci95": [float(mean - margin), float(mean + margin)]}
+
+
+def analyze_eval_file(file_path: str | Path, group_lookup: pd.DataFrame | None = None, group_fields: list[str] = GROUP_FIELDS, chunk_size: int = DEFAULT_CHUNK_SIZE)-> dict:
+    """
+    Score distributions, means with 95% confidence intervals and, when group_lookup is given,
+    per-group (race / realm) means for one evaluation result file.
+    """
+    accumulator = ScoreAccumulator()
+    group_stats = {field: None for field in group_fields} if group_lookup is not None else {}
+    columns = ["id", "question", *SCORE_FIELDS]
+
+    for chunk in iter_eval_chunks(file_path=file_path, columns=columns, chunk_size=chunk_size):
+        scores = _to_scores(chunk)
+        accumulator.update(scores)
+        if group_lookup is None:
+            continue
+        key = "id" if "id" in chunk.columns and chunk["id"].notna().all() else "question"
+        lookup = group_lookup.drop_duplicates(subset=[key])[[key, *group_fields]]
+        groups = chunk[[key]].merge(lookup, on=key, how="left")[group_fields].fillna("Unknown")
+        squared = scores ** 2
+        for field in group_fields:
+            grouped = pd.concat([
+                scores.groupby(groups[field].values).sum(min_count=0).add_suffix("_sum"),
+                squared.groupby(groups[field].values).sum(min_count=0).add_suffix("_sumsq"),
+                scores.groupby(groups[field].values).count().add_suffix("_count")
+            ], axis=1)
+            group_stats[field] = grouped if group_stats[field] is None else group_stats[field].add(grouped, fill_value=0)
+
+    summary = accumulator.summary()
+    if group_stats:
+        summary["groups"] = {}
+        for field, stats in group_stats.items():
+            breakdown = {}
+            for group_name, row in (stats.iterrows() if stats is not None else []):
+                breakdown[group_name] = {
+                    score_field: _mean_with_ci(n=row[f"{score_field}_count"], total=row[f"{score_field}_sum"], total_sq=row[f"{score_field}_sumsq"])
+                    for score_field in SCORE_FIELDS
+                }
+            summary["groups"][field] = breakdown
+    return summary
+
+
+def _spill_keyed_scores(file_path: str | Path, connection: sqlite3.Connection, chunk_size: int)-> int:
+    """Question + scores of a result file into the scores_b table, with an occurrence counter so repeated questions stay distinct"""
+    seen = Counter()
+    rows = 0
+    for chunk in iter_eval_chunks(file_path=file_path, columns=["question", *SCORE_FIELDS], chunk_size=chunk_size):
+        keyed = _keyed(chunk, seen)
+        keyed.to_sql("scores_b", connection, if_exists="append", index=False)
+        rows += len(keyed)
+    if rows:
+        connection.execute("CREATE INDEX scores_b_key ON scores_b (question, occurrence)")
+    return rows
+
+
+def _keyed(chunk: pd.DataFrame, seen: Counter)-> pd.DataFrame:
+    offsets = chunk["question"].map(lambda q: seen[q]).to_numpy()
+    occurrence = chunk.groupby("question", sort=False).cumcount().to_numpy() + offsets
+    seen.update(chunk["question"].tolist())
+    keyed = _to_scores(chunk).astype("float32")
+    keyed.insert(0, "occurrence", occurrence)
+    keyed.insert(0, "question", chunk["question"].to_numpy())
+    return keyed
+
+
+def compare_judges(file_path_a: str | Path, file_path_b: str | Path, chunk_size: int = DEFAULT_CHUNK_SIZE)-> dict:
+    """
+    Judge-vs-judge agreement between two result files of the same questions.
+    Rows are matched on question text (and occurrence), so files with missing rows still line up.
+    File B is spilled to a temporary sqlite table and file A is streamed against it chunk by chunk,
+    memory stays at one chunk whatever the size of either file.
+    """
+    confusion = np.zeros((len(SCORE_FIELDS), len(SCORE_LEVELS), len(SCORE_LEVELS)), dtype=np.int64)
+    diff_sum = np.zeros(len(SCORE_FIELDS))
+    abs_diff_sum = np.zeros(len(SCORE_FIELDS))
+    seen = Counter()
+    matched = 0
+    score_columns = ", ".join(f"a.{field} AS {field}_a, b.{field} AS {field}_b" for field in SCORE_FIELDS)
+
+    with tempfile.TemporaryDirectory(prefix="judge-compare-") as work_dir:
+        connection = sqlite3.connect(Path(work_dir) / "scores.sqlite")
+        try:
+            rows_b = _spill_keyed_scores(file_path=file_path_b, connection=connection, chunk_size=chunk_size)
+            for chunk in iter_eval_chunks(file_path=file_path_a, columns=["question", *SCORE_FIELDS], chunk_size=chunk_size):
+                if not rows_b:
+                    break
+                _keyed(chunk, seen).to_sql("chunk_a", connection, if_exists="replace", index=False)
+                joined = pd.read_sql_query(f"SELECT {score_columns} FROM chunk_a a JOIN scores_b b ON a.question = b.question AND a.occurrence = b.occurrence", connection)
+                matched += len(joined)
+                for idx, field in enumerate(SCORE_FIELDS):
+                    # sqlite hands missing scores back as None
+                    a = joined[f"{field}_a"].astype("float64").to_numpy()
+                    b = joined[f"{field}_b"].astype("float64").to_numpy()
+                    valid = ~np.isnan(a) & ~np.isnan(b) & np.isin(a, SCORE_LEVELS) & np.isin(b, SCORE_LEVELS)
+                    a = a[valid].astype(np.int64)
+                    b = b[valid].astype(np.int64)
+                    size = len(SCORE_LEVELS)
+                    confusion[idx] += np.bincount(a * size + b, minlength=size * size).reshape(size, size)
+                    diff_sum[idx] += (a - b).sum()
+                    abs_diff_sum[idx] += np.abs(a - b).sum()
+        finally:
+            connection.close()
+
+    fields = {}
+    for idx, field in enumerate(SCORE_FIELDS):
+        matrix = confusion[idx]
+        n = matrix.sum()
+        if n == 0:
+            fields[field] = {"n": 0}
+            continue
+        levels = np.arange(len(SCORE_LEVELS))
+        distance = np.abs(levels[:, None] - levels[None, :])
+        fields[field] = {
+            "n": int(n),
+            "exact_agreement": float(np.trace(matrix) / n),
+            "within_one": float(matrix[distance <= 1].sum() / n),
+            "mean_difference": float(diff_sum[idx] / n),
+            "mean_abs_difference": float(abs_diff_sum[idx] / n),
+            "weighted_kappa": _quadratic_weighted_kappa(matrix),
+            "confusion_matrix": matrix.tolist()
+        }
+    return {"matched": matched, "unmatched_b": int(rows_b - matched), "fields": fields}
+
+
+def _quadratic_weighted_kappa(matrix: np.ndarray)-> float:
+    n = matrix.sum()
+    levels = np.arange(matrix.shape[0])
+    weights = (levels[:, None] - levels[None, :]) ** 2 / (matrix.shape[0] - 1) ** 2
+    expected = np.outer(matrix.sum(axis=1), matrix.sum(axis=0)) / n
+    denominator = (weights * expected).sum()
+    if denominator == 0:
+        return 1.0
+    return float(1 - (weights * matrix).sum() / denominator)
+
+
+def print_analysis(summary: dict):
+    print(f"Number of entries: {summary['num_entries']}")
+    for field, stats in summary["fields"].items():
+        low, high = stats["ci95"]
+        print(f"Average {field.title()} Score: {stats['mean']} (95% CI {low:.3f}–{high:.3f}, n={stats['n']})")
+    print(f"Total Average Score: {summary['total_average']}")
+    print("Score distribution (0 / 1 / 2 / 3):")
+    for field, stats in summary["fields"].items():
+        distribution = " / ".join(str(stats["distribution"][level]) for level in SCORE_LEVELS)
+        print(f"  {field.title()}: {distribution}")
+    for group_field, breakdown in summary.get("groups", {}).items():
+        print(f"\nBreakdown by {group_field}:")
+        ordered = sorted(breakdown.items(), key=lambda item: -item[1][SCORE_FIELDS[0]]["n"])
+        for group_name, stats in ordered:
+            means = ", ".join(f"{field}={stats[field]['mean']:.2f}" for field in SCORE_FIELDS)
+            print(f"  {group_name} (n={stats[SCORE_FIELDS[0]]['n']}): {means}")
+
+
+def print_judge_agreement(agreement: dict, label_a: str, label_b: str):
+    print(f"\nJudge agreement {label_a} vs {label_b} ({agreement['matched']} matched entries)")
+    for field, stats in agreement["fields"].items():
+        if stats["n"] == 0:
+            print(f"  {field.title()}: no comparable scores")
+            continue
+        print(
+            f"  {field.title()}: exact {stats['exact_agreement']:.1%}, within ±1 {stats['within_one']:.1%}, "
+            f"mean diff {stats['mean_difference']:+.3f}, weighted kappa {stats['weighted_kappa']:.3f}"
+        )
+
+
+def analyze_evaluation_result(file_path: str | Path, judge: str = "gpt-4o-mini", group_lookup: pd.DataFrame | None = None)-> dict:
+    """Print the judge rubric followed by the streamed summary of a result file"""
+    print(JUDGE_DESCRIPTIONS.get(judge, f"\nEvaluation using {judge}\n"))
+    summary = analyze_eval_file(file_path=file_path, group_lookup=group_lookup)
+    print_analysis(summary)
+    return summary
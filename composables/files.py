@@ -1,5 +1,10 @@
 import json
 from pathlib import Path
+from typing import Iterable, Iterator
+
+PARQUET_COMPRESSION = "zstd"
+PARQUET_BATCH_SIZE = 10_000
+NESTED_SEPARATOR = "."
 
 def open_json_file (file_path: str | Path):
     with open(file_path, 'r') as file:
@@ -8,4 +13,139 @@ def open_json_file (file_path: str | Path):
 
 def save_json_file (file_path: str | Path, data):
     with open(file_path, 'w') as file:
-        json.dump(data, file, indent=2, ensure_ascii=False)
\ No newline at end of file
+        json.dump(data, file, indent=2, ensure_ascii=False)
+
+def iter_jsonl_file (file_path: str | Path)-> Iterator[dict]:
+    """Stream a JSON Lines file one record at a time"""
+    with open(file_path, 'r') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+def open_jsonl_file (file_path: str | Path)-> list[dict]:
+    return list(iter_jsonl_file(file_path=file_path))
+
+def save_jsonl_file (file_path: str | Path, data: Iterable[dict]):
+    with open(file_path, 'w') as file:
+        for record in data:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def flatten_record (record: dict, prefix: str = "")-> dict:
+    """{"payload": {"race": "Men"}} -> {"payload.race": "Men"}, so nested fields become their own columns"""
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flat.update(flatten_record(value, prefix=f"{name}{NESTED_SEPARATOR}"))
+        else:
+            flat[name] = value
+    return flat
+
+def unflatten_record (record: dict)-> dict:
+    nested = {}
+    for key, value in record.items():
+        parts = key.split(NESTED_SEPARATOR)
+        target = nested
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return nested
+
+def save_parquet_file (file_path: str | Path, data: Iterable[dict], compression: str = PARQUET_COMPRESSION, batch_size: int = PARQUET_BATCH_SIZE):
+    """
+    Save records as a compressed columnar Parquet file.
+    Nested dicts are flattened to dotted column names and restored by open_parquet_file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    records = [flatten_record(record) for record in data]
+    table = pa.Table.from_pylist(records)
+    pq.write_table(table, file_path, compression=compression, row_group_size=batch_size)
+
+def _select_parquet_columns (available: list[str], columns: list[str] | None)-> list[str] | None:
+    """Resolve requested columns, a nested prefix such as "payload" selects every payload.* column"""
+    if columns is None:
+        return None
+    selected = []
+    for column in columns:
+        matches = [name for name in available if name == column or name.startswith(f"{column}{NESTED_SEPARATOR}")]
+        selected.extend(name for name in matches if name not in selected)
+    return selected
+
+def iter_parquet_file (file_path: str | Path, columns: list[str] | None = None, batch_size: int = PARQUET_BATCH_SIZE)-> Iterator[dict]:
+    """Stream records of a Parquet file, reading only the requested columns"""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path)
+    selected = _select_parquet_columns(available=parquet_file.schema_arrow.names, columns=columns)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=selected):
+        for record in batch.to_pylist():
+            yield unflatten_record(record)
+
+def open_parquet_file (file_path: str | Path, columns: list[str] | None = None)-> list[dict]:
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path)
+    selected = _select_parquet_columns(available=parquet_file.schema_arrow.names, columns=columns)
+    table = parquet_file.read(columns=selected)
+    return [unflatten_record(record) for record in table.to_pylist()]
+
+def columnar_sibling (file_path: str | Path)-> Path | None:
+    """Parquet file next to a JSON / JSONL file, when it exists and is not older than the source"""
+    file_path = Path(file_path)
+    sibling = file_path.with_suffix(".parquet")
+    if sibling.exists() and (not file_path.exists() or sibling.stat().st_mtime >= file_path.stat().st_mtime):
+        return sibling
+    return None
+
+def _project_record (record: dict, columns: list[str])-> dict:
+    flat = flatten_record(record)
+    return unflatten_record(_pick_columns(flat, columns))
+
+def _pick_columns (flat: dict, columns: list[str])-> dict:
+    return {
+        key: value for key, value in flat.items()
+        if any(key == column or key.startswith(f"{column}{NESTED_SEPARATOR}") for column in columns)
+    }
+
+def iter_records (file_path: str | Path, columns: list[str] | None = None, prefer_columnar: bool = True)-> Iterator[dict]:
+    """
+    Stream records from .json, .jsonl or .parquet files.
+    With prefer_columnar, a fresh .parquet sibling of a JSON file is read instead, so selecting
+    a few columns (e.g. ["id", "questions"]) does not parse the remaining fields at all.
+    """
+    file_path = Path(file_path)
+    if prefer_columnar and file_path.suffix != ".parquet":
+        file_path = columnar_sibling(file_path) or file_path
+    suffix = file_path.suffix.lower()
+    if suffix == ".parquet":
+        yield from iter_parquet_file(file_path=file_path, columns=columns)
+        return
+    records = iter_jsonl_file(file_path=file_path) if suffix == ".jsonl" else open_json_file(file_path=file_path)
+    for record in records:
+        yield _project_record(record, columns) if columns else record
+
+def open_records (file_path: str | Path, columns: list[str] | None = None, prefer_columnar: bool = True)-> list[dict]:
+    file_path = Path(file_path)
+    if prefer_columnar and file_path.suffix != ".parquet":
+        file_path = columnar_sibling(file_path) or file_path
+    if file_path.suffix.lower() == ".parquet":
+        return open_parquet_file(file_path=file_path, columns=columns)
+    return list(iter_records(file_path=file_path, columns=columns, prefer_columnar=False))
+
+def save_records (file_path: str | Path, data: Iterable[dict]):
+    """Save records in the format given by the file suffix (.json, .jsonl or .parquet)"""
+    suffix = Path(file_path).suffix.lower()
+    if suffix == ".parquet":
+        save_parquet_file(file_path=file_path, data=data)
+    elif suffix == ".jsonl":
+        save_jsonl_file(file_path=file_path, data=data)
+    else:
+        save_json_file(file_path=file_path, data=list(data))
+
+def convert_records_file (source_path: str | Path, target_path: str | Path)-> int:
+    """Convert between .json, .jsonl and .parquet, returns the number of records written"""
+    records = list(iter_records(file_path=source_path, prefer_columnar=False))
+    save_records(file_path=target_path, data=records)
+    return len(records)
@@ -0,0 +1,103 @@
+import gzip
+import hashlib
+import json
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+
+DEFAULT_HTML_CACHE_DIR = project_root / ".cache" / "html"
+
+
+class HtmlCache:
+    """
+    Raw HTML of scraped pages keyed by url, stored as <sha256(url)>.html.gz plus a .json
+    sidecar with the validators (ETag / Last-Modified), a content hash and the last parse result.
+    The parse result is stored with the version of the parser that produced it and only reused by the same version.
+    """
+    def __init__(self, cache_dir: str | Path = DEFAULT_HTML_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _key(self, url: str)-> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _body_path(self, url: str)-> Path:
+        return self.cache_dir / f"{self._key(url)}.html.gz"
+
+    def _meta_path(self, url: str)-> Path:
+        return self.cache_dir / f"{self._key(url)}.json"
+
+    def get_meta(self, url: str)-> dict | None:
+        meta_path = self._meta_path(url)
+        if not meta_path.exists():
+            return None
+        with open(meta_path, 'r') as file:
+            return json.load(file)
+
+    def _save_meta(self, url: str, meta: dict):
+        tmp_path = self._meta_path(url).with_suffix(".tmp")
+        with open(tmp_path, 'w') as file:
+            json.dump(meta, file, indent=2, ensure_ascii=False)
+        tmp_path.replace(self._meta_path(url))
+
+    def read_body(self, url: str)-> bytes | None:
+        body_path = self._body_path(url)
+        if not body_path.exists():
+            return None
+        with gzip.open(body_path, 'rb') as file:
+            return file.read()
+
+    def conditional_headers(self, url: str)-> dict:
+        """If-None-Match / If-Modified-Since headers for a cached page, empty dict otherwise"""
+        meta = self.get_meta(url)
+        if meta is None or not self._body_path(url).exists():
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def store(self, url: str, body: bytes, etag: str | None = None, last_modified: str | None = None)-> bool:
+        """Save a freshly downloaded page, returns True when its content differs from the cached copy"""
+        content_hash = hashlib.sha256(body).hexdigest()
+        meta = self.get_meta(url) or {}
+        changed = meta.get("content_hash") != content_hash
+        if changed:
+            with gzip.open(self._body_path(url), 'wb') as file:
+                file.write(body)
+        meta.update({
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": content_hash,
+            "fetched_at": time.time()
+        })
+        if changed:
+            meta.pop("parsed", None)
+            meta.pop("parser_version", None)
+        self._save_meta(url, meta)
+        return changed
+
+    def touch(self, url: str):
+        """Record a successful revalidation (304) of a cached page"""
+        meta = self.get_meta(url)
+        if meta is not None:
+            meta["fetched_at"] = time.time()
+            self._save_meta(url, meta)
+
+    def get_parsed(self, url: str, version: int | str)-> dict | None:
+        """Cached parse result of a page, None when missing or produced by another parser version"""
+        meta = self.get_meta(url)
+        if not meta or meta.get("parser_version") != version:
+            return None
+        return meta.get("parsed")
+
+    def store_parsed(self, url: str, parsed: dict, version: int | str):
+        meta = self.get_meta(url)
+        if meta is not None:
+            meta["parsed"] = parsed
+            meta["parser_version"] = version
+            self._save_meta(url, meta)
@@ -0,0 +1,227 @@
+"""
+Load generation for the query path (src/load_test.py).
+
+Two ways to apply load:
+- closed loop (concurrency): N virtual users, each sends its next query as soon as the previous one returns.
+  Throughput is whatever the system sustains with N requests in flight.
+- open loop (rate): queries are sent on a fixed schedule whatever the response times. Latency is measured from
+  the scheduled send time, so requests queued behind a slow system count their wait (no coordinated omission).
+
+Every request records its end-to-end latency and outcome. While a run records, the spans of the traced query
+path (search, embed, vector_search, format_context, llm, see composables/tracing.py) are collected too, which
+gives p50/p95/p99 per stage. A sweep runs one step per load level, and saturation_point() finds the level
+where throughput stops following the offered load or latency / errors cross their limits.
+"""
+
+import itertools
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from composables.tracing import Histogram, add_hook, remove_hook
+
+CLOSED_LOOP = "concurrency"
+OPEN_LOOP = "rate"
+DEFAULT_MAX_IN_FLIGHT = 256
+# samples kept per stage for the percentiles, far more than one step records
+STAGE_WINDOW = 1_000_000
+# a step whose throughput grows by less than this share of the offered load growth is saturated
+MIN_THROUGHPUT_GAIN = 0.5
+
+
+class LoadError(Exception):
+    """A request that completed without a usable result, `kind` groups it in the error counts"""
+    def __init__(self, kind: str, message: str = ""):
+        super().__init__(message or kind)
+        self.kind = kind
+
+
+class StageRecorder:
+    """Span durations per stage name, only while recording (warm-up requests are left out)"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.recording = False
+        self.stages: dict[str, Histogram] = {}
+        self.errors = Counter()
+
+    def __call__(self, record: dict):
+        if not self.recording:
+            return
+        with self._lock:
+            if record["name"] not in self.stages:
+                self.stages[record["name"]] = Histogram(window=STAGE_WINDOW)
+            self.stages[record["name"]].observe(record["seconds"])
+            if record["error"] is not None:
+                self.errors[record["name"]] += 1
+
+    def summary(self)-> dict:
+        with self._lock:
+            return {name: {**as_ms(histogram.summary()), "errors": self.errors[name]} for name, histogram in sorted(self.stages.items())}
+
+
+def as_ms(summary: dict)-> dict:
+    """Histogram.summary() in milliseconds"""
+    return {
+        "count": summary["count"],
+        **{f"{key}_ms": round(summary[key] * 1000, 3) if summary[key] is not None else None for key in ("mean", "p50", "p95", "p99")}
+    }
+
+
+class LoadRun:
+    """Results of one load level, measured between record_from and deadline"""
+    def __init__(self, record_from: float, deadline: float):
+        self._lock = threading.Lock()
+        self.record_from = record_from
+        self.deadline = deadline
+        self.latency = Histogram(window=STAGE_WINDOW)
+        self.outcomes = Counter()
+        self.completed_ok = 0
+
+    def record(self, sent: float, outcome: str):
+        """A request sent (or scheduled) at `sent`, those sent during the warm-up are left out"""
+        if sent < self.record_from:
+            return
+        completed = time.monotonic()
+        with self._lock:
+            self.outcomes[outcome] += 1
+            if outcome == "ok":
+                self.latency.observe(completed - sent)
+                # requests finishing after the deadline count for latency, not for throughput
+                self.completed_ok += completed <= self.deadline
+
+    def summary(self)-> dict:
+        with self._lock:
+            elapsed = self.deadline - self.record_from
+            total = sum(self.outcomes.values())
+            errors = total - self.outcomes["ok"]
+            return {
+                "seconds": round(elapsed, 3),
+                "requests": total,
+                "ok": self.outcomes["ok"],
+                "throughput_rps": round(self.completed_ok / elapsed, 3),
+                "error_rate": round(errors / total, 4) if total else None,
+                "errors": {outcome: count for outcome, count in sorted(self.outcomes.items()) if outcome != "ok"},
+                "latency": as_ms(self.latency.summary())
+            }
+
+
+def _outcome(call: Callable[[str], object], query: str)-> str:
+    try:
+        call(query)
+        return "ok"
+    except LoadError as e:
+        return e.kind
+    except Exception as e:
+        return type(e).__name__
+
+
+class LoadGenerator:
+    """Replays `queries` (in order, cycling) against call(query), which raises on failure"""
+    def __init__(self, call: Callable[[str], object], queries: list[str], max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        if not queries:
+            raise ValueError("no queries to replay")
+        self.call = call
+        self.queries = queries
+        self.max_in_flight = max_in_flight
+        self._positions = itertools.count()
+        self._lock = threading.Lock()
+
+    def next_query(self)-> str:
+        with self._lock:
+            return self.queries[next(self._positions) % len(self.queries)]
+
+    def run(self, mode: str, level: float, duration: float, warm_up: float = 0.0)-> dict:
+        """One step at `level` virtual users (closed loop) or requests per second (open loop)"""
+        if level <= 0:
+            raise ValueError(f"{mode} must be positive, got {level}")
+        stages = StageRecorder()
+        add_hook(stages)
+        try:
+            if mode == CLOSED_LOOP:
+                run = self._closed_loop(users=int(level), duration=duration, warm_up=warm_up, stages=stages)
+            elif mode == OPEN_LOOP:
+                run = self._open_loop(rate=level, duration=duration, warm_up=warm_up, stages=stages)
+            else:
+                raise ValueError(f"Unknown load mode '{mode}', expected {CLOSED_LOOP} or {OPEN_LOOP}")
+        finally:
+            remove_hook(stages)
+        return {"mode": mode, "level": level, **run.summary(), "stages": stages.summary()}
+
+    def _closed_loop(self, users: int, duration: float, warm_up: float, stages: StageRecorder)-> LoadRun:
+        start = time.monotonic()
+        run = LoadRun(record_from=start + warm_up, deadline=start + warm_up + duration)
+
+        def user():
+            while time.monotonic() < run.deadline:
+                sent = time.monotonic()
+                run.record(sent, _outcome(self.call, self.next_query()))
+
+        threads = [threading.Thread(target=user, daemon=True) for _ in range(users)]
+        for thread in threads:
+            thread.start()
+        self._record_stages(stages, run)
+        for thread in threads:
+            thread.join()
+        return run
+
+    def _open_loop(self, rate: float, duration: float, warm_up: float, stages: StageRecorder)-> LoadRun:
+        start = time.monotonic()
+        run = LoadRun(record_from=start + warm_up, deadline=start + warm_up + duration)
+
+        def send(scheduled: float, query: str):
+            run.record(scheduled, _outcome(self.call, query))
+
+        def schedule():
+            for sequence in itertools.count():
+                scheduled = start + sequence / rate
+                if scheduled >= run.deadline:
+                    return
+                time.sleep(max(0.0, scheduled - time.monotonic()))
+                # beyond max_in_flight requests wait in the pool queue, their wait is part of the latency
+                executor.submit(send, scheduled, self.next_query())
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="load") as executor:
+            scheduler = threading.Thread(target=schedule, daemon=True)
+            scheduler.start()
+            self._record_stages(stages, run)
+            scheduler.join()
+        return run
+
+    @staticmethod
+    def _record_stages(stages: StageRecorder, run: LoadRun):
+        """Collect spans between the end of the warm-up and the deadline"""
+        time.sleep(max(0.0, run.record_from - time.monotonic()))
+        stages.recording = True
+        time.sleep(max(0.0, run.deadline - time.monotonic()))
+        stages.recording = False
+
+
+def saturation_point(steps: list[dict], max_p95_ms: float | None = None, max_error_rate: float = 0.01, min_gain: float = MIN_THROUGHPUT_GAIN)-> dict:
+    """
+    Highest load level of a sweep (steps in increasing level) before the system saturates: the next step's p95
+    or error rate is over its limit, or its throughput grew by less than min_gain of the added load
+    """
+    healthy, reason = None, "not reached"
+    for previous, step in zip([None, *steps], steps):
+        p95 = step["latency"]["p95_ms"]
+        if step["error_rate"] is None or step["error_rate"] > max_error_rate:
+            reason = f"error rate {step['error_rate']} at {step['level']}"
+            break
+        if max_p95_ms is not None and (p95 is None or p95 > max_p95_ms):
+            reason = f"p95 {p95} ms over {max_p95_ms} ms at {step['level']}"
+            break
+        if previous is not None and previous["throughput_rps"]:
+            offered_gain = step["level"] / previous["level"] - 1
+            throughput_gain = step["throughput_rps"] / previous["throughput_rps"] - 1
+            if throughput_gain < min_gain * offered_gain:
+                reason = f"throughput +{throughput_gain:.0%} for +{offered_gain:.0%} load at {step['level']}"
+                break
+        healthy = step
+    return {
+        "level": healthy["level"] if healthy else None,
+        "throughput_rps": healthy["throughput_rps"] if healthy else None,
+        "p95_ms": healthy["latency"]["p95_ms"] if healthy else None,
+        "reason": reason
+    }
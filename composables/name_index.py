@@ -0,0 +1,202 @@
+"""
+Character name resolution.
+
+Names are normalized once when the index is built (accents removed, lower case, whitespace collapsed).
+Exact matches are a dict lookup ("Earendil" finds "Eärendil"), near misses such as typos or
+spelling variants ("Galadrial") go through a trigram index: candidates sharing the most trigrams
+are ranked by edit distance and the best one is accepted when its similarity reaches min_confidence
+and it beats the runner-up by min_margin. resolve_all() matches a whole list: exact matches first, and
+fuzzy ones only among the items no other name has claimed, so "Holfast Gardner" cannot take "Hamfast Gardner".
+"""
+
+import unicodedata
+from collections import Counter
+from pathlib import Path
+
+from composables.files import open_records
+
+# one edit in a 9 letter name ("Galadrial") passes, two in a 15 letter one ("Holfast Gardner") do not
+DEFAULT_MIN_CONFIDENCE = 0.88
+# the best fuzzy candidate must be this much more similar than the next one, otherwise the name is ambiguous
+DEFAULT_MIN_MARGIN = 0.03
+DEFAULT_CANDIDATES = 10
+MAX_QUERY_NAME_WORDS = 4
+
+MATCH_EXACT = "exact"
+MATCH_FUZZY = "fuzzy"
+
+
+def normalize_name(name: str)-> str:
+    """Remove accents, lower case and collapse whitespace, for comparing names"""
+    # Normalize to NFD (decomposed form) and filter out combining characters (accents, diacritics)
+    normalized = unicodedata.normalize('NFD', name)
+    ascii_text = ''.join(c for c in normalized if unicodedata.category(c) != 'Mn')
+    return ' '.join(ascii_text.lower().split())
+
+
+def trigrams(normalized_name: str)-> set[str]:
+    padded = f"  {normalized_name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, max_distance: int | None = None)-> int:
+    """Levenshtein distance, stops early once every path exceeds max_distance"""
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class NameIndex:
+    """
+    Index of items (dicts) by their name field, built once and reused for every lookup.
+    resolve() returns {"item", "name", "query", "confidence", "method", "position"} or None,
+    names that could not be resolved are collected in self.unresolved.
+    """
+    def __init__(self, items: list[dict], name_field: str = "name", min_confidence: float = DEFAULT_MIN_CONFIDENCE, min_margin: float = DEFAULT_MIN_MARGIN, candidates: int = DEFAULT_CANDIDATES):
+        self.items = items
+        self.name_field = name_field
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self.candidates = candidates
+        self.unresolved: list[str] = []
+        self.match_counts = Counter()
+
+        self._names: list[str] = []
+        self._exact: dict[str, int] = {}
+        self._trigram_index: dict[str, list[int]] = {}
+        for position, item in enumerate(items):
+            name = item.get(name_field)
+            normalized = normalize_name(name) if isinstance(name, str) else ""
+            self._names.append(normalized)
+            if not normalized or normalized in self._exact:
+                # the first item wins for duplicated names
+                continue
+            self._exact[normalized] = position
+            for trigram in trigrams(normalized):
+                self._trigram_index.setdefault(trigram, []).append(position)
+
+    def __len__(self):
+        return len(self._exact)
+
+    def _match(self, query: str, position: int, confidence: float, method: str)-> dict:
+        return {
+            "item": self.items[position],
+            "name": self.items[position][self.name_field],
+            "query": query,
+            "confidence": round(confidence, 4),
+            "method": method,
+            "position": position
+        }
+
+    def lookup_exact(self, name: str)-> dict | None:
+        position = self._exact.get(normalize_name(name))
+        return self._match(name, position, 1.0, MATCH_EXACT) if position is not None else None
+
+    def lookup_fuzzy(self, name: str, limit: int = 1, exclude: set[int] | None = None)-> list[dict]:
+        """Best fuzzy matches above min_confidence, highest confidence first, items at `exclude` positions left out"""
+        normalized = normalize_name(name)
+        if not normalized:
+            return []
+        shared = Counter()
+        for trigram in trigrams(normalized):
+            for position in self._trigram_index.get(trigram, ()):
+                shared[position] += 1
+        scored = []
+        for position, _ in shared.most_common(self.candidates + len(exclude or ())):
+            if exclude and position in exclude:
+                continue
+            candidate = self._names[position]
+            longest = max(len(normalized), len(candidate))
+            max_distance = int(longest * (1 - self.min_confidence) + 1e-9)
+            distance = edit_distance(normalized, candidate, max_distance=max_distance)
+            if distance > max_distance:
+                continue
+            scored.append((-(1 - distance / longest), position))
+        scored.sort()
+        return [self._match(name, position, -score, MATCH_FUZZY) for score, position in scored[:limit]]
+
+    def _best_fuzzy(self, name: str, exclude: set[int] | None = None)-> dict | None:
+        """Best fuzzy match when it is clear of the runner-up by min_margin"""
+        fuzzy = self.lookup_fuzzy(name, limit=2, exclude=exclude)
+        if not fuzzy or (len(fuzzy) > 1 and fuzzy[0]["confidence"] - fuzzy[1]["confidence"] < self.min_margin):
+            return None
+        return fuzzy[0]
+
+    def _count(self, name: str, match: dict | None):
+        if match is None:
+            self.unresolved.append(name)
+            self.match_counts["unresolved"] += 1
+        else:
+            self.match_counts[match["method"]] += 1
+
+    def resolve(self, name: str, exclude: set[int] | None = None)-> dict | None:
+        """Exact match first, otherwise the best fuzzy match outside `exclude`, None (and recorded as unresolved) if neither"""
+        match = self.lookup_exact(name)
+        if match is None:
+            match = self._best_fuzzy(name, exclude=exclude)
+        self._count(name, match)
+        return match
+
+    def resolve_all(self, names: list[str])-> list[dict | None]:
+        """
+        Resolve a list of names that each stand for a different item: every exact match is claimed first,
+        fuzzy matches only go to unclaimed items (first name first), so a near miss never duplicates an item
+        """
+        matches = [self.lookup_exact(name) for name in names]
+        claimed = {match["position"] for match in matches if match is not None}
+        for index, name in enumerate(names):
+            if matches[index] is None:
+                matches[index] = self._best_fuzzy(name, exclude=claimed)
+                if matches[index] is not None:
+                    claimed.add(matches[index]["position"])
+        for name, match in zip(names, matches):
+            self._count(name, match)
+        return matches
+
+    def find_in_text(self, text: str, fuzzy: bool = False)-> list[dict]:
+        """
+        Query-time lookup: names mentioned in a free text question, in text order. Longer word spans
+        win ("Aragorn II" over "Aragorn"), each word belongs to at most one match.
+        Fuzzy matching of spans is opt-in since short words match too easily.
+        """
+        words = [word.strip(".,;:!?\"'()[]") for word in text.split()]
+        used = [False] * len(words)
+        matches = []
+        for size in range(min(MAX_QUERY_NAME_WORDS, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                if any(used[start:start + size]):
+                    continue
+                span = " ".join(words[start:start + size])
+                match = self.lookup_exact(span)
+                if match is None and fuzzy and len(span) >= 5:
+                    match = self._best_fuzzy(span)
+                if match is not None:
+                    used[start:start + size] = [True] * size
+                    matches.append((start, match))
+        return [match for _, match in sorted(matches, key=lambda pair: pair[0])]
+
+    def print_report(self, fuzzy_matches: list[dict] | None = None):
+        print(f"Name resolution: {self.match_counts[MATCH_EXACT]} exact, {self.match_counts[MATCH_FUZZY]} fuzzy, {self.match_counts['unresolved']} unresolved")
+        for match in fuzzy_matches or []:
+            print(f"  fuzzy: {match['query']!r} -> {match['name']!r} (confidence {match['confidence']:.2f})")
+        if self.unresolved:
+            print(f"Unresolved names: {', '.join(self.unresolved)}")
+
+
+def load_name_index(file_path: str | Path, name_field: str = "name", **index_kwargs)-> NameIndex:
+    """NameIndex over a records file (json, jsonl or parquet), e.g. lotr_characters.json for query-time lookup"""
+    return NameIndex(items=open_records(file_path), name_field=name_field, **index_kwargs)
@@ -0,0 +1,99 @@
+"""
+Passage-level indexing of characters.
+
+Instead of one text per character (truncated to fit the embedding window), every character becomes:
+- one "profile" passage with the basic fields (name, race, realm...)
+- biography and history split at sentence boundaries into passages of at most PASSAGE_MAX_TOKENS tokens,
+  consecutive passages share PASSAGE_OVERLAP_SENTENCES sentences so facts on a boundary stay searchable
+
+Each passage is its own point in the passage collection, with the parent character_id (the point id of
+the character collection) in its payload. Searches group hits by character_id: the top characters come
+back with only their best matching passages, nothing is truncated at indexing time.
+"""
+
+import re
+import uuid
+from os import environ
+from typing import Callable
+
+from composables.rate_limit import estimate_tokens
+
+PASSAGE_COLLECTION_NAME = environ.get('PASSAGE_COLLECTION_NAME', 'lotr-character-passages')
+PASSAGE_MAX_TOKENS = int(environ.get('PASSAGE_MAX_TOKENS', 300))
+PASSAGE_OVERLAP_SENTENCES = 1
+PASSAGES_PER_CHARACTER = 3
+PASSAGE_SECTIONS = ("biography", "history")
+PROFILE_SECTION = "profile"
+PROFILE_FIELDS = ('race', 'gender', 'realm', 'culture', 'birth', 'death', 'spouse', 'hair', 'height')
+PARENT_FIELD = "character_id"
+
+# SEARCH_GRANULARITY=passage makes search() query the passage collection grouped by character
+CHARACTER_GRANULARITY = "character"
+PASSAGE_GRANULARITY = "passage"
+SEARCH_GRANULARITY = environ.get('SEARCH_GRANULARITY', CHARACTER_GRANULARITY)
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+def split_sentences(text: str)-> list[str]:
+    return [sentence for paragraph in text.split("\n") for sentence in SENTENCE_BOUNDARY.split(paragraph.strip()) if sentence]
+
+
+def split_passages(text: str, max_tokens: int = PASSAGE_MAX_TOKENS, overlap_sentences: int = PASSAGE_OVERLAP_SENTENCES, count_tokens: Callable[[str], int] = estimate_tokens)-> list[str]:
+    """
+    Consecutive sentences packed into passages of at most max_tokens (a longer sentence is a passage of its own),
+    each passage starts with the last overlap_sentences sentences of the previous one
+    """
+    passages = []
+    current, current_tokens, fresh = [], 0, 0
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence)
+        if fresh and current_tokens + tokens > max_tokens:
+            passages.append(" ".join(current))
+            current = current[-overlap_sentences:] if overlap_sentences else []
+            current_tokens = sum(count_tokens(kept) for kept in current)
+            fresh = 0
+            # the overlap is dropped when it leaves no room for the new sentence
+            if current_tokens + tokens > max_tokens:
+                current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens
+        fresh += 1
+    if fresh:
+        passages.append(" ".join(current))
+    return passages
+
+
+def passage_id(character_id: str, section: str, index: int)-> str:
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"lotr-passages/{character_id}/{section}/{index}").hex
+
+
+def character_passages(character: dict, character_id: str, max_tokens: int = PASSAGE_MAX_TOKENS, count_tokens: Callable[[str], int] = estimate_tokens)-> list[dict]:
+    """
+    Passages of one character. "text" is what gets embedded (passage prefixed with the character's name
+    and section, so the vector knows whose passage it is), "passage" is what goes into the LLM context.
+    """
+    name = character.get('name') or 'Unknown'
+    profile = "\n".join([f"Name: {name}"] + [f"{field.title()}: {character[field]}" for field in PROFILE_FIELDS if character.get(field)])
+    sections = [(PROFILE_SECTION, [profile])]
+    sections.extend(
+        (section, split_passages(character[section], max_tokens=max_tokens, count_tokens=count_tokens))
+        for section in PASSAGE_SECTIONS
+        if character.get(section) and character[section].strip()
+    )
+
+    passages = []
+    for section, texts in sections:
+        for index, passage in enumerate(texts):
+            text = passage if section == PROFILE_SECTION else f"Name: {name}\n{section.title()}: {passage}"
+            passages.append({
+                "id": passage_id(character_id, section, index),
+                PARENT_FIELD: character_id,
+                "name": name,
+                "section": section,
+                "passage_index": index,
+                "passage": passage,
+                "text": text,
+                "token_count": count_tokens(text)
+            })
+    return passages
@@ -0,0 +1,162 @@
+"""
+Incremental pipeline runner.
+
+A pipeline is an ordered list of stages, each declaring the files it reads and writes. After a stage
+runs, the content hashes of its inputs, its params and its outputs are saved in a state file. On the next
+run a stage is skipped when its inputs and params hash the same and its outputs are still on disk
+unchanged, so only stages downstream of a real change re-run: a stage that re-runs but writes
+byte-identical outputs does not invalidate the stages after it.
+"""
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Callable
+
+project_root = Path(__file__).resolve().parent.parent
+
+DEFAULT_PIPELINE_STATE_PATH = project_root / ".cache" / "pipeline_state.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+STAGE_RAN = "ran"
+STAGE_SKIPPED = "skipped"
+STAGE_FAILED = "failed"
+
+
+def file_fingerprint(file_path: str | Path)-> str | None:
+    """sha256 of the file content, None when the file does not exist"""
+    file_path = Path(file_path)
+    if not file_path.is_file():
+        return None
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Stage:
+    """
+    One pipeline step: run() is called without arguments and must write every path in outputs.
+    params holds settings that change the outputs (model, dimensions, limits...), they are part of the fingerprint.
+    """
+    def __init__(self, name: str, run: Callable[[], None], inputs: list[str | Path] | None = None, outputs: list[str | Path] | None = None, params: dict | None = None):
+        self.name = name
+        self.run = run
+        self.inputs = [Path(path) for path in inputs or []]
+        self.outputs = [Path(path) for path in outputs or []]
+        self.params = params or {}
+
+    def input_fingerprint(self)-> str:
+        digest = hashlib.sha256()
+        digest.update(json.dumps(self.params, sort_keys=True, default=str).encode('utf-8'))
+        for path in self.inputs:
+            digest.update(f"{path}:{file_fingerprint(path)}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def output_fingerprints(self)-> dict[str, str | None]:
+        return {str(path): file_fingerprint(path) for path in self.outputs}
+
+
+class Pipeline:
+    def __init__(self, stages: list[Stage], state_path: str | Path = DEFAULT_PIPELINE_STATE_PATH):
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicated stage names: {names}")
+        self.stages = stages
+        self.state_path = Path(state_path)
+
+    def load_state(self)-> dict:
+        if not self.state_path.exists():
+            return {}
+        with open(self.state_path, 'r') as file:
+            return json.load(file)
+
+    def save_state(self, state: dict):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as file:
+            json.dump(state, file, indent=2)
+        tmp_path.replace(self.state_path)
+
+    def select(self, from_stage: str | None = None, until_stage: str | None = None, only: list[str] | None = None)-> list[Stage]:
+        names = [stage.name for stage in self.stages]
+        for name in [from_stage, until_stage, *(only or [])]:
+            if name is not None and name not in names:
+                raise ValueError(f"Unknown stage {name!r}, expected one of {names}")
+        start = names.index(from_stage) if from_stage else 0
+        end = names.index(until_stage) + 1 if until_stage else len(names)
+        return [stage for stage in self.stages[start:end] if only is None or stage.name in only]
+
+    def is_up_to_date(self, stage: Stage, state: dict)-> bool:
+        recorded = state.get(stage.name)
+        if recorded is None or recorded.get("input_fingerprint") != stage.input_fingerprint():
+            return False
+        current_outputs = stage.output_fingerprints()
+        return None not in current_outputs.values() and current_outputs == recorded.get("outputs")
+
+    def status(self, stages: list[Stage] | None = None)-> list[dict]:
+        """Which stages would run, without running anything (a stale stage also makes its dependents stale)"""
+        state = self.load_state()
+        stale_outputs = set()
+        rows = []
+        for stage in stages or self.stages:
+            stale = not self.is_up_to_date(stage, state) or any(path in stale_outputs for path in stage.inputs)
+            if stale:
+                stale_outputs.update(stage.outputs)
+            recorded = state.get(stage.name, {})
+            rows.append({"stage": stage.name, "up_to_date": not stale, "last_run_seconds": recorded.get("seconds"), "last_run_at": recorded.get("finished_at")})
+        return rows
+
+    def run(self, stages: list[Stage] | None = None, force: list[str] | None = None)-> list[dict]:
+        """
+        Run the stages in order, skipping up to date ones. Stages named in force always run.
+        State is saved after every stage so an interrupted run resumes where it stopped.
+        Returns one timing row per stage, stops at the first failing stage.
+        """
+        state = self.load_state()
+        force = set(force or [])
+        timings = []
+        for stage in stages or self.stages:
+            if stage.name not in force and self.is_up_to_date(stage, state):
+                print(f"[{stage.name}] up to date, skipped")
+                timings.append({"stage": stage.name, "status": STAGE_SKIPPED, "seconds": 0.0})
+                continue
+
+            print(f"[{stage.name}] running...")
+            input_fingerprint = stage.input_fingerprint()
+            start = time.perf_counter()
+            try:
+                stage.run()
+            except Exception as e:
+                seconds = time.perf_counter() - start
+                print(f"[{stage.name}] failed after {seconds:.2f}s: {type(e).__name__}: {str(e)}")
+                timings.append({"stage": stage.name, "status": STAGE_FAILED, "seconds": seconds})
+                break
+            seconds = time.perf_counter() - start
+
+            outputs = stage.output_fingerprints()
+            missing = [path for path, fingerprint in outputs.items() if fingerprint is None]
+            if missing:
+                print(f"[{stage.name}] failed after {seconds:.2f}s: outputs not written: {', '.join(missing)}")
+                timings.append({"stage": stage.name, "status": STAGE_FAILED, "seconds": seconds})
+                break
+            changed = outputs != state.get(stage.name, {}).get("outputs")
+            state[stage.name] = {
+                "input_fingerprint": input_fingerprint,
+                "outputs": outputs,
+                "seconds": round(seconds, 3),
+                "finished_at": time.time()
+            }
+            self.save_state(state)
+            print(f"[{stage.name}] done in {seconds:.2f}s ({'outputs changed' if changed else 'outputs unchanged'})")
+            timings.append({"stage": stage.name, "status": STAGE_RAN, "seconds": seconds})
+        return timings
+
+
+def print_timings(timings: list[dict]):
+    print("\nStage timings:")
+    for row in timings:
+        print(f"  {row['stage']:<12} {row['status']:<8} {row['seconds']:8.2f}s")
+    print(f"  {'total':<12} {'':<8} {sum(row['seconds'] for row in timings):8.2f}s")
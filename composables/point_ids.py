@@ -0,0 +1,49 @@
+"""
+Point ids of the character collection.
+
+Golden questions, exported records and evaluation results refer to characters by point id, so a rebuild
+has to give every character the id it had before. The exported records (src/assets/qdrant_records.json)
+are the reference: a character found there keeps its id, a new one gets a uuid5 of its name.
+Callers resolve the records file next to their own script: in the worker container src/ is mounted at
+/scripts and composables/ at /composables, a path relative to this module would miss it.
+"""
+
+import json
+import uuid
+from pathlib import Path
+
+
+def known_point_ids(file_path: str | Path)-> dict[str, str]:
+    """{name: point id} of the exported points, the first point of a name wins"""
+    if not Path(file_path).exists():
+        print(f"{file_path} not found, characters get new point ids")
+        return {}
+    with open(file_path, 'r') as file:
+        records = json.load(file)
+    ids = {}
+    for record in records:
+        ids.setdefault(record["payload"].get("name") or '', str(record["id"]))
+    return ids
+
+
+def point_id(name: str, occurrence: int = 0, known_ids: dict[str, str] | None = None)-> str:
+    """
+    Point id of a character: the exported id of that name when there is one (so golden questions and
+    evaluation results keep matching), otherwise a uuid5 of the name that stays the same on every re-run
+    """
+    key = name if occurrence == 0 else f"{name}#{occurrence}"
+    if occurrence == 0 and known_ids and name in known_ids:
+        return known_ids[name]
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"lotr-characters/{key}"))
+
+
+def character_ids(characters: list[dict], known_ids: dict[str, str])-> list[str]:
+    """point_id of every character, namesakes get an occurrence suffix in input order"""
+    ids = []
+    name_occurrences = {}
+    for character in characters:
+        name = character.get('name') or ''
+        occurrence = name_occurrences.get(name, 0)
+        name_occurrences[name] = occurrence + 1
+        ids.append(point_id(name=name, occurrence=occurrence, known_ids=known_ids))
+    return ids
@@ -0,0 +1,305 @@
+"""
+Local stand-in for the Jina, OpenAI and Anthropic APIs, for load tests and benchmarks without API spend.
+
+- POST /v1/embeddings        Jina: feature-hashed vectors, deterministic, texts sharing words get close vectors
+- POST /v1/chat/completions  OpenAI: canned answers, golden question arrays or judge JSON depending on the prompt
+- POST /v1/messages          Anthropic: same canned content in the messages format
+- GET  /health, GET /stats   request, throttle and error counters per provider
+
+Every provider has its own ProviderProfile: lognormal latency, requests/tokens per minute above which the
+emulator answers 429 with Retry-After, and a share of injected 5xx errors. Randomness is seeded, so a run is
+reproducible. The real clients point at it by URL (emulator_environment() also moves the response caches aside):
+    JINA_URL=http://127.0.0.1:8090/v1/embeddings  OPENAI_BASE_URL=http://127.0.0.1:8090/v1  ANTHROPIC_BASE_URL=http://127.0.0.1:8090
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from composables.rate_limit import ANTHROPIC, JINA, OPENAI, estimate_tokens
+
+project_root = Path(__file__).resolve().parent.parent
+
+EMULATOR_CACHE_DIR = project_root / ".cache" / "emulator"
+DEFAULT_EMULATOR_HOST = "127.0.0.1"
+DEFAULT_EMULATOR_PORT = 8090
+DEFAULT_DIMENSIONS = 512
+DEFAULT_SEED = 42
+EMULATED_PROVIDERS = (JINA, OPENAI, ANTHROPIC)
+BIGRAM_WEIGHT = 0.5
+WORD = re.compile(r"\w+")
+NAME_FIELD = re.compile(r"""["']name["']\s*:\s*["']([^"']+)["']""")
+
+
+class ProviderProfile:
+    def __init__(self, latency_ms: float, latency_sigma: float = 0.4, ms_per_1k_tokens: float = 0.0, requests_per_minute: float | None = None, tokens_per_minute: float | None = None, error_rate: float = 0.0, error_statuses: tuple[int, ...] = (500, 503)):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+
+    def to_dict(self)-> dict:
+        return dict(vars(self))
+
+
+def default_profiles()-> dict[str, ProviderProfile]:
+    """Roughly what the real APIs look like from here, without rate limits or errors"""
+    return {
+        JINA: ProviderProfile(latency_ms=150, ms_per_1k_tokens=20),
+        OPENAI: ProviderProfile(latency_ms=700, ms_per_1k_tokens=30),
+        ANTHROPIC: ProviderProfile(latency_ms=900, ms_per_1k_tokens=30, error_statuses=(500, 529))
+    }
+
+
+def hashed_embedding(text: str, dimensions: int = DEFAULT_DIMENSIONS)-> list[float]:
+    """Unit vector of hashed words and word bigrams with random signs, the same text gives the same vector in every process"""
+    words = WORD.findall(text.lower())
+    features = [(word, 1.0) for word in words] + [(f"{first} {second}", BIGRAM_WEIGHT) for first, second in zip(words, words[1:])]
+    vector = [0.0] * dimensions
+    for feature, weight in features:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        vector[digest % dimensions] += weight if digest >> 63 else -weight
+    norm = math.sqrt(sum(value * value for value in vector))
+    if not norm:
+        vector[0], norm = 1.0, 1.0
+    return [value / norm for value in vector]
+
+
+def _prompt_seed(*texts: str)-> int:
+    return int.from_bytes(hashlib.blake2b("\n".join(texts).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def canned_completion(system_prompt: str, user_prompt: str)-> str:
+    """Content shaped like what each of our prompts expects back, derived from the prompt only"""
+    seed = _prompt_seed(system_prompt, user_prompt)
+    if "generates evaluation questions" in system_prompt:
+        match = NAME_FIELD.search(user_prompt)
+        name = match.group(1) if match else "this character"
+        topics = ["the race", "the realm", "the spouse", "the birth date", "the culture", "the death date", "the family"]
+        offset = seed % len(topics)
+        return json.dumps([f"What is {topics[(offset + i) % len(topics)]} of {name}?" for i in range(5)])
+    if '"relevance"' in system_prompt:
+        scores = [3 - (seed >> shift) % 2 for shift in (0, 8, 16, 24)]
+        return json.dumps({
+            "relevance": scores[0], "groundedness": scores[1], "completeness": scores[2], "faithfulness": scores[3],
+            "comments": "Emulated verdict."
+        })
+    match = NAME_FIELD.search(user_prompt)
+    return f"According to the provided context, {match.group(1) if match else 'the character'} is the best match for this question."
+
+
+class _Budget:
+    """Requests and tokens per minute of one provider, refilled continuously"""
+    def __init__(self, profile: ProviderProfile):
+        self.profile = profile
+        self.requests = profile.requests_per_minute or 0.0
+        self.tokens = profile.tokens_per_minute or 0.0
+        self.updated = time.monotonic()
+
+    def take(self, tokens: int)-> float | None:
+        """None when the request fits, otherwise the seconds until it would"""
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        waits = []
+        if self.profile.requests_per_minute:
+            self.requests = min(self.profile.requests_per_minute, self.requests + elapsed * self.profile.requests_per_minute / 60)
+            if self.requests < 1:
+                waits.append((1 - self.requests) * 60 / self.profile.requests_per_minute)
+        if self.profile.tokens_per_minute:
+            self.tokens = min(self.profile.tokens_per_minute, self.tokens + elapsed * self.profile.tokens_per_minute / 60)
+            if self.tokens < min(tokens, self.profile.tokens_per_minute):
+                waits.append((min(tokens, self.profile.tokens_per_minute) - self.tokens) * 60 / self.profile.tokens_per_minute)
+        if waits:
+            return max(waits)
+        self.requests -= 1
+        self.tokens -= tokens
+        return None
+
+
+class ProviderEmulator:
+    def __init__(self, profiles: dict[str, ProviderProfile] | None = None, seed: int = DEFAULT_SEED, latency_scale: float = 1.0):
+        self.profiles = {**default_profiles(), **(profiles or {})}
+        self.latency_scale = latency_scale
+        self._random = random.Random(seed)
+        self._budgets = {provider: _Budget(profile) for provider, profile in self.profiles.items()}
+        self._lock = threading.Lock()
+        self.counters = {provider: Counter() for provider in self.profiles}
+
+    def admit(self, provider: str, tokens: int)-> tuple[int, float | None, float]:
+        """(status, retry_after, latency in seconds) of one request: 200, 429 over the limits or an injected error"""
+        profile = self.profiles[provider]
+        with self._lock:
+            counters = self.counters[provider]
+            counters["requests"] += 1
+            retry_after = self._budgets[provider].take(tokens)
+            if retry_after is not None:
+                counters["throttled"] += 1
+                return 429, retry_after, 0.0
+            latency = profile.latency_ms * math.exp(profile.latency_sigma * self._random.gauss(0, 1)) + profile.ms_per_1k_tokens * tokens / 1000
+            if profile.error_rate and self._random.random() < profile.error_rate:
+                counters["errors"] += 1
+                return self._random.choice(profile.error_statuses), None, latency * self.latency_scale / 1000
+            counters["tokens"] += tokens
+            return 200, None, latency * self.latency_scale / 1000
+
+    def stats(self)-> dict:
+        with self._lock:
+            return {provider: {"profile": self.profiles[provider].to_dict(), **counters} for provider, counters in self.counters.items()}
+
+    def embeddings(self, body: dict)-> tuple[dict, int]:
+        texts = body.get("input") or []
+        if isinstance(texts, str):
+            texts = [texts]
+        texts = [text if isinstance(text, str) else text.get("text", "") for text in texts]
+        dimensions = int(body.get("dimensions") or DEFAULT_DIMENSIONS)
+        tokens = estimate_tokens(*texts)
+        return {
+            "model": body.get("model"),
+            "object": "list",
+            "usage": {"total_tokens": tokens, "prompt_tokens": tokens},
+            "data": [{"object": "embedding", "index": index, "embedding": hashed_embedding(text, dimensions)} for index, text in enumerate(texts)]
+        }, tokens
+
+    def chat_completion(self, body: dict)-> tuple[dict, int]:
+        messages = body.get("messages") or []
+        system_prompt = "\n".join(str(message.get("content")) for message in messages if message.get("role") == "system")
+        user_prompt = "\n".join(str(message.get("content")) for message in messages if message.get("role") != "system")
+        content = canned_completion(system_prompt, user_prompt)
+        prompt_tokens, completion_tokens = estimate_tokens(system_prompt, user_prompt), estimate_tokens(content)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop", "logprobs": None}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        }, prompt_tokens + completion_tokens
+
+    def message(self, body: dict)-> tuple[dict, int]:
+        system_prompt = body.get("system") or ""
+        if isinstance(system_prompt, list):
+            system_prompt = "\n".join(block.get("text", "") for block in system_prompt)
+        user_prompt = "\n".join(
+            message["content"] if isinstance(message.get("content"), str) else "\n".join(block.get("text", "") for block in message.get("content") or [])
+            for message in body.get("messages") or []
+        )
+        content = canned_completion(system_prompt, user_prompt)
+        input_tokens, output_tokens = estimate_tokens(system_prompt, user_prompt), estimate_tokens(content)
+        return {
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model"),
+            "content": [{"type": "text", "text": content}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens}
+        }, input_tokens + output_tokens
+
+
+ROUTES = {
+    "/v1/embeddings": (JINA, ProviderEmulator.embeddings),
+    "/v1/chat/completions": (OPENAI, ProviderEmulator.chat_completion),
+    "/v1/messages": (ANTHROPIC, ProviderEmulator.message)
+}
+
+
+def error_body(provider: str, status: int)-> dict:
+    """Error payload in the shape each SDK parses"""
+    kind = "rate_limit_error" if status == 429 else ("overloaded_error" if status == 529 else "api_error")
+    if provider == ANTHROPIC:
+        return {"type": "error", "error": {"type": kind, "message": f"emulated {status}"}}
+    return {"error": {"message": f"emulated {status}", "type": kind, "code": status}, "detail": f"emulated {status}"}
+
+
+class EmulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    emulator: ProviderEmulator = None
+    quiet = True
+
+    def log_message(self, format: str, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: dict, headers: dict | None = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif path == "/stats":
+            self._send_json(200, self.emulator.stats())
+        else:
+            self._send_json(404, {"error": f"no route for GET {path}"})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "request body must be JSON"})
+            return
+        if path not in ROUTES:
+            self._send_json(404, {"error": f"no route for POST {path}"})
+            return
+        provider, build = ROUTES[path]
+        response, tokens = build(self.emulator, body)
+        status, retry_after, latency = self.emulator.admit(provider, tokens=tokens)
+        if status == 429:
+            self._send_json(429, error_body(provider, status), headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+            return
+        time.sleep(latency)
+        if status != 200:
+            self._send_json(status, error_body(provider, status))
+        else:
+            self._send_json(200, response)
+
+
+class EmulatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def create_emulator_server(emulator: ProviderEmulator, host: str = DEFAULT_EMULATOR_HOST, port: int = DEFAULT_EMULATOR_PORT, quiet: bool = True)-> EmulatorServer:
+    handler = type("BoundEmulatorHandler", (EmulatorHandler,), {"emulator": emulator, "quiet": quiet})
+    return EmulatorServer((host, port), handler)
+
+
+def start_emulator(emulator: ProviderEmulator | None = None, host: str = DEFAULT_EMULATOR_HOST, port: int = 0)-> tuple[EmulatorServer, str]:
+    """Serve in a daemon thread (port 0 picks a free one), returns (server, base url), stop with server.shutdown()"""
+    server = create_emulator_server(emulator=emulator or ProviderEmulator(), host=host, port=port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def emulator_environment(base_url: str)-> dict[str, str]:
+    """
+    Environment variables that point the Jina, OpenAI and Anthropic clients at an emulator.
+    Emulated responses get their own LLM / embedding caches, they must never be served to a real run.
+    """
+    return {
+        "JINA_URL": f"{base_url}/v1/embeddings",
+        "OPENAI_BASE_URL": f"{base_url}/v1",
+        "ANTHROPIC_BASE_URL": base_url,
+        "LLM_CACHE_PATH": str(EMULATOR_CACHE_DIR / "llm_cache.sqlite"),
+        "EMBEDDING_CACHE_PATH": str(EMULATOR_CACHE_DIR / "embedding_cache.sqlite")
+    }
@@ -0,0 +1,60 @@
+"""
+Qdrant backend selection.
+
+QDRANT_BACKEND picks where collections live:
+- remote (default): the Qdrant server at QDRANT_URL / QDRANT_API_KEY (docker-compose.yaml)
+- local:            embedded on-disk storage in QDRANT_PATH (.cache/qdrant), no server, one process at a time
+- memory:           embedded in-memory storage, gone when the process exits
+
+Embedded storage is only visible to the client that opened it (and a local path can only be opened once),
+so setup, search and export share one client per process through get_qdrant_client().
+"""
+
+import threading
+from os import environ
+from pathlib import Path
+
+from qdrant_client import QdrantClient
+
+project_root = Path(__file__).resolve().parent.parent
+
+REMOTE_BACKEND = "remote"
+LOCAL_BACKEND = "local"
+MEMORY_BACKEND = "memory"
+QDRANT_BACKENDS = (REMOTE_BACKEND, LOCAL_BACKEND, MEMORY_BACKEND)
+DEFAULT_QDRANT_PATH = project_root / ".cache" / "qdrant"
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def qdrant_backend()-> str:
+    # read when called, scripts load .env after their imports
+    return environ.get('QDRANT_BACKEND', REMOTE_BACKEND).lower()
+
+
+def create_qdrant_client(backend: str | None = None, url: str | None = None, api_key: str | None = None, path: str | Path | None = None)-> QdrantClient:
+    """New client for a backend (QDRANT_* settings by default), prefer get_qdrant_client() unless a separate store is wanted"""
+    backend = backend or qdrant_backend()
+    if backend == REMOTE_BACKEND:
+        return QdrantClient(url=url or environ.get('QDRANT_URL'), api_key=api_key or environ.get('QDRANT_API_KEY'))
+    if backend == LOCAL_BACKEND:
+        path = Path(path or environ.get('QDRANT_PATH') or DEFAULT_QDRANT_PATH)
+        path.mkdir(parents=True, exist_ok=True)
+        return QdrantClient(path=str(path))
+    if backend == MEMORY_BACKEND:
+        return QdrantClient(":memory:")
+    raise ValueError(f"Unknown QDRANT_BACKEND '{backend}', expected one of {', '.join(QDRANT_BACKENDS)}")
+
+
+def get_qdrant_client()-> QdrantClient:
+    """The process-wide client of the configured backend"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = create_qdrant_client()
+        return _shared_client
+
+
+def is_remote_backend()-> bool:
+    return qdrant_backend() == REMOTE_BACKEND
@@ -0,0 +1,246 @@
+"""
+Process-wide rate limit governor for the Jina, OpenAI and Anthropic APIs.
+
+Every provider gets two token buckets, requests/min and tokens/min, shared by all threads of the
+process. Calls wait for both buckets instead of sleeping a fixed delay. The effective rate adapts (AIMD):
+a 429 or 5xx halves it and pauses the provider for Retry-After (or a jittered backoff), and every
+successful call adds a small step back until the configured limit is reached again.
+
+Limits come from <PROVIDER>_RPM / <PROVIDER>_TPM environment variables (e.g. JINA_RPM=500).
+Sharded runs split them with set_rate_share(1 / shard_count) since every shard is its own process.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from os import environ
+from typing import Callable
+
+import requests
+
+from composables.run_report import run_report
+
+JINA = "jina"
+OPENAI = "openai"
+ANTHROPIC = "anthropic"
+
+DEFAULT_LIMITS = {
+    JINA: {"requests_per_minute": 500, "tokens_per_minute": 1_000_000},
+    OPENAI: {"requests_per_minute": 500, "tokens_per_minute": 200_000},
+    ANTHROPIC: {"requests_per_minute": 50, "tokens_per_minute": 50_000},
+}
+BURST_SECONDS = 10.0
+MIN_RATE_FRACTION = 0.05
+DECREASE_FACTOR = 0.5
+INCREASE_STEP = 0.02
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 1.0
+RETRYABLE_STATUS = {429, 500, 502, 503, 504, 529}
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)
+
+
+class ProviderHTTPError(Exception):
+    """Non-200 answer from a provider, keeps the status and Retry-After for the governor"""
+    def __init__(self, message: str, status_code: int, retry_after: float | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: str | None)-> float | None:
+    """Retry-After header in seconds (delta-seconds or HTTP date), None when absent or invalid"""
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+def estimate_tokens(*texts: str | None)-> int:
+    """Rough token estimation (1 token ≈ 4 characters for English text)"""
+    return sum(len(text) // 4 + 1 for text in texts if text)
+
+
+def error_status(error: Exception)-> tuple[int | None, float | None]:
+    """(HTTP status, Retry-After seconds) of a provider error: ProviderHTTPError, requests, openai or anthropic"""
+    if isinstance(error, ProviderHTTPError):
+        return error.status_code, error.retry_after
+    response = getattr(error, "response", None)
+    status_code = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None) or {}
+    return status_code, parse_retry_after(headers.get("Retry-After") or headers.get("retry-after"))
+
+
+class TokenBucket:
+    """Refills rate_per_minute / 60 units per second up to capacity, the level may go negative to settle usage"""
+    def __init__(self, rate_per_minute: float, capacity: float):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float, rate_scale: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate_per_second * rate_scale)
+        self.updated = now
+
+    def wait_time(self, amount: float, rate_scale: float)-> float:
+        """Seconds until amount units are available (amounts above capacity only need a full bucket)"""
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0.0) / (self.rate_per_second * rate_scale)
+
+
+class ProviderLimiter:
+    def __init__(self, name: str, requests_per_minute: float, tokens_per_minute: float | None = None, share: float = 1.0):
+        self.name = name
+        self._lock = threading.Lock()
+        self.rate_scale = 1.0
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.waited_seconds = 0.0
+        self.configure(requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute, share=share)
+
+    def configure(self, requests_per_minute: float, tokens_per_minute: float | None = None, share: float = 1.0):
+        with self._lock:
+            self.requests_per_minute = requests_per_minute
+            self.tokens_per_minute = tokens_per_minute
+            self.share = share
+            burst = BURST_SECONDS / 60.0
+            self.request_bucket = TokenBucket(requests_per_minute * share, capacity=max(requests_per_minute * share * burst, 1.0))
+            self.token_bucket = TokenBucket(tokens_per_minute * share, capacity=max(tokens_per_minute * share * burst, 1.0)) if tokens_per_minute else None
+
+    def acquire(self, tokens: int = 0):
+        """Block until one request and `tokens` tokens fit in the current rate, then take them"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    self.request_bucket.refill(now, self.rate_scale)
+                    wait = self.request_bucket.wait_time(1, self.rate_scale)
+                    if self.token_bucket is not None:
+                        self.token_bucket.refill(now, self.rate_scale)
+                        wait = max(wait, self.token_bucket.wait_time(tokens, self.rate_scale))
+                    if wait <= 0:
+                        self.request_bucket.level -= 1
+                        if self.token_bucket is not None:
+                            self.token_bucket.level -= min(tokens, self.token_bucket.capacity)
+                        return
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+    def try_acquire(self, tokens: int = 0)-> bool:
+        """Take one request and `tokens` tokens only if they are available right now"""
+        with self._lock:
+            now = time.monotonic()
+            if self.blocked_until > now:
+                return False
+            self.request_bucket.refill(now, self.rate_scale)
+            if self.request_bucket.wait_time(1, self.rate_scale) > 0:
+                return False
+            if self.token_bucket is not None:
+                self.token_bucket.refill(now, self.rate_scale)
+                if self.token_bucket.wait_time(tokens, self.rate_scale) > 0:
+                    return False
+                self.token_bucket.level -= min(tokens, self.token_bucket.capacity)
+            self.request_bucket.level -= 1
+            return True
+
+    def settle(self, estimated_tokens: int, actual_tokens: int | None):
+        """Correct the token bucket once the real usage of a call is known"""
+        if actual_tokens is None or self.token_bucket is None:
+            return
+        with self._lock:
+            self.token_bucket.level -= actual_tokens - min(estimated_tokens, self.token_bucket.capacity)
+
+    def on_success(self):
+        with self._lock:
+            self.rate_scale = min(1.0, self.rate_scale + INCREASE_STEP)
+
+    def on_throttle(self, retry_after: float | None, attempt: int, backoff: float = DEFAULT_BACKOFF):
+        """Multiplicative decrease, and pause every caller of this provider until Retry-After (or a jittered backoff)"""
+        pause = retry_after if retry_after is not None else random.uniform(0, backoff * (2 ** attempt))
+        with self._lock:
+            self.throttled += 1
+            self.rate_scale = max(MIN_RATE_FRACTION, self.rate_scale * DECREASE_FACTOR)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+
+    def call(self, fn: Callable[[], object], tokens: int = 0, usage: Callable[[object], int | None] | None = None, retries: int = DEFAULT_RETRIES, transient_errors: tuple = ())-> object:
+        """
+        fn() under the limiter: waits for capacity, retries 429/5xx/transient errors with backoff,
+        settles the token bucket with usage(result) when given. Other errors are raised immediately.
+        """
+        for attempt in range(retries + 1):
+            self.acquire(tokens=tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                status_code, retry_after = error_status(e)
+                if status_code in RETRYABLE_STATUS:
+                    self.on_throttle(retry_after=retry_after, attempt=attempt)
+                elif isinstance(e, TRANSIENT_ERRORS + tuple(transient_errors)):
+                    time.sleep(random.uniform(0, DEFAULT_BACKOFF * (2 ** attempt)))
+                else:
+                    raise
+                if attempt == retries:
+                    run_report.record_failure(self.name)
+                    raise
+                run_report.record_retry(self.name)
+                print(f"{self.name}: {type(e).__name__} ({status_code or 'no status'}), retry {attempt + 1}/{retries} at {self.rate_scale:.0%} of the rate limit")
+                continue
+            self.on_success()
+            if usage is not None:
+                self.settle(estimated_tokens=tokens, actual_tokens=usage(result))
+            return result
+
+    def stats(self)-> dict:
+        return {
+            "provider": self.name,
+            "requests_per_minute": self.requests_per_minute * self.share,
+            "tokens_per_minute": self.tokens_per_minute * self.share if self.tokens_per_minute else None,
+            "rate_scale": round(self.rate_scale, 3),
+            "throttled": self.throttled,
+            "waited_seconds": round(self.waited_seconds, 2)
+        }
+
+
+_limiters: dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+_rate_share = 1.0
+
+
+def _configured_limits(provider: str)-> dict:
+    defaults = DEFAULT_LIMITS.get(provider, {"requests_per_minute": 60, "tokens_per_minute": None})
+    prefix = provider.upper()
+    tokens_per_minute = environ.get(f"{prefix}_TPM", defaults["tokens_per_minute"])
+    return {
+        "requests_per_minute": float(environ.get(f"{prefix}_RPM", defaults["requests_per_minute"])),
+        "tokens_per_minute": float(tokens_per_minute) if tokens_per_minute else None
+    }
+
+
+def get_limiter(provider: str)-> ProviderLimiter:
+    """The process-wide limiter of a provider, created on first use"""
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = ProviderLimiter(name=provider, share=_rate_share, **_configured_limits(provider))
+        return _limiters[provider]
+
+
+def set_rate_share(share: float):
+    """Use only this fraction of every provider limit, e.g. 1 / shard_count when N processes share one API key"""
+    global _rate_share
+    with _limiters_lock:
+        _rate_share = share
+        for provider, limiter in _limiters.items():
+            limiter.configure(share=share, **_configured_limits(provider))
+
+
+def print_rate_limit_stats():
+    for limiter in _limiters.values():
+        stats = limiter.stats()
+        print(f"Rate limit {stats['provider']}: throttled {stats['throttled']}x, waited {stats['waited_seconds']}s, now at {stats['rate_scale']:.0%} of {stats['requests_per_minute']:.0f} rpm")
@@ -0,0 +1,245 @@
+"""
+Throughput and cost accounting for long-running jobs (ingest, question generation, evaluations).
+
+API calls report to the process-wide `run_report` (requests, retries, failures, tokens, cache hits),
+jobs wrap their work in track_run(), which writes one JSON summary per run:
+
+    with track_run("questions", limit=100) as report:
+        for record in records:
+            generate_question(record)
+            report.add_items(1)
+
+    -> .cache/run_reports/questions_20250101-120000.json
+       items/s, requests/s, tokens/s, retries, cache hit rate and estimated cost per provider
+
+compare_reports() / src/compare_runs.py put two summaries side by side so throughput regressions show up.
+Costs are estimates from list prices per million tokens (PRICES_PER_MILLION_TOKENS, override with
+MODEL_PRICES='{"model": [input, output]}'), cache hits cost nothing.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from os import environ
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+
+DEFAULT_RUN_REPORT_DIR = environ.get('RUN_REPORT_DIR') or project_root / ".cache" / "run_reports"
+# USD per million (input, output) tokens
+PRICES_PER_MILLION_TOKENS = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "claude-3-5-haiku-20241022": (0.80, 4.00),
+    "jina-embeddings-v4": (0.05, 0.0),
+    **{model: tuple(prices) for model, prices in json.loads(environ.get('MODEL_PRICES') or '{}').items()}
+}
+REGRESSION_THRESHOLD = 0.10
+
+RUN_COMPLETED = "completed"
+RUN_FAILED = "failed"
+RUN_INTERRUPTED = "interrupted"
+
+# higher is better for these, lower is better for the others
+THROUGHPUT_METRICS = ("items_per_second", "requests_per_second", "tokens_per_second", "cache_hit_rate")
+
+
+def estimate_cost(model: str | None, prompt_tokens: int, completion_tokens: int)-> float:
+    input_price, output_price = PRICES_PER_MILLION_TOKENS.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def _empty_counters()-> dict:
+    return {
+        "models": set(),
+        "requests": 0,
+        "retries": 0,
+        "failures": 0,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cost_usd": 0.0
+    }
+
+
+class RunReport:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, job: str | None = None, params: dict | None = None):
+        with self._lock:
+            self.job = job
+            self.params = params or {}
+            self.started_at = time.time()
+            self._start = time.monotonic()
+            self.items = 0
+            self.providers: dict[str, dict] = {}
+
+    def _counters(self, provider: str)-> dict:
+        if provider not in self.providers:
+            self.providers[provider] = _empty_counters()
+        return self.providers[provider]
+
+    def record_request(self, provider: str, model: str | None, prompt_tokens: int = 0, completion_tokens: int = 0):
+        with self._lock:
+            counters = self._counters(provider)
+            counters["requests"] += 1
+            counters["prompt_tokens"] += prompt_tokens or 0
+            counters["completion_tokens"] += completion_tokens or 0
+            counters["cost_usd"] += estimate_cost(model, prompt_tokens or 0, completion_tokens or 0)
+            if model is not None:
+                counters["models"].add(model)
+
+    def record_retry(self, provider: str):
+        with self._lock:
+            self._counters(provider)["retries"] += 1
+
+    def record_failure(self, provider: str):
+        with self._lock:
+            self._counters(provider)["failures"] += 1
+
+    def record_cache(self, provider: str, hit: bool):
+        with self._lock:
+            self._counters(provider)["cache_hits" if hit else "cache_misses"] += 1
+
+    def add_items(self, count: int = 1):
+        with self._lock:
+            self.items += count
+
+    def summary(self, status: str = RUN_COMPLETED)-> dict:
+        with self._lock:
+            duration = max(time.monotonic() - self._start, 1e-9)
+            providers = {}
+            for provider, counters in sorted(self.providers.items()):
+                lookups = counters["cache_hits"] + counters["cache_misses"]
+                tokens = counters["prompt_tokens"] + counters["completion_tokens"]
+                providers[provider] = {
+                    **counters,
+                    "models": sorted(counters["models"]),
+                    "tokens": tokens,
+                    "cost_usd": round(counters["cost_usd"], 6),
+                    "requests_per_second": round(counters["requests"] / duration, 4),
+                    "tokens_per_second": round(tokens / duration, 2),
+                    "cache_hit_rate": round(counters["cache_hits"] / lookups, 4) if lookups else None
+                }
+            hits = sum(row["cache_hits"] for row in providers.values())
+            lookups = hits + sum(row["cache_misses"] for row in providers.values())
+            requests = sum(row["requests"] for row in providers.values())
+            tokens = sum(row["tokens"] for row in providers.values())
+            return {
+                "job": self.job,
+                "status": status,
+                "params": self.params,
+                "started_at": datetime.fromtimestamp(self.started_at, tz=timezone.utc).isoformat(timespec="seconds"),
+                "duration_seconds": round(duration, 3),
+                "items": self.items,
+                "totals": {
+                    "items_per_second": round(self.items / duration, 4),
+                    "requests": requests,
+                    "requests_per_second": round(requests / duration, 4),
+                    "tokens": tokens,
+                    "tokens_per_second": round(tokens / duration, 2),
+                    "retries": sum(row["retries"] for row in providers.values()),
+                    "failures": sum(row["failures"] for row in providers.values()),
+                    "cache_hit_rate": round(hits / lookups, 4) if lookups else None,
+                    "cost_usd": round(sum(row["cost_usd"] for row in providers.values()), 6)
+                },
+                "providers": providers
+            }
+
+
+run_report = RunReport()
+_active_job: str | None = None
+
+
+def save_run_report(summary: dict, report_dir: str | Path = DEFAULT_RUN_REPORT_DIR)-> Path:
+    report_dir = Path(report_dir)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    shard = summary["params"].get("shard")
+    suffix = f"_shard{str(shard).replace('/', 'of')}" if shard else ""
+    file_path = report_dir / f"{summary['job']}_{datetime.now().strftime('%Y%m%d-%H%M%S')}{suffix}.json"
+    with open(file_path, 'w') as file:
+        json.dump(summary, file, indent=2)
+    return file_path
+
+
+@contextmanager
+def track_run(job: str, report_dir: str | Path = DEFAULT_RUN_REPORT_DIR, **params):
+    """
+    Collect the counters of everything inside the block and write the run summary at the end
+    (also when the job fails or is interrupted). Nested track_run blocks join the outer run.
+    """
+    global _active_job
+    if _active_job is not None:
+        yield run_report
+        return
+    _active_job = job
+    run_report.reset(job=job, params=params)
+    status = RUN_FAILED
+    try:
+        yield run_report
+        status = RUN_COMPLETED
+    except KeyboardInterrupt:
+        status = RUN_INTERRUPTED
+        raise
+    finally:
+        _active_job = None
+        summary = run_report.summary(status=status)
+        file_path = save_run_report(summary=summary, report_dir=report_dir)
+        print_run_summary(summary=summary)
+        print(f"Run report saved to {file_path}")
+
+
+def print_run_summary(summary: dict):
+    totals = summary["totals"]
+    hit_rate = f"{totals['cache_hit_rate']:.1%}" if totals["cache_hit_rate"] is not None else "-"
+    print(f"Run {summary['job']} {summary['status']} in {summary['duration_seconds']:.1f}s: {summary['items']} items ({totals['items_per_second']:.2f}/s), "
+          f"{totals['requests']} requests ({totals['requests_per_second']:.2f}/s), {totals['tokens']} tokens ({totals['tokens_per_second']:.0f}/s), "
+          f"{totals['retries']} retries, cache hit rate {hit_rate}, ≈ ${totals['cost_usd']:.4f}")
+
+
+def load_run_report(file_path: str | Path)-> dict:
+    with open(file_path, 'r') as file:
+        return json.load(file)
+
+
+def latest_run_reports(job: str, count: int = 2, report_dir: str | Path = DEFAULT_RUN_REPORT_DIR)-> list[Path]:
+    """The `count` most recent reports of a job, oldest first"""
+    reports = sorted(Path(report_dir).glob(f"{job}_[0-9]*.json"), key=os.path.getmtime)
+    return reports[-count:]
+
+
+def compare_reports(baseline: dict, current: dict)-> list[dict]:
+    """One row per metric (totals and per provider) with the relative change and whether it regressed"""
+    rows = []
+    sections = [("total", baseline["totals"], current["totals"])]
+    for provider in sorted(set(baseline["providers"]) | set(current["providers"])):
+        sections.append((provider, baseline["providers"].get(provider, {}), current["providers"].get(provider, {})))
+    for section, before, after in sections:
+        for metric in ("items_per_second", "requests", "requests_per_second", "tokens", "tokens_per_second", "retries", "failures", "cache_hit_rate", "cost_usd"):
+            if metric not in before and metric not in after:
+                continue
+            old, new = before.get(metric), after.get(metric)
+            change = (new - old) / old if old and new is not None else None
+            if metric in THROUGHPUT_METRICS:
+                regressed = change is not None and change < -REGRESSION_THRESHOLD
+            elif metric in ("retries", "failures", "cost_usd"):
+                regressed = (change is not None and change > REGRESSION_THRESHOLD) or (old == 0 and bool(new))
+            else:
+                regressed = False
+            rows.append({"section": section, "metric": metric, "baseline": old, "current": new, "change": change, "regressed": regressed})
+    return rows
+
+
+def print_comparison(baseline: dict, current: dict):
+    print(f"{'':<10} {'metric':<20} {'baseline':>14} {'current':>14} {'change':>9}")
+    print(f"{'':<10} {'duration_seconds':<20} {baseline['duration_seconds']:>14} {current['duration_seconds']:>14}")
+    for row in compare_reports(baseline=baseline, current=current):
+        as_text = lambda value: f"{value:>14.4g}" if isinstance(value, (int, float)) else f"{'-':>14}"
+        change = f"{row['change']:+9.1%}" if row["change"] is not None else f"{'':>9}"
+        flag = "  ⚠️ regression" if row["regressed"] else ""
+        print(f"{row['section']:<10} {row['metric']:<20} {as_text(row['baseline'])} {as_text(row['current'])} {change}{flag}")
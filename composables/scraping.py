@@ -0,0 +1,154 @@
+"""
+Concurrent page fetching for the scraper.
+
+One pooled keep-alive httpx client is shared by all requests, concurrency is bounded globally
+and per host, request starts to the same host are spaced out (polite rate limiting), and
+failed requests are retried with exponential backoff (honoring Retry-After on 429/503).
+"""
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import httpx
+from tqdm.auto import tqdm
+
+from composables.html_cache import HtmlCache
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_PER_HOST_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_SECOND = 5.0
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+PAGE_NEW = "new"
+PAGE_UNCHANGED = "unchanged"
+PAGE_FAILED = "failed"
+PAGE_OFFLINE = "offline"
+
+
+class HostThrottle:
+    """Bounded concurrency plus a minimum interval between request starts for one host"""
+    def __init__(self, concurrency: int, requests_per_second: float):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def wait_turn(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def retry_after_seconds(response: httpx.Response)-> float | None:
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+def backoff_delay(attempt: int, backoff: float)-> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, backoff * (2 ** attempt))
+
+
+async def fetch_page(client: httpx.AsyncClient, throttle: HostThrottle, url: str, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF, headers: dict | None = None)-> httpx.Response | None:
+    """
+    Fetch one url, returns the final response (any status below 400, e.g. 200 or 304)
+    or None when every attempt failed.
+    """
+    for attempt in range(retries + 1):
+        async with throttle.semaphore:
+            await throttle.wait_turn()
+            try:
+                response = await client.get(url, headers=headers)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                error, wait = f"{type(e).__name__}: {str(e)}", None
+            else:
+                if response.status_code < 400:
+                    return response
+                error, wait = f"HTTP {response.status_code}", retry_after_seconds(response)
+                if response.status_code not in RETRYABLE_STATUS:
+                    print(f"Error fetching page: {error} for url: {url}")
+                    return None
+        if attempt < retries:
+            await asyncio.sleep(wait if wait is not None else backoff_delay(attempt, backoff))
+    print(f"Error fetching page: {error} for url: {url} (gave up after {retries + 1} attempts)")
+    return None
+
+
+async def _fetch_all(urls: list[str], concurrency: int, per_host_concurrency: int, requests_per_second: float, timeout: float, retries: int, backoff: float, request_headers: dict[str, dict] | None, on_response)-> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    throttles: dict[str, HostThrottle] = {}
+    results = {}
+    async with httpx.AsyncClient(limits=limits, timeout=timeout, follow_redirects=True) as client:
+        async def run(url: str):
+            host = urlparse(url).netloc
+            if host not in throttles:
+                throttles[host] = HostThrottle(concurrency=per_host_concurrency, requests_per_second=requests_per_second)
+            headers = (request_headers or {}).get(url)
+            response = await fetch_page(client=client, throttle=throttles[host], url=url, retries=retries, backoff=backoff, headers=headers)
+            results[url] = on_response(url, response) if on_response else (response.content if response is not None else None)
+
+        tasks = [asyncio.create_task(run(url)) for url in urls]
+        for task in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Fetching pages"):
+            await task
+    return results
+
+
+def fetch_all(urls: list[str], concurrency: int = DEFAULT_CONCURRENCY, per_host_concurrency: int = DEFAULT_PER_HOST_CONCURRENCY, requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND, timeout: float = DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF, request_headers: dict[str, dict] | None = None, on_response=None)-> dict:
+    """
+    Fetch every unique url concurrently and return {url: page bytes | None}.
+    request_headers optionally gives extra headers per url, on_response(url, response | None)
+    replaces the default bytes-or-None result when given.
+    """
+    unique_urls = list(dict.fromkeys(urls))
+    return asyncio.run(_fetch_all(
+        urls=unique_urls,
+        concurrency=concurrency,
+        per_host_concurrency=per_host_concurrency,
+        requests_per_second=requests_per_second,
+        timeout=timeout,
+        retries=retries,
+        backoff=backoff,
+        request_headers=request_headers,
+        on_response=on_response
+    ))
+
+
+def fetch_all_cached(urls: list[str], cache: HtmlCache, **fetch_kwargs)-> dict[str, tuple[str, bytes | None]]:
+    """
+    Conditional re-fetch through the HTML cache, returns {url: (status, page bytes | None)}.
+    Cached pages are requested with If-None-Match / If-Modified-Since, a 304 (or an identical body)
+    is reported as PAGE_UNCHANGED, a failed request falls back to the cached copy as PAGE_FAILED.
+    """
+    def on_response(url: str, response: httpx.Response | None):
+        if response is None:
+            return PAGE_FAILED, cache.read_body(url)
+        if response.status_code == 304:
+            cache.touch(url)
+            return PAGE_UNCHANGED, cache.read_body(url)
+        changed = cache.store(url, response.content, etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+        return (PAGE_NEW if changed else PAGE_UNCHANGED), response.content
+
+    request_headers = {url: cache.conditional_headers(url) for url in urls}
+    return fetch_all(urls=urls, request_headers=request_headers, on_response=on_response, **fetch_kwargs)
+
+
+def read_all_cached(urls: list[str], cache: HtmlCache)-> dict[str, tuple[str, bytes | None]]:
+    """Offline mode: every page comes from the HTML cache, no network access"""
+    return {url: (PAGE_OFFLINE, cache.read_body(url)) for url in dict.fromkeys(urls)}
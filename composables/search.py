@@ -1,96 +1,181 @@
-from openai import OpenAI
-from qdrant_client import QdrantClient
+from openai import OpenAI, APIConnectionError
+from qdrant_client import models
 from dotenv import load_dotenv
 import json
-import requests
 from os import environ
+from composables.qdrant_backend import get_qdrant_client
+from composables.cache import llm_cache, make_cache_key
+from composables.rate_limit import get_limiter, estimate_tokens, OPENAI
+from composables.embedding_client import EmbeddingClient, DEFAULT_JINA_URL
+from composables.embedding_batcher import EmbeddingBatcher
+from composables.tracing import span
+from composables.run_report import run_report
+from composables.vectors import query_arguments, prefetch_limit, DEFAULT_SEARCH_MODE, SEARCH_TWO_STAGE
+from composables.content_store import content_store, content_key, hydrate, SUMMARY_FIELDS, LARGE_FIELDS
+from composables.passages import PASSAGE_COLLECTION_NAME, PASSAGES_PER_CHARACTER, PROFILE_FIELDS, PARENT_FIELD, PASSAGE_GRANULARITY, SEARCH_GRANULARITY
 
 load_dotenv()
 
-QDRANT_URL = environ.get('QDRANT_URL')
-QDRANT_API_KEY = environ.get('QDRANT_API_KEY')
+# alias of the live collection version, rebuilds switch it atomically (composables/blue_green.py)
 COLLECTION_NAME = 'lotr-characters'
 EMBEDDING_DIMENSION = 512
 JINA_EMBEDDING_MODEL = "jina-embeddings-v4"
-JINA_URL = "https://api.jina.ai/v1/embeddings"
+JINA_URL = environ.get('JINA_URL', DEFAULT_JINA_URL)
 JINA_API_KEY = environ.get('JINA_API_KEY')
 QUERYING_TASK = "retrieval.query"
 OPENAI_MODEL = "gpt-4o-mini"
 OPENAI_TEMPERATURE = 0.5
+OPENAI_ESTIMATED_COMPLETION_TOKENS = 300
+EMBEDDING_BATCHING = environ.get('EMBEDDING_BATCHING', '1').lower() not in ('0', 'false', 'no')
 
-openai_client = OpenAI()
-qd_client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+# retries are left to the rate limit governor so it sees every 429
+openai_client = OpenAI(max_retries=0)
+# remote server, embedded on-disk or in-memory store depending on QDRANT_BACKEND
+qd_client = get_qdrant_client()
+# concurrent queries share one Jina request (see composables/embedding_batcher.py), which rules out late chunking
+jina_client = EmbeddingClient(url=JINA_URL, api_key=JINA_API_KEY, model=JINA_EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSION, task=QUERYING_TASK, late_chunking=False)
+query_batcher = EmbeddingBatcher(client=jina_client)
 
 def create_jina_embedding(input_text: str)-> list:
     """
     Create embedding using Jina API
     Returns a single embedding vector (list of floats)
+    Retries, hedging and the circuit breaker live in jina_client, raises EmbeddingError when it gives up
+    Concurrent calls are batched into one request unless EMBEDDING_BATCHING=0
     """
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {JINA_API_KEY}",
-    }
-    data = {
-        "input": [input_text],
-        "model": JINA_EMBEDDING_MODEL,
-        "dimensions": EMBEDDING_DIMENSION,
-        "task": QUERYING_TASK,
-        "late_chunking": True,
-    }
-    try:
-        res = requests.post(url=JINA_URL, headers=headers, json=data, timeout=30)
-        if res.status_code == 200:
-            embedding = res.json()["data"][0]["embedding"]
-            return embedding
-        else:
-            raise Exception(f"Jina API error: {res.status_code} - {res.text}")
-    except requests.RequestException as e:
-        raise Exception(f"Request failed: {str(e)}")
-    
+    with span("embed", query_chars=len(input_text)) as s:
+        embedding = query_batcher.embed_one(input_text) if EMBEDDING_BATCHING else jina_client.embed_one(input_text)
+        s.set("dimensions", len(embedding))
+        return embedding
 
-def search(query: str, limit: int = 5):
-    """
-    Updated search function to use Jina API for query embedding
-    """
-    try:
-        # Create embedding for the search query using Jina API
-        query_embedding = create_jina_embedding(input_text=query)
-        
+
+def search_characters(query_embedding: list[float], limit: int, threshold: float | None, mode: str, fields: tuple[str, ...] = SUMMARY_FIELDS)-> list[dict]:
+    """Only `fields` are returned, large ones (biography, history) are read from the content store for the hits"""
+    payload_fields = [field for field in fields if field not in LARGE_FIELDS]
+    large_fields = tuple(field for field in fields if field in LARGE_FIELDS)
+    with span("vector_search", limit=limit) as s:
         query_points = qd_client.query_points(
             collection_name=COLLECTION_NAME,
-            query=query_embedding,
+            **query_arguments(embedding=query_embedding, limit=limit, mode=mode),
             limit=limit,
-            with_payload=True
+            with_payload=payload_fields or False,
+            score_threshold=threshold
         )
-        
-        results = [{"id": point.id, "score": point.score, **point.payload} for point in query_points.points]
-        return results
-    except Exception as e:
-        print(f"Error during search: {str(e)}")
-        return None
+        s.set("hits", len(query_points.points))
+        if s.enabled:
+            s.set("payload_bytes", len(json.dumps([point.payload for point in query_points.points], ensure_ascii=False)))
+
+    hits = [{"id": point.id, "score": point.score, **(point.payload or {})} for point in query_points.points]
+    return hydrate(hits, fields=large_fields) if large_fields else hits
+
+
+def search_passages(query_embedding: list[float], limit: int, threshold: float | None, mode: str, passages_per_character: int = PASSAGES_PER_CHARACTER)-> list[dict]:
+    """
+    Top `limit` characters by their best passage, each with its best `passages_per_character` passages
+    instead of the whole biography and history. Basic fields come from the character collection (lookup).
+    """
+    arguments = query_arguments(embedding=query_embedding, limit=limit, mode=mode)
+    if mode == SEARCH_TWO_STAGE:
+        # the shortlist has to hold enough passages to fill `limit` groups
+        arguments["prefetch"].limit = prefetch_limit(limit * passages_per_character)
+    with span("vector_search", limit=limit, granularity=PASSAGE_GRANULARITY) as s:
+        groups = qd_client.query_points_groups(
+            collection_name=PASSAGE_COLLECTION_NAME,
+            **arguments,
+            group_by=PARENT_FIELD,
+            limit=limit,
+            group_size=passages_per_character,
+            with_payload=["section", "passage", "name"],
+            score_threshold=threshold,
+            with_lookup=models.WithLookup(collection=COLLECTION_NAME, with_payload=["name", *PROFILE_FIELDS], with_vectors=False)
+        ).groups
+        s.set("hits", sum(len(group.hits) for group in groups))
+        if s.enabled:
+            s.set("payload_bytes", len(json.dumps([hit.payload for group in groups for hit in group.hits], ensure_ascii=False)))
+
+    results = []
+    for group in groups:
+        character = group.lookup.payload if group.lookup is not None else {"name": group.hits[0].payload.get("name")}
+        results.append({
+            "id": group.id,
+            "score": group.hits[0].score,
+            **character,
+            "passages": [{"section": hit.payload["section"], "text": hit.payload["passage"], "score": hit.score} for hit in group.hits]
+        })
+    return results
+
+
+def search(query: str, limit: int = 5, threshold: float | None = None, mode: str = DEFAULT_SEARCH_MODE, granularity: str = SEARCH_GRANULARITY, fields: list[str] | None = None):
+    """
+    Updated search function to use Jina API for query embedding
+    Points scoring below threshold (if given) are left out
+    mode: two_stage (small vector prefetch, full vector rescoring), full or small (see composables/vectors.py)
+    granularity: character (whole characters) or passage (characters with their best passages, see composables/passages.py)
+    fields: payload fields of character hits, defaults to the summary fields (no biography / history, see composables/content_store.py)
+    """
+    with span("search", limit=limit, mode=mode, granularity=granularity) as search_span:
+        try:
+            # Create embedding for the search query using Jina API
+            query_embedding = create_jina_embedding(input_text=query)
+            if granularity == PASSAGE_GRANULARITY:
+                return search_passages(query_embedding=query_embedding, limit=limit, threshold=threshold, mode=mode)
+            return search_characters(query_embedding=query_embedding, limit=limit, threshold=threshold, mode=mode, fields=SUMMARY_FIELDS if fields is None else tuple(fields))
+        except Exception as e:
+            search_span.set("failed", 1)
+            print(f"Error during search: {str(e)}")
+            return None
     
 def format_hits_response(hits: list[dict[str, str|None]]):
-    """Format the results into text to plug into chatGPT"""
-    character_data = []
-    for hit in hits:
-        basic_fields = ['id', 'score', 'name', 'race', 'gender', 'realm', 'culture', 'birth', 'death', 'spouse', 'hair', 'height', 'biography', 'history']
-        character = {}
-        character.update([(field, hit[field]) for field in basic_fields if hit.get(field)])
-        character_data.append(character)
-    
-    return character_data
-
-def llm(user_prompt: str, system_prompt: str):
-    """ llm function to call openAI with our specific prompts"""
-    res = openai_client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=OPENAI_TEMPERATURE
-    )
-    return res.choices[0].message.content
+    """Format the results into text to plug into chatGPT, biography and history of the hits are read from the content store"""
+    with span("format_context", hits=len(hits)) as s:
+        hits = hydrate(hits)
+        character_data = []
+        for hit in hits:
+            basic_fields = ['id', 'score', 'name', 'race', 'gender', 'realm', 'culture', 'birth', 'death', 'spouse', 'hair', 'height', 'biography', 'history', 'passages']
+            character = {}
+            character.update([(field, hit[field]) for field in basic_fields if hit.get(field)])
+            character_data.append(character)
+        if s.enabled:
+            s.set("context_bytes", len(json.dumps(character_data, ensure_ascii=False, default=str)))
+
+        return character_data
+
+def llm(user_prompt: str, system_prompt: str, use_cache: bool = True):
+    """
+    llm function to call openAI with our specific prompts
+    Responses are cached by model, temperature and prompts, pass use_cache=False to force a fresh call
+    Calls go through the shared OpenAI rate limiter (requests and tokens per minute, 429 backoff)
+    """
+    with span("llm", provider=OPENAI, model=OPENAI_MODEL, prompt_chars=len(system_prompt) + len(user_prompt)) as s:
+        cache_key = make_cache_key(model=OPENAI_MODEL, temperature=OPENAI_TEMPERATURE, system_prompt=system_prompt, user_prompt=user_prompt)
+        if use_cache:
+            cached = llm_cache.get(cache_key)
+            run_report.record_cache(OPENAI, hit=cached is not None)
+            if cached is not None:
+                s.set("cache_hits", 1)
+                return cached
+        res = get_limiter(OPENAI).call(
+            lambda: openai_client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=OPENAI_TEMPERATURE
+            ),
+            tokens=estimate_tokens(system_prompt, user_prompt) + OPENAI_ESTIMATED_COMPLETION_TOKENS,
+            usage=lambda res: res.usage.total_tokens if res.usage else None,
+            transient_errors=(APIConnectionError,)
+        )
+        content = res.choices[0].message.content
+        prompt_tokens = res.usage.prompt_tokens if res.usage is not None else 0
+        completion_tokens = res.usage.completion_tokens if res.usage is not None else 0
+        s.set("prompt_tokens", prompt_tokens)
+        s.set("completion_tokens", completion_tokens)
+        run_report.record_request(OPENAI, model=OPENAI_MODEL, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        if use_cache:
+            llm_cache.set(cache_key, content, model=OPENAI_MODEL)
+        return content
 
 def get_qdrant_records():
     records, next_page_offset = qd_client.scroll(
@@ -110,10 +195,12 @@ def get_qdrant_records():
         )
         all_records.extend(records)
     records_data = []
+    content = content_store.get_many(point_ids=[record.id for record in all_records], fields=LARGE_FIELDS)
     for record in all_records:
         record_dict = {
             "id": record.id,
-            "payload": record.payload
+            # full records, as before the large fields moved to the content store
+            "payload": {**record.payload, **content.get(content_key(record.id), {})}
         }
         records_data.append(record_dict)
 
@@ -0,0 +1,108 @@
+"""
+Single-pass extraction of h2 sections (Biography, History, ...) from wiki pages.
+
+Each document is parsed once, with lxml when available, and only the article body
+(div.mw-parser-output) is built into a tree. All requested headings are located in one search
+and their sections are collected in one walk over the headings' siblings. The output per section
+is the same as the legacy format_biography / format_history: the stripped text of every element
+after the heading up to the next h2, joined with newlines, or None when the heading is missing.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+DEFAULT_SECTIONS = ("Biography", "History")
+# stored with cached parse results (composables/html_cache.py), bump it whenever the extracted output changes
+PARSER_VERSION = 1
+CONTENT_REGION = SoupStrainer("div", class_="mw-parser-output")
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = "lxml"
+except ImportError:
+    DEFAULT_PARSER = "html.parser"
+
+
+def _find_headings(soup: BeautifulSoup, sections: tuple[str, ...])-> dict:
+    """
+    Heading tag of every requested section: the first <h2 id=...>, otherwise the first
+    <span id=...> when its parent is an h2 (older MediaWiki markup).
+    """
+    h2_by_id = {}
+    first_span_by_id = {}
+    for tag in soup.find_all(["h2", "span"], id=list(sections)):
+        section_id = tag.get("id")
+        if tag.name == "h2":
+            h2_by_id.setdefault(section_id, tag)
+        else:
+            first_span_by_id.setdefault(section_id, tag)
+
+    headings = {}
+    for section in sections:
+        heading = h2_by_id.get(section)
+        if heading is None:
+            span = first_span_by_id.get(section)
+            if span is not None and span.parent is not None and span.parent.name == "h2":
+                heading = span.parent
+        if heading is not None:
+            headings[section] = heading
+    return headings
+
+
+def _collect_sections(headings: dict)-> dict[str, str]:
+    """Walk the siblings once per parent element, attributing each element to the open section"""
+    section_by_heading = {id(heading): section for section, heading in headings.items()}
+    contents = {section: [] for section in headings}
+    walked_parents = set()
+    for heading in headings.values():
+        parent_key = id(heading.parent)
+        if parent_key in walked_parents:
+            continue
+        walked_parents.add(parent_key)
+
+        # start at the first child, the headings may appear in any order
+        current_section = None
+        current_elem = heading.parent.contents[0]
+        while current_elem is not None:
+            if current_elem.name:
+                if current_elem.name == "h2":
+                    current_section = section_by_heading.get(id(current_elem))
+                elif current_section is not None:
+                    contents[current_section].append(current_elem.get_text().strip())
+            current_elem = current_elem.next_sibling
+    return {section: "\n".join(parts) for section, parts in contents.items()}
+
+
+def extract_sections(content: bytes | str, sections: tuple[str, ...] = DEFAULT_SECTIONS, parser: str = DEFAULT_PARSER)-> dict[str, str | None]:
+    """
+    {section: text | None} for one html document.
+    Falls back to parsing the whole document when it has no mw-parser-output region.
+    """
+    try:
+        soup = BeautifulSoup(content, parser, parse_only=CONTENT_REGION)
+        if soup.find("div") is None:
+            soup = BeautifulSoup(content, parser)
+        headings = _find_headings(soup, sections)
+        texts = _collect_sections(headings)
+        return {section.lower(): texts.get(section) for section in sections}
+    except Exception as e:
+        print(f"Error parsing content: {e}")
+        return {section.lower(): None for section in sections}
+
+
+def _extract_one(args: tuple)-> dict[str, str | None]:
+    content, sections, parser = args
+    return extract_sections(content=content, sections=sections, parser=parser)
+
+
+def extract_sections_many(documents: list[bytes], sections: tuple[str, ...] = DEFAULT_SECTIONS, parser: str = DEFAULT_PARSER, workers: int | None = None, chunksize: int = 8)-> list[dict[str, str | None]]:
+    """
+    extract_sections for many documents in a process pool, results keep the input order.
+    workers=1 parses in the current process.
+    """
+    if workers == 1 or len(documents) <= 1:
+        return [extract_sections(content=content, sections=sections, parser=parser) for content in documents]
+    tasks = [(content, sections, parser) for content in documents]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_extract_one, tasks, chunksize=chunksize))
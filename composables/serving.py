@@ -0,0 +1,117 @@
+"""
+Building blocks of the query service (src/query_service.py).
+
+SingleFlight coalesces identical in-flight calls: the first caller of a key runs the function,
+callers arriving while it runs wait for the same result instead of sending their own upstream request.
+
+AdmissionControl bounds the number of calls running at once. A few callers may queue for a free slot
+(up to wait_timeout seconds), beyond max_waiting they are rejected right away with OverloadedError,
+which the service answers with 503 + Retry-After instead of piling up threads and upstream requests.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Hashable
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MAX_WAITING = 64
+DEFAULT_WAIT_TIMEOUT = 5.0
+
+
+class OverloadedError(Exception):
+    """No free slot, the caller should retry later"""
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], object], timeout: float | None = None)-> tuple[object, bool]:
+        """fn() once per key among concurrent callers, returns (result, shared) where shared is True for followers"""
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._calls[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not is_leader:
+            return future.result(timeout=timeout), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            # later callers start a fresh call, results are not cached here
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self)-> dict:
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "coalesced": self.coalesced}
+
+
+class AdmissionControl:
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, max_waiting: int = DEFAULT_MAX_WAITING, wait_timeout: float = DEFAULT_WAIT_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.waited_seconds = 0.0
+
+    @contextmanager
+    def slot(self):
+        with self._lock:
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                raise OverloadedError(f"{self.active} requests running and {self.waiting} waiting")
+            self.waiting += 1
+        start = time.monotonic()
+        acquired = self._slots.acquire(timeout=self.wait_timeout)
+        with self._lock:
+            self.waiting -= 1
+            self.waited_seconds += time.monotonic() - start
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.active += 1
+                self.admitted += 1
+        if not acquired:
+            raise OverloadedError(f"no free slot within {self.wait_timeout:.1f}s")
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def stats(self)-> dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "active": self.active,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "waited_seconds": round(self.waited_seconds, 3)
+            }
@@ -0,0 +1,197 @@
+"""
+Sharded runs: any evaluation loop can be split as --shard i/N across processes or machines.
+
+Items are assigned round-robin by their position in the input (item k goes to shard k % N),
+each shard appends its output rows to its own JSONL file tagged with the input position,
+and merge_shard_outputs() k-way merges the shard files back into input order.
+The merged result does not depend on how many shards were used or in which order they finished.
+
+A shard that went through all of its items writes a .done marker with its item count. A failing item
+stops the shard with ShardIncompleteError (non-zero exit, no marker), and merging checks the markers and
+that every shard file holds exactly the source indexes assigned to it, so a truncated shard is never merged.
+"""
+
+import heapq
+import json
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from composables.rate_limit import set_rate_share
+from composables.run_report import run_report
+
+SOURCE_INDEX_FIELD = "source_index"
+# row written for an item whose process_fn returned no rows, so it counts as done (skipped when merging)
+EMPTY_ITEM_FIELD = "empty_item"
+
+
+class ShardIncompleteError(Exception):
+    """A shard stopped before its last item, or its output does not cover the items assigned to it"""
+    pass
+
+
+def parse_shard(value: str)-> tuple[int, int]:
+    """'2/8' -> (2, 8), shard indexes are zero based"""
+    try:
+        index_text, count_text = value.split("/")
+        shard_index, shard_count = int(index_text), int(count_text)
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected <index>/<count> such as 0/4")
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError(f"Invalid shard '{value}', index must be in [0, {shard_count})")
+    return shard_index, shard_count
+
+
+def shard_items(data: Iterable, shard_index: int = 0, shard_count: int = 1)-> Iterator[tuple[int, object]]:
+    """Lazily yield (source_index, item) for the items belonging to one shard"""
+    return islice(enumerate(data), shard_index, None, shard_count)
+
+
+def shard_output_path(file_path: str | Path, shard_index: int, shard_count: int)-> Path:
+    """assets/x.json -> assets/shards/x.shard-001-of-004.jsonl"""
+    file_path = Path(file_path)
+    return file_path.parent / "shards" / f"{file_path.stem}.shard-{shard_index:03d}-of-{shard_count:03d}.jsonl"
+
+
+def shard_done_path(output_path: str | Path)-> Path:
+    """x.shard-001-of-004.jsonl -> x.shard-001-of-004.done"""
+    return Path(output_path).with_suffix(".done")
+
+
+def _truncate_partial_line(output_path: Path):
+    """Cut the unterminated last line an interrupted write left behind, appended rows must start on a new line"""
+    if not output_path.exists():
+        return
+    with open(output_path, 'rb+') as file:
+        size = file.seek(0, 2)
+        if size == 0:
+            return
+        file.seek(size - 1)
+        if file.read(1) == b"\n":
+            return
+        # rows are small, the last newline is within the tail read here in steps
+        position = size
+        while position > 0:
+            step = min(position, 64 * 1024)
+            position -= step
+            file.seek(position)
+            newline = file.read(step).rfind(b"\n")
+            if newline != -1:
+                file.truncate(position + newline + 1)
+                return
+        file.truncate(0)
+
+
+def _completed_source_indexes(output_path: Path)-> set[int]:
+    completed = set()
+    if output_path.exists():
+        with open(output_path, 'r') as file:
+            for line in file:
+                if line.strip():
+                    completed.add(json.loads(line)[SOURCE_INDEX_FIELD])
+    return completed
+
+
+def run_sharded(data: Iterable, process_fn: Callable[[object], dict | list[dict]], output_path: str | Path, shard_index: int = 0, shard_count: int = 1)-> int:
+    """
+    Run process_fn over one shard of data and append its rows to output_path (JSONL).
+    Every row is flushed as soon as it is produced and tagged with the item's source index,
+    so an interrupted shard resumes where it stopped when started again.
+    Returns the number of items processed in this call.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    # shards run as separate processes against the same API keys, each gets its share of the rate limits
+    set_rate_share(1.0 / shard_count)
+    done_path = shard_done_path(output_path)
+    done_path.unlink(missing_ok=True)
+    _truncate_partial_line(output_path)
+    completed = _completed_source_indexes(output_path)
+    if completed:
+        print(f"Shard {shard_index}/{shard_count}: resuming, {len(completed)} items already done")
+
+    processed = 0
+    items = 0
+    with open(output_path, 'a') as output:
+        for source_index, item in shard_items(data=data, shard_index=shard_index, shard_count=shard_count):
+            items += 1
+            if source_index in completed:
+                continue
+            try:
+                result = process_fn(item)
+            except KeyboardInterrupt:
+                print(f"\n⚠️  Shard {shard_index}/{shard_count} interrupted at source index {source_index}, rerun to resume")
+                raise
+            except Exception as e:
+                print(f"\n❌ Shard {shard_index}/{shard_count} failed at source index {source_index}: {type(e).__name__}: {str(e)}")
+                print("   Rerun the same shard to resume")
+                raise ShardIncompleteError(f"shard {shard_index}/{shard_count} failed at source index {source_index} after {processed} items") from e
+            rows = (result if isinstance(result, list) else [result]) or [{EMPTY_ITEM_FIELD: True}]
+            lines = "".join(json.dumps({SOURCE_INDEX_FIELD: source_index, **row}, ensure_ascii=False) + "\n" for row in rows)
+            output.write(lines)
+            output.flush()
+            processed += 1
+            run_report.add_items(1)
+    with open(done_path, 'w') as file:
+        json.dump({"shard_index": shard_index, "shard_count": shard_count, "items": items}, file)
+    print(f"Shard {shard_index}/{shard_count}: processed {processed} items -> {output_path}")
+    return processed
+
+
+def _iter_shard_rows(file_path: Path)-> Iterator[dict]:
+    with open(file_path, 'r') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def find_shard_outputs(file_path: str | Path, shard_count: int)-> list[Path]:
+    paths = [shard_output_path(file_path, shard_index, shard_count) for shard_index in range(shard_count)]
+    missing = [str(path) for path in paths if not path.exists()]
+    if missing:
+        raise FileNotFoundError(f"Missing shard outputs: {missing}")
+    return paths
+
+
+def check_shard_outputs(file_path: str | Path, shard_count: int)-> int:
+    """
+    Raise ShardIncompleteError unless every shard finished (.done marker) and its file holds exactly
+    the source indexes assigned to it, returns the number of input items
+    """
+    paths = find_shard_outputs(file_path, shard_count)
+    not_done = [str(path) for path in paths if not shard_done_path(path).exists()]
+    if not_done:
+        raise ShardIncompleteError(f"Shards did not finish, rerun them to resume: {not_done}")
+    item_counts = []
+    for path in paths:
+        with open(shard_done_path(path), 'r') as file:
+            item_counts.append(json.load(file)["items"])
+    total = sum(item_counts)
+    problems = []
+    for shard_index, path in enumerate(paths):
+        expected = set(range(shard_index, total, shard_count))
+        if len(expected) != item_counts[shard_index]:
+            problems.append(f"shard {shard_index} saw {item_counts[shard_index]} items, {len(expected)} expected for {total} items")
+            continue
+        found = {row[SOURCE_INDEX_FIELD] for row in _iter_shard_rows(path)}
+        missing, unexpected = expected - found, found - expected
+        if missing or unexpected:
+            problems.append(f"shard {shard_index} misses {len(missing)} items (e.g. {sorted(missing)[:5]}) and has {len(unexpected)} foreign ones (e.g. {sorted(unexpected)[:5]})")
+    if problems:
+        raise ShardIncompleteError("Shard outputs do not cover the input: " + "; ".join(problems))
+    return total
+
+
+def merge_shard_outputs(file_path: str | Path, shard_count: int, keep_source_index: bool = False)-> Iterator[dict]:
+    """
+    Lazily merge the shard files of an artifact back into input order, after check_shard_outputs().
+    Rows of the same input item keep the order they were written in.
+    """
+    check_shard_outputs(file_path, shard_count)
+    streams = [_iter_shard_rows(path) for path in find_shard_outputs(file_path, shard_count)]
+    for row in heapq.merge(*streams, key=lambda row: row[SOURCE_INDEX_FIELD]):
+        if row.get(EMPTY_ITEM_FIELD):
+            continue
+        if not keep_source_index:
+            row.pop(SOURCE_INDEX_FIELD)
+        yield row
@@ -0,0 +1,149 @@
+"""
+Snapshot export and restore of the character collection, for nodes that start from scratch.
+
+A snapshot bundle in SNAPSHOT_DIR holds three files:
+- <alias>.snapshot          the Qdrant collection snapshot (vectors + slim payloads)
+- <alias>.content.sqlite    the content store (biographies / histories, composables/content_store.py)
+- <alias>.snapshot.json     sidecar: fingerprint of the source data and indexing settings, point count, checksum
+
+A restore only happens when the sidecar fingerprint matches the current source data, it uploads the snapshot
+into a new collection version and moves the alias to it (composables/blue_green.py), no text is embedded.
+The bundled content is restored as that version's content and only replaces the live content once the
+version passed validation and is published.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from os import environ
+from pathlib import Path
+
+import requests
+from qdrant_client import QdrantClient
+
+from composables.blue_green import alias_target, publish_version, version_name
+from composables.content_store import ContentStore, content_store
+from composables.pipeline import file_fingerprint
+
+project_root = Path(__file__).resolve().parent.parent
+
+DEFAULT_SNAPSHOT_DIR = Path(environ.get('SNAPSHOT_DIR') or project_root / ".cache" / "snapshots")
+# bump when what a snapshot holds changes in a way the settings below do not capture
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_TIMEOUT = 600
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def source_fingerprint(source_files: list[str | Path], params: dict)-> str:
+    """sha256 over the source files' content and the settings that shape the indexed points"""
+    digest = hashlib.sha256()
+    for file_path in source_files:
+        digest.update(str(file_fingerprint(file_path)).encode("utf-8"))
+    digest.update(json.dumps({**params, "snapshot_format": SNAPSHOT_FORMAT}, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def bundle_paths(alias: str, snapshot_dir: str | Path = DEFAULT_SNAPSHOT_DIR)-> dict[str, Path]:
+    snapshot_dir = Path(snapshot_dir)
+    return {
+        "snapshot": snapshot_dir / f"{alias}.snapshot",
+        "content": snapshot_dir / f"{alias}.content.sqlite",
+        "sidecar": snapshot_dir / f"{alias}.snapshot.json"
+    }
+
+
+def load_sidecar(alias: str, snapshot_dir: str | Path = DEFAULT_SNAPSHOT_DIR)-> dict | None:
+    sidecar = bundle_paths(alias, snapshot_dir)["sidecar"]
+    if not sidecar.is_file():
+        return None
+    with open(sidecar, 'r') as file:
+        return json.load(file)
+
+
+def _headers(api_key: str | None)-> dict:
+    return {"api-key": api_key} if api_key else {}
+
+
+def export_snapshot(client: QdrantClient, url: str, api_key: str | None, alias: str, fingerprint: str, snapshot_dir: str | Path = DEFAULT_SNAPSHOT_DIR, store: ContentStore = content_store)-> dict:
+    """
+    Snapshot the collection behind `alias`, download it with a copy of the content store and write the sidecar.
+    The fingerprint must describe the data the live collection was built from.
+    """
+    collection_name = alias_target(client, alias) or alias
+    paths = bundle_paths(alias, snapshot_dir)
+    paths["snapshot"].parent.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    description = client.create_snapshot(collection_name=collection_name, wait=True)
+    partial = paths["snapshot"].with_suffix(".partial")
+    digest = hashlib.sha256()
+    try:
+        with requests.get(f"{url.rstrip('/')}/collections/{collection_name}/snapshots/{description.name}", headers=_headers(api_key), stream=True, timeout=SNAPSHOT_TIMEOUT) as response:
+            response.raise_for_status()
+            with open(partial, 'wb') as file:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    file.write(chunk)
+                    digest.update(chunk)
+    finally:
+        # the bundle is the copy that matters, the server side one only takes disk space
+        client.delete_snapshot(collection_name=collection_name, snapshot_name=description.name, wait=True)
+    partial.replace(paths["snapshot"])
+    store.backup(paths["content"])
+
+    sidecar = {
+        "alias": alias,
+        "collection": collection_name,
+        "fingerprint": fingerprint,
+        "points": client.count(collection_name=collection_name, exact=True).count,
+        "sha256": digest.hexdigest(),
+        "size_bytes": paths["snapshot"].stat().st_size,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    }
+    with open(paths["sidecar"], 'w') as file:
+        json.dump(sidecar, file, indent=2)
+    print(f"Exported {collection_name} ({sidecar['points']} points, {sidecar['size_bytes'] / 2**20:.1f} MiB) to {paths['snapshot']} in {time.perf_counter() - start:.1f}s")
+    return sidecar
+
+
+def restore_snapshot(client: QdrantClient, url: str, api_key: str | None, alias: str, fingerprint: str, snapshot_dir: str | Path = DEFAULT_SNAPSHOT_DIR, store: ContentStore = content_store)-> dict:
+    """
+    Upload the bundle into a new version of `alias` and switch the alias (and the live content of `store`) to it.
+    Raises SnapshotError when there is no bundle, it was built from other data or settings, or it is corrupt.
+    """
+    paths = bundle_paths(alias, snapshot_dir)
+    sidecar = load_sidecar(alias, snapshot_dir)
+    if sidecar is None or not paths["snapshot"].is_file() or not paths["content"].is_file():
+        raise SnapshotError(f"no complete snapshot bundle for {alias} in {Path(snapshot_dir)}")
+    if sidecar["fingerprint"] != fingerprint:
+        raise SnapshotError(f"snapshot of {sidecar['created_at']} was built from other source data or settings")
+    if file_fingerprint(paths["snapshot"]) != sidecar["sha256"]:
+        raise SnapshotError(f"{paths['snapshot']} does not match its sidecar checksum")
+    start = time.perf_counter()
+
+    collection_name = version_name(alias)
+    with open(paths["snapshot"], 'rb') as file:
+        response = requests.post(
+            f"{url.rstrip('/')}/collections/{collection_name}/snapshots/upload",
+            params={"priority": "snapshot", "wait": "true"},
+            headers=_headers(api_key),
+            files={"snapshot": (paths["snapshot"].name, file)},
+            timeout=SNAPSHOT_TIMEOUT
+        )
+    if not response.ok:
+        raise SnapshotError(f"snapshot upload failed with {response.status_code}: {response.text[:500]}")
+    # the bundle's content becomes the content of the new version, the live store only gets it when the version is published
+    try:
+        store.restore_version(collection_name, paths["content"])
+    except sqlite3.Error as e:
+        client.delete_collection(collection_name=collection_name)
+        store.drop_version(collection_name)
+        raise SnapshotError(f"{paths['content']} could not be restored: {str(e)}")
+    # no golden query probes, they would need query embeddings
+    report = publish_version(client, alias=alias, collection_name=collection_name, expected_points=sidecar["points"], store=store)
+    print(f"Restored {alias} from the snapshot of {sidecar['created_at']} in {time.perf_counter() - start:.1f}s")
+    return report
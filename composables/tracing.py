@@ -0,0 +1,247 @@
+"""
+Lightweight tracing for the query path (embed -> vector search -> context formatting -> LLM).
+
+    with span("vector_search", limit=5) as s:
+        points = qd_client.query_points(...)
+        s.set("hits", len(points.points))
+
+Every finished span adds its duration to a per-name latency histogram (p50/p95/p99) and its numeric
+attributes (tokens, payload bytes...) to per-name totals. Both can be exported as Prometheus text or JSON.
+Hooks registered with add_hook() receive every finished span as a dict, e.g. to log or ship it elsewhere.
+
+Tracing is off unless TRACING_ENABLED=1 or enable_tracing() is called. Disabled, span() returns a shared
+no-op object, so instrumented code pays one flag check per span. Attributes that are costly to compute
+should be guarded with `if s.enabled:`.
+"""
+
+import functools
+import json
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+from os import environ
+from pathlib import Path
+from typing import Callable
+
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PERCENTILE_WINDOW = 10_000
+PERCENTILES = (50, 95, 99)
+METRIC_PREFIX = "lotr_rag"
+
+_enabled = environ.get('TRACING_ENABLED', '').lower() in ('1', 'true', 'yes')
+_hooks: list[Callable[[dict], None]] = []
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+class Histogram:
+    """Cumulative Prometheus-style buckets plus a window of recent samples for exact percentiles"""
+    def __init__(self, buckets: tuple[float, ...] = HISTOGRAM_BUCKETS, window: int = PERCENTILE_WINDOW):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def summary(self)-> dict:
+        summary = {"count": self.count, "sum": round(self.sum, 6), "mean": round(self.sum / self.count, 6) if self.count else None}
+        ordered = sorted(self.samples)
+        for percent in PERCENTILES:
+            summary[f"p{percent}"] = round(ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))], 6) if ordered else None
+        return summary
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: dict[str, Histogram] = {}
+        self.totals: dict[tuple[str, str], float] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, name: str, seconds: float, attributes: dict, error: str | None):
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(seconds)
+            for key, value in attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self.totals[(name, key)] = self.totals.get((name, key), 0) + value
+            if error is not None:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.totals.clear()
+            self.errors.clear()
+
+    def to_json(self)-> dict:
+        with self._lock:
+            return {
+                name: {
+                    "latency_seconds": histogram.summary(),
+                    "errors": self.errors.get(name, 0),
+                    "totals": {key: value for (span_name, key), value in self.totals.items() if span_name == name}
+                }
+                for name, histogram in sorted(self.histograms.items())
+            }
+
+    def to_prometheus(self)-> str:
+        metric = f"{METRIC_PREFIX}_span_duration_seconds"
+        lines = [f"# HELP {metric} Duration of traced spans.", f"# TYPE {metric} histogram"]
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{span="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum{{span="{name}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{span="{name}"}} {histogram.count}')
+            lines.append(f"# TYPE {METRIC_PREFIX}_span_errors_total counter")
+            for name, count in sorted(self.errors.items()):
+                lines.append(f'{METRIC_PREFIX}_span_errors_total{{span="{name}"}} {count}')
+            lines.append(f"# TYPE {METRIC_PREFIX}_span_attribute_total counter")
+            for (name, key), value in sorted(self.totals.items()):
+                lines.append(f'{METRIC_PREFIX}_span_attribute_total{{span="{name}",attribute="{key}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class Span:
+    enabled = True
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.parent = None
+        self.trace_id = None
+        self.start = 0.0
+        self._token = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def __enter__(self)-> "Span":
+        self.parent = _current_span.get()
+        self.trace_id = self.parent.trace_id if self.parent is not None else uuid.uuid4().hex
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        error = exc_type.__name__ if exc_type is not None else None
+        metrics.record(self.name, seconds, self.attributes, error)
+        if _hooks:
+            record = {
+                "name": self.name,
+                "trace_id": self.trace_id,
+                "parent": self.parent.name if self.parent is not None else None,
+                "seconds": seconds,
+                "error": error,
+                "attributes": dict(self.attributes)
+            }
+            for hook in list(_hooks):
+                try:
+                    hook(record)
+                except Exception as e:
+                    print(f"Tracing hook {getattr(hook, '__name__', hook)} failed: {str(e)}")
+        return False
+
+
+class _NoopSpan:
+    enabled = False
+
+    def set(self, key: str, value):
+        pass
+
+    def __enter__(self)-> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attributes)-> Span | _NoopSpan:
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def traced(name: str | None = None):
+    """Decorator version of span(), named after the function unless given"""
+    def decorator(fn):
+        span_name = name or fn.__name__
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable_tracing(enabled: bool = True):
+    global _enabled
+    _enabled = enabled
+
+
+def tracing_enabled()-> bool:
+    return _enabled
+
+
+def add_hook(hook: Callable[[dict], None]):
+    """hook(span_record) is called for every finished span while tracing is enabled"""
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[dict], None]):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def export_prometheus()-> str:
+    return metrics.to_prometheus()
+
+
+def export_json()-> dict:
+    return metrics.to_json()
+
+
+def save_metrics(file_path: str | Path):
+    """Write the current metrics, Prometheus text for .prom / .txt files and JSON otherwise"""
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, 'w') as file:
+        if file_path.suffix in (".prom", ".txt"):
+            file.write(export_prometheus())
+        else:
+            json.dump(export_json(), file, indent=2)
+
+
+def print_trace_summary():
+    summary = export_json()
+    if not summary:
+        print("No spans recorded (is tracing enabled?)")
+        return
+    print(f"{'span':<18} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, data in summary.items():
+        latency = data["latency_seconds"]
+        as_ms = lambda value: f"{value * 1000:9.1f}" if value is not None else f"{'-':>9}"
+        print(f"{name:<18} {latency['count']:>7} {as_ms(latency['p50'])} {as_ms(latency['p95'])} {as_ms(latency['p99'])} {data['errors']:>7}")
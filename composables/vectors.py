@@ -0,0 +1,76 @@
+"""
+Matryoshka named vectors for two-stage retrieval.
+
+jina-embeddings-v4 is trained so that the first N dimensions of an embedding are an embedding on
+their own. Every point therefore stores two named vectors computed from one API call:
+- "full":  the 512 dimension embedding, kept on disk by default (FULL_VECTOR_ON_DISK)
+- "small": its first SMALL_EMBEDDING_DIMENSION (128) dimensions, re-normalized, kept in RAM
+
+Two-stage search prefetches a shortlist (PREFETCH_FACTOR x limit) with the small vector, then rescores
+only that shortlist with the full vector, so final scores (and score thresholds) are full-vector cosines.
+SEARCH_MODE=full / small switch to single-stage search on one of the vectors (used by the benchmark).
+"""
+
+import math
+from os import environ
+
+from qdrant_client import models
+
+FULL_VECTOR = "full"
+SMALL_VECTOR = "small"
+SMALL_EMBEDDING_DIMENSION = int(environ.get('SMALL_EMBEDDING_DIMENSION', 128))
+FULL_VECTOR_ON_DISK = environ.get('FULL_VECTOR_ON_DISK', '1').lower() not in ('0', 'false', 'no')
+PREFETCH_FACTOR = int(environ.get('PREFETCH_FACTOR', 10))
+MIN_PREFETCH = 50
+
+SEARCH_TWO_STAGE = "two_stage"
+SEARCH_FULL = "full"
+SEARCH_SMALL = "small"
+SEARCH_MODES = (SEARCH_TWO_STAGE, SEARCH_FULL, SEARCH_SMALL)
+DEFAULT_SEARCH_MODE = environ.get('SEARCH_MODE', SEARCH_TWO_STAGE)
+
+
+def truncate_embedding(embedding: list[float], dimensions: int = SMALL_EMBEDDING_DIMENSION)-> list[float]:
+    """First `dimensions` values, scaled back to unit length"""
+    truncated = embedding[:dimensions]
+    norm = math.sqrt(sum(value * value for value in truncated))
+    return [value / norm for value in truncated] if norm else truncated
+
+
+def named_vectors(embedding: list[float], small_dimension: int = SMALL_EMBEDDING_DIMENSION)-> dict[str, list[float]]:
+    return {FULL_VECTOR: embedding, SMALL_VECTOR: truncate_embedding(embedding, small_dimension)}
+
+
+def vectors_config(full_dimension: int, small_dimension: int = SMALL_EMBEDDING_DIMENSION, full_on_disk: bool = FULL_VECTOR_ON_DISK)-> dict[str, models.VectorParams]:
+    return {
+        FULL_VECTOR: models.VectorParams(size=full_dimension, distance=models.Distance.COSINE, on_disk=full_on_disk),
+        SMALL_VECTOR: models.VectorParams(size=small_dimension, distance=models.Distance.COSINE)
+    }
+
+
+def prefetch_limit(limit: int, factor: int = PREFETCH_FACTOR)-> int:
+    return max(limit * factor, MIN_PREFETCH)
+
+
+def query_arguments(embedding: list[float], limit: int, mode: str = DEFAULT_SEARCH_MODE, small_dimension: int = SMALL_EMBEDDING_DIMENSION, prefetch: int | None = None)-> dict:
+    """query/using/prefetch arguments of qdrant query_points for a search mode"""
+    if mode == SEARCH_FULL:
+        return {"query": embedding, "using": FULL_VECTOR}
+    small_embedding = truncate_embedding(embedding, small_dimension)
+    if mode == SEARCH_SMALL:
+        return {"query": small_embedding, "using": SMALL_VECTOR}
+    if mode == SEARCH_TWO_STAGE:
+        return {
+            "prefetch": models.Prefetch(query=small_embedding, using=SMALL_VECTOR, limit=prefetch or prefetch_limit(limit)),
+            "query": embedding,
+            "using": FULL_VECTOR
+        }
+    raise ValueError(f"Unknown search mode '{mode}', expected one of {', '.join(SEARCH_MODES)}")
+
+
+def resident_vector_bytes(points: int, full_dimension: int, small_dimension: int = SMALL_EMBEDDING_DIMENSION, full_on_disk: bool = FULL_VECTOR_ON_DISK)-> dict[str, int]:
+    """float32 vector storage kept in RAM: single 512d vector vs small + (on disk) full named vectors"""
+    return {
+        "single_vector": points * full_dimension * 4,
+        "named_vectors": points * (small_dimension + (0 if full_on_disk else full_dimension)) * 4
+    }
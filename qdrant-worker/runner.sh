@@ -5,7 +5,10 @@ set -e
 # 1) Installs requirements.txt from /scripts if present
 # 2) Waits for Qdrant to be available
 # 3) Ensures /dist exists (writable)
-# 4) Runs scrape_data.py then setup_qdrant.py (sequential)
+# 4) Restores the collection from the snapshot bundle in /.cache/snapshots when it was built from the
+#    same character data and settings (setup_qdrant.py --restore-snapshot), nothing is embedded then
+# 5) Otherwise runs the pipeline stages prepare -> embed -> upsert (pipeline.py), cached embeddings are
+#    reused when the character data did not change, and exports a fresh snapshot bundle for the next start
 
 # Environment variables are read from docker.env via docker-compose env_file
 QDRANT_URL="${QDRANT_URL:-http://qdrant:6333}"
@@ -104,12 +107,17 @@ fi
 # Export convenience env vars for your scripts
 export ASSETS_DIR DIST_DIR QDRANT_URL QDRANT_API_KEY OPENAI_API_KEY JINA_API_KEY
 
-# Run setup_qdrant.py
-if [ -f /scripts/setup_qdrant.py ]; then
-  echo "Running /scripts/setup_qdrant.py..."
-  python /scripts/setup_qdrant.py
+# Fast path: load the snapshot bundle when it matches the current character data
+if python /scripts/setup_qdrant.py --restore-snapshot --no-build; then
+  echo "Collection restored from snapshot, skipping embedding."
+# Run the indexing stages of the pipeline; upsert is forced since the collection lives outside the pipeline state
+elif [ -f /scripts/pipeline.py ]; then
+  echo "Running /scripts/pipeline.py (prepare -> upsert)..."
+  python /scripts/pipeline.py --from prepare --until upsert --force upsert
+  # a failed export only costs the next cold start its fast path
+  python /scripts/setup_qdrant.py --create-snapshot --no-build || echo "Snapshot export failed, continuing."
 else
-  echo "Error: /scripts/setup_qdrant.py not found. Exiting."
+  echo "Error: /scripts/pipeline.py not found. Exiting."
   exit 3
 fi
 
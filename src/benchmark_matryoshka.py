@@ -0,0 +1,118 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from composables.files import open_json_file, open_jsonl_file, save_jsonl_file, save_json_file
+from composables.vectors import query_arguments, resident_vector_bytes, named_vectors, vectors_config, SEARCH_MODES, SEARCH_FULL, SMALL_EMBEDDING_DIMENSION, FULL_VECTOR_ON_DISK
+from composables.qdrant_backend import create_qdrant_client, MEMORY_BACKEND
+from composables.search import qd_client, jina_client, COLLECTION_NAME, EMBEDDING_DIMENSION
+from retrieval_evaluation import hit_rate, mrr
+
+# Single-stage (full 512d or small vector only) vs two-stage (small prefetch + full rescoring) search
+# on the golden questions: latency, hit rate / MRR, overlap with full-vector results and vector RAM.
+# Query embeddings are requested once and kept in .cache/benchmark, so re-runs only hit Qdrant.
+#   python src/benchmark_matryoshka.py --limit 100            (against the configured Qdrant collection)
+#   python src/benchmark_matryoshka.py --local                (in-memory Qdrant built from the pipeline's embeddings)
+
+GOLDEN_QUESTIONS_FILE_PATH = project_root / "src" / "assets" / "golden_questions.json"
+QUERY_EMBEDDINGS_FILE_PATH = project_root / ".cache" / "benchmark" / "query_embeddings.jsonl"
+PIPELINE_EMBEDDINGS_FILE_PATH = project_root / ".cache" / "pipeline" / "embeddings.jsonl"
+EMBED_BATCH_SIZE = 32
+
+
+def load_query_embeddings(questions: list[str], file_path: str | Path = QUERY_EMBEDDINGS_FILE_PATH)-> dict[str, list[float]]:
+    """Embedding of every question, missing ones are requested from Jina and appended to the cache file"""
+    file_path = Path(file_path)
+    embeddings = {row["question"]: row["embedding"] for row in open_jsonl_file(file_path=file_path)} if file_path.exists() else {}
+    missing = [question for question in dict.fromkeys(questions) if question not in embeddings]
+    if missing:
+        print(f"Embedding {len(missing)} questions ({len(embeddings)} cached)")
+        for start in range(0, len(missing), EMBED_BATCH_SIZE):
+            batch = missing[start:start + EMBED_BATCH_SIZE]
+            embeddings.update(zip(batch, jina_client.embed(batch)))
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        save_jsonl_file(file_path=file_path, data=[{"question": question, "embedding": embedding} for question, embedding in embeddings.items()])
+    return embeddings
+
+
+def build_local_collection(embeddings_path: str | Path):
+    """In-memory Qdrant with the named vectors of the pipeline's embed stage output"""
+    from qdrant_client import models
+    client = create_qdrant_client(backend=MEMORY_BACKEND)
+    client.create_collection(collection_name=COLLECTION_NAME, vectors_config=vectors_config(full_dimension=EMBEDDING_DIMENSION))
+    entries = open_jsonl_file(file_path=embeddings_path)
+    client.upload_points(collection_name=COLLECTION_NAME, points=[
+        models.PointStruct(id=entry["id"], vector=named_vectors(entry["embedding"])) for entry in entries
+    ])
+    return client, len(entries)
+
+
+def percentile(values: list[float], percent: float)-> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def run_benchmark(client, rows: list[dict], embeddings: dict[str, list[float]], limit: int, repeat: int)-> dict[str, dict]:
+    timings = {mode: [] for mode in SEARCH_MODES}
+    results = {mode: [] for mode in SEARCH_MODES}
+    for row in rows:
+        embedding = embeddings[row["question"]]
+        # modes are interleaved per question so that cache warmth and load drift hit all of them alike
+        for mode in SEARCH_MODES:
+            arguments = query_arguments(embedding=embedding, limit=limit, mode=mode)
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = client.query_points(collection_name=COLLECTION_NAME, **arguments, limit=limit, with_payload=False)
+                timings[mode].append(time.perf_counter() - start)
+            results[mode].append([str(point.id) for point in response.points])
+
+    summary = {}
+    for mode in SEARCH_MODES:
+        relevance = [[point_id == str(row["id"]) for point_id in ids] for row, ids in zip(rows, results[mode])]
+        overlap = [len(set(ids) & set(full_ids)) / max(len(full_ids), 1) for ids, full_ids in zip(results[mode], results[SEARCH_FULL])]
+        summary[mode] = {
+            "p50_ms": round(percentile(timings[mode], 50) * 1000, 3),
+            "p95_ms": round(percentile(timings[mode], 95) * 1000, 3),
+            "hit_rate": round(hit_rate(relevance_total=relevance), 4),
+            "mrr": round(mrr(relevance_total=relevance), 4),
+            "overlap_with_full": round(sum(overlap) / len(overlap), 4)
+        }
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Two-stage Matryoshka retrieval benchmark")
+    parser.add_argument("--limit", type=int, default=100, help="golden question entries to use (5 questions each)")
+    parser.add_argument("--top-k", type=int, default=5, help="results per query")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per query and mode")
+    parser.add_argument("--local", action="store_true", help="search an in-memory collection built from --embeddings instead of the Qdrant server")
+    parser.add_argument("--embeddings", default=PIPELINE_EMBEDDINGS_FILE_PATH, help="embed stage output used with --local")
+    parser.add_argument("--questions", default=GOLDEN_QUESTIONS_FILE_PATH)
+    parser.add_argument("--query-embeddings", default=QUERY_EMBEDDINGS_FILE_PATH, help="query embedding cache")
+    parser.add_argument("--output", default=None, help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    golden_questions = open_json_file(file_path=args.questions)[:args.limit]
+    rows = [{"id": entry["id"], "question": question} for entry in golden_questions for question in entry["questions"]]
+    embeddings = load_query_embeddings(questions=[row["question"] for row in rows], file_path=args.query_embeddings)
+
+    if args.local:
+        client, points = build_local_collection(embeddings_path=args.embeddings)
+        print("In-memory Qdrant searches exhaustively and keeps every vector in RAM, compare quality there, latency on a server")
+    else:
+        client, points = qd_client, qd_client.count(collection_name=COLLECTION_NAME).count
+    summary = run_benchmark(client=client, rows=rows, embeddings=embeddings, limit=args.top_k, repeat=args.repeat)
+    memory = resident_vector_bytes(points=points, full_dimension=EMBEDDING_DIMENSION)
+
+    print(f"{len(rows)} queries, top {args.top_k}, {points} points, small vector {SMALL_EMBEDDING_DIMENSION}d")
+    print(f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8} {'hit rate':>9} {'MRR':>7} {'overlap':>8}")
+    for mode, row in summary.items():
+        print(f"{mode:<10} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['hit_rate']:>9.3f} {row['mrr']:>7.3f} {row['overlap_with_full']:>8.1%}")
+    print(f"Vector RAM: single 512d vector {memory['single_vector'] / 2**20:.2f} MiB, "
+          f"named vectors {memory['named_vectors'] / 2**20:.2f} MiB (full vector on disk: {FULL_VECTOR_ON_DISK})")
+    if args.output:
+        save_json_file(file_path=args.output, data={"queries": len(rows), "top_k": args.top_k, "points": points, "modes": summary, "resident_vector_bytes": memory})
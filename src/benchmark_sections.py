@@ -0,0 +1,103 @@
+import argparse
+import gzip
+import sys
+import time
+from pathlib import Path
+from bs4 import BeautifulSoup
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from composables.html_cache import DEFAULT_HTML_CACHE_DIR
+from composables.sections import extract_sections, extract_sections_many, DEFAULT_PARSER
+
+# Previous scrape_data implementation, kept as the reference for speed and output equality
+
+def legacy_format_section(soup: BeautifulSoup, section_id: str)-> str | None:
+    try:
+        section = soup.find('h2', id=section_id)
+        if not section:
+            span_with_id = soup.find('span', id=section_id)
+            if span_with_id and span_with_id.parent.name == 'h2':
+                section = span_with_id.parent
+        if not section:
+            return None
+        content = []
+        current_elem = section.next_sibling
+        while current_elem:
+            if current_elem.name:
+                if current_elem.name == 'h2':
+                    break
+                content.append(current_elem.get_text().strip())
+            current_elem = current_elem.next_sibling
+        return '\n'.join(content)
+    except Exception as e:
+        print(f"Error parsing content: {e}")
+        return None
+
+def legacy_parse_content(content: bytes)-> dict[str, str | None]:
+    soup = BeautifulSoup(content, 'html.parser')
+    return {
+        "biography": legacy_format_section(soup=soup, section_id='Biography'),
+        "history": legacy_format_section(soup=soup, section_id='History')
+    }
+
+def load_cached_pages(cache_dir: str | Path, limit: int | None = None)-> list[bytes]:
+    pages = []
+    for body_path in sorted(Path(cache_dir).glob("*.html.gz")):
+        with gzip.open(body_path, 'rb') as file:
+            pages.append(file.read())
+        if limit is not None and len(pages) >= limit:
+            break
+    return pages
+
+def synthetic_page(index: int)-> bytes:
+    """MediaWiki-like page: navigation chrome around an article body with a few h2 sections"""
+    paragraphs = lambda topic: "".join(
+        f"<p>{topic} paragraph {i} of page {index}, with a <a href='/wiki/Link_{i}'>link</a> and <b>bold</b> text.</p>"
+        for i in range(12)
+    )
+    navigation = "".join(f"<li><a href='/wiki/Nav_{i}'>Navigation {i}</a></li>" for i in range(300))
+    history = f"<h2><span class='mw-headline' id='History'>History</span></h2>{paragraphs('History')}" if index % 3 else ""
+    return f"""<html><head><title>Character {index}</title><script>var config = {{}};</script></head>
+<body><div class="global-navigation"><ul>{navigation}</ul></div>
+<main><div class="mw-parser-output">
+<aside class="portable-infobox"><h2>Character {index}</h2><div>Race: Men</div></aside>
+<p>Character {index} was a figure of the Third Age.</p>
+<h2 id="Biography">Biography</h2>{paragraphs('Biography')}
+<table class="wikitable"><tr><td>Detail</td><td>Value</td></tr></table>
+{history}
+<h2 id="Portrayal_in_adaptations">Portrayal in adaptations</h2>{paragraphs('Adaptation')}
+</div></main>
+<footer><ul>{navigation}</ul></footer></body></html>""".encode('utf-8')
+
+def timed(label: str, fn, pages: list[bytes]):
+    start = time.perf_counter()
+    results = fn(pages)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<42} {elapsed:8.3f}s  {len(pages) / elapsed:9.1f} pages/s")
+    return results, elapsed
+
+parser = argparse.ArgumentParser(description="Benchmark the section extractor against the legacy format_biography / format_history")
+parser.add_argument("--cache-dir", default=DEFAULT_HTML_CACHE_DIR, help="raw HTML cache directory")
+parser.add_argument("--limit", type=int, default=None, help="max cached pages to use")
+parser.add_argument("--synthetic", type=int, default=200, help="synthetic pages to generate when the cache is empty")
+parser.add_argument("--workers", type=int, default=None, help="parser processes for the pool run")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    pages = load_cached_pages(args.cache_dir, limit=args.limit)
+    if pages:
+        print(f"Using {len(pages)} cached pages from {args.cache_dir}")
+    else:
+        pages = [synthetic_page(i) for i in range(args.synthetic)]
+        print(f"HTML cache is empty, using {len(pages)} synthetic pages")
+
+    legacy, legacy_time = timed("legacy (html.parser, 2 walks)", lambda docs: [legacy_parse_content(doc) for doc in docs], pages)
+    single, single_time = timed(f"extract_sections ({DEFAULT_PARSER}, 1 process)", lambda docs: extract_sections_many(docs, workers=1), pages)
+    pooled, pooled_time = timed(f"extract_sections ({DEFAULT_PARSER}, pool)", lambda docs: extract_sections_many(docs, workers=args.workers), pages)
+    same_parser, _ = timed("extract_sections (html.parser, 1 process)", lambda docs: [extract_sections(doc, parser='html.parser') for doc in docs], pages)
+
+    print(f"\nSpeedup: {legacy_time / single_time:.1f}x single process, {legacy_time / pooled_time:.1f}x with the pool")
+    for label, results in (("single process", single), ("pool", pooled), ("html.parser", same_parser)):
+        identical = sum(1 for old, new in zip(legacy, results) if old == new)
+        print(f"Identical output ({label}): {identical}/{len(pages)}")
@@ -0,0 +1,37 @@
+import argparse
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from composables.run_report import load_run_report, latest_run_reports, print_comparison, print_run_summary, compare_reports, DEFAULT_RUN_REPORT_DIR
+
+# compare two run reports side by side, e.g. before and after a change of batch size or rate limits
+#   python src/compare_runs.py --job questions                 (two most recent "questions" runs)
+#   python src/compare_runs.py baseline.json current.json
+
+parser = argparse.ArgumentParser(description="Compare the throughput and cost of two runs")
+parser.add_argument("reports", nargs="*", help="baseline and current run report files")
+parser.add_argument("--job", default=None, help="compare the two most recent runs of this job (ingest, questions, retrieval_search, rag_eval_gpt...)")
+parser.add_argument("--dir", default=DEFAULT_RUN_REPORT_DIR, help="run report directory")
+parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 when a metric regressed")
+args = parser.parse_args()
+
+if args.job is not None:
+    report_paths = latest_run_reports(job=args.job, count=2, report_dir=args.dir)
+elif len(args.reports) == 2:
+    report_paths = [Path(path) for path in args.reports]
+else:
+    parser.error("pass two report files or --job")
+if len(report_paths) < 2:
+    sys.exit(f"Need two reports to compare, found {len(report_paths)} in {args.dir}")
+
+baseline, current = (load_run_report(file_path=path) for path in report_paths)
+print(f"baseline: {report_paths[0]}")
+print_run_summary(summary=baseline)
+print(f"current:  {report_paths[1]}")
+print_run_summary(summary=current)
+print()
+print_comparison(baseline=baseline, current=current)
+if args.fail_on_regression and any(row["regressed"] for row in compare_reports(baseline=baseline, current=current)):
+    sys.exit(1)
@@ -0,0 +1,39 @@
+import sys
+import argparse
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from composables.files import convert_records_file
+
+# convert json artifacts in src/assets to JSONL (streamable) and/or zstd Parquet (columnar)
+# readers using composables.files.open_records / iter_records pick up a fresh .parquet copy automatically
+
+DEFAULT_ASSETS = [
+    "qdrant_records.json",
+    "lotr_characters.json",
+    "golden_questions.json",
+    "evaluation_results_gpt_4o_mini.json",
+    "evaluation_results_claude_3_5_haiku.json",
+    "retrieval_search_results.json",
+]
+
+parser = argparse.ArgumentParser(description="Convert JSON assets to JSONL / Parquet")
+parser.add_argument("files", nargs="*", help="files to convert (default: known files in src/assets)")
+parser.add_argument("--format", choices=["parquet", "jsonl", "both"], default="parquet")
+args = parser.parse_args()
+
+assets_path = project_root / "src" / "assets"
+source_paths = [Path(f) for f in args.files] if args.files else [assets_path / name for name in DEFAULT_ASSETS]
+target_suffixes = [".parquet", ".jsonl"] if args.format == "both" else [f".{args.format}"]
+
+for source_path in source_paths:
+    if not source_path.exists():
+        print(f"Skipping {source_path.name}: not found")
+        continue
+    for suffix in target_suffixes:
+        target_path = source_path.with_suffix(suffix)
+        count = convert_records_file(source_path=source_path, target_path=target_path)
+        source_size = source_path.stat().st_size
+        target_size = target_path.stat().st_size
+        print(f"{source_path.name} -> {target_path.name}: {count} records, {source_size / 1e6:.2f} MB -> {target_size / 1e6:.2f} MB")
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from composables.files import save_json_file
+from composables.load_generator import LoadGenerator, LoadError, saturation_point, CLOSED_LOOP, OPEN_LOOP, DEFAULT_MAX_IN_FLIGHT
+from composables.provider_emulator import ProviderEmulator, default_profiles, start_emulator, emulator_environment, hashed_embedding, DEFAULT_SEED
+from composables.serving import DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_WAITING
+from composables.tracing import enable_tracing
+
+# Load test of the query path: replays the golden questions at a concurrency or a rate and reports
+# throughput, p50/p95/p99 per stage, error rates and the saturation point of a sweep.
+#   python src/load_test.py --hermetic --concurrency 10 50 200                    (search, emulated providers, in-memory Qdrant)
+#   python src/load_test.py --hermetic --target answer --rate 5 10 20 40 --max-p95-ms 3000
+#   python src/load_test.py --hermetic --service --concurrency 10 50 200         (through an in-process query service)
+#   python src/load_test.py --url http://127.0.0.1:8080 --rate 10 --duration 60   (a running query service, end-to-end only)
+# composables.search reads the provider and Qdrant settings when imported, so it is imported after --hermetic
+# has pointed them at the emulator.
+
+GOLDEN_QUESTIONS_FILE_PATH = project_root / "src" / "assets" / "golden_questions.json"
+QDRANT_RECORDS_FILE_PATH = project_root / "src" / "assets" / "qdrant_records.json"
+REPORTS_DIR = project_root / ".cache" / "load_tests"
+TARGETS = ("search", "answer")
+REQUEST_TIMEOUT = 60
+UPSERT_BATCH_SIZE = 256
+
+
+def load_queries(file_path: str | Path = GOLDEN_QUESTIONS_FILE_PATH, count: int | None = None, seed: int = DEFAULT_SEED)-> list[str]:
+    """Every golden question in a seeded order, so neighbouring requests ask about different characters"""
+    with open(file_path, 'r') as file:
+        questions = [question for entry in json.load(file) for question in entry["questions"]]
+    random.Random(seed).shuffle(questions)
+    return questions[:count] if count else questions
+
+
+def start_hermetic_environment(work_dir: str, latency_scale: float, error_rate: float | None, seed: int, emulator_url: str | None = None):
+    """
+    Emulated Jina / OpenAI / Anthropic and an in-memory Qdrant for this process, caches and content in work_dir.
+    The emulator runs in this process unless emulator_url points at one started with src/provider_emulator.py
+    """
+    server, emulator = None, None
+    if emulator_url:
+        base_url = emulator_url.rstrip("/")
+    else:
+        profiles = default_profiles()
+        if error_rate is not None:
+            for profile in profiles.values():
+                profile.error_rate = error_rate
+        emulator = ProviderEmulator(profiles=profiles, seed=seed, latency_scale=latency_scale)
+        server, base_url = start_emulator(emulator)
+    os.environ.update(emulator_environment(base_url))
+    os.environ.update({
+        # a fresh cache per run, a warm one from an earlier run would make it incomparable
+        "LLM_CACHE_PATH": str(Path(work_dir) / "llm_cache.sqlite"),
+        "EMBEDDING_CACHE_PATH": str(Path(work_dir) / "embedding_cache.sqlite"),
+        "CONTENT_STORE_PATH": str(Path(work_dir) / "content_store.sqlite"),
+        "QDRANT_BACKEND": "memory"
+    })
+    for key in ("OPENAI_API_KEY", "JINA_API_KEY", "ANTHROPIC_API_KEY"):
+        os.environ.setdefault(key, "emulator")
+    return server, emulator
+
+
+def build_hermetic_collection(file_path: str | Path = QDRANT_RECORDS_FILE_PATH)-> int:
+    """Character collection built from the assets with the emulator's embeddings, so emulated queries find their characters"""
+    from qdrant_client import models
+    from composables.search import qd_client, COLLECTION_NAME, EMBEDDING_DIMENSION
+    from composables.content_store import content_store, split_payload
+    from composables.vectors import named_vectors, vectors_config
+    with open(file_path, 'r') as file:
+        records = json.load(file)
+    qd_client.create_collection(collection_name=COLLECTION_NAME, vectors_config=vectors_config(full_dimension=EMBEDDING_DIMENSION))
+    content = {}
+    for start in range(0, len(records), UPSERT_BATCH_SIZE):
+        points = []
+        for record in records[start:start + UPSERT_BATCH_SIZE]:
+            payload, content[record["id"]] = split_payload(record["payload"])
+            embedding = hashed_embedding(record["payload"].get("embedded_text") or payload.get("name") or "", dimensions=EMBEDDING_DIMENSION)
+            points.append(models.PointStruct(id=record["id"], vector=named_vectors(embedding), payload=payload))
+        qd_client.upsert(collection_name=COLLECTION_NAME, points=points)
+    content_store.put_many(content)
+    return len(records)
+
+
+def function_target(target: str, limit: int):
+    """call(query) running search() or the RAG answer chain in this process"""
+    from composables.search import search, format_hits_response, llm
+    from rag_evaluation_fn import format_rag_prompt
+
+    def call_search(query: str)-> list[dict]:
+        results = search(query=query, limit=limit)
+        if results is None:
+            raise LoadError("search_failed")
+        return results
+
+    def call_answer(query: str)-> str:
+        context = format_hits_response(hits=call_search(query))
+        user_prompt, system_prompt = format_rag_prompt(query=query, search_results=context)
+        return llm(user_prompt=user_prompt, system_prompt=system_prompt)
+
+    return call_search if target == "search" else call_answer
+
+
+def service_target(url: str, target: str, limit: int, timeout: float = REQUEST_TIMEOUT):
+    """call(query) posting to /search or /answer of a query service, one keep-alive session per load thread"""
+    endpoint = f"{url.rstrip('/')}/{target}"
+    sessions = threading.local()
+
+    def call(query: str)-> dict:
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        response = sessions.session.post(endpoint, json={"query": query, "limit": limit}, timeout=timeout)
+        if response.status_code == 503:
+            raise LoadError("overloaded")
+        if response.status_code != 200:
+            raise LoadError(f"http_{response.status_code}")
+        return response.json()
+
+    return call
+
+
+def start_query_service(max_concurrency: int, max_waiting: int)-> tuple[object, str]:
+    """src/query_service.py in a daemon thread of this process (spans are recorded here too), returns (server, url)"""
+    from query_service import QueryService, create_server
+    service = QueryService(max_concurrency=max_concurrency, max_waiting=max_waiting)
+    service.warm_up()
+    server = create_server(service=service, host="127.0.0.1", port=0, quiet=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def print_step(step: dict):
+    latency = step["latency"]
+    as_ms = lambda value: f"{value:9.1f}" if value is not None else f"{'-':>9}"
+    print(f"{step['mode']}={step['level']:<8g} {step['throughput_rps']:>9.2f} {step['requests']:>8} {(step['error_rate'] or 0):>7.2%} {as_ms(latency['p50_ms'])} {as_ms(latency['p95_ms'])} {as_ms(latency['p99_ms'])}  {step['errors'] or ''}")
+    for name, stage in step["stages"].items():
+        print(f"    {name:<16} {stage['count']:>8} {as_ms(stage['p50_ms'])} {as_ms(stage['p95_ms'])} {as_ms(stage['p99_ms'])} {stage['errors']:>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of search / RAG answers with the golden questions")
+    parser.add_argument("--target", choices=TARGETS, default="search")
+    levels = parser.add_mutually_exclusive_group()
+    levels.add_argument("--concurrency", type=int, nargs="+", help="virtual users (closed loop), several values sweep")
+    levels.add_argument("--rate", type=float, nargs="+", help="requests per second (open loop), several values sweep")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds per step")
+    parser.add_argument("--warm-up", type=float, default=5, help="unmeasured seconds before each step")
+    parser.add_argument("--limit", type=int, default=5, help="search results per query")
+    parser.add_argument("--questions", type=int, default=None, help="replay only the first N (shuffled) golden questions")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="question order and emulator randomness")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="open loop: requests running at once, later ones queue")
+    parser.add_argument("--url", default=None, help="base URL of a running query service instead of in-process calls")
+    parser.add_argument("--service", action="store_true", help="start the query service in this process and load it over HTTP")
+    parser.add_argument("--service-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--service-max-waiting", type=int, default=DEFAULT_MAX_WAITING)
+    parser.add_argument("--hermetic", action="store_true", help="emulated providers and an in-memory Qdrant built from the assets")
+    parser.add_argument("--emulator-url", default=None, help="--hermetic: use a separately started emulator (no GIL shared with the load)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="--hermetic: multiplies the emulated provider latencies")
+    parser.add_argument("--error-rate", type=float, default=None, help="--hermetic: share of provider requests failing with a 5xx")
+    parser.add_argument("--use-cache", action="store_true", help="serve repeated prompts from the LLM cache (off: every answer calls the LLM)")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="saturation: highest acceptable p95")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="saturation: highest acceptable error rate")
+    parser.add_argument("--output", default=None, help="report file, .cache/load_tests/<target>_<timestamp>.json by default")
+    args = parser.parse_args()
+
+    if args.url and (args.hermetic or args.service):
+        parser.error("--url loads an external service, it cannot be combined with --hermetic or --service")
+    if args.emulator_url and not args.hermetic:
+        parser.error("--emulator-url only applies to --hermetic runs")
+    mode, steps = (OPEN_LOOP, args.rate) if args.rate else (CLOSED_LOOP, args.concurrency or [10])
+
+    work_dir = tempfile.TemporaryDirectory(prefix="lotr-load-")
+    emulator = None
+    if args.hermetic:
+        emulator_server, emulator = start_hermetic_environment(work_dir=work_dir.name, latency_scale=args.latency_scale, error_rate=args.error_rate, seed=args.seed, emulator_url=args.emulator_url)
+    if not args.use_cache:
+        os.environ["LLM_CACHE_DISABLED"] = "1"
+    # spans of in-process calls (and of an in-process service) give the per-stage latencies
+    enable_tracing()
+    if args.hermetic:
+        print(f"Hermetic run: {build_hermetic_collection()} characters in an in-memory collection, providers emulated")
+
+    service_server = None
+    if args.url:
+        call = service_target(url=args.url, target=args.target, limit=args.limit)
+    elif args.service:
+        service_server, service_url = start_query_service(max_concurrency=args.service_concurrency, max_waiting=args.service_max_waiting)
+        call = service_target(url=service_url, target=args.target, limit=args.limit)
+    else:
+        call = function_target(target=args.target, limit=args.limit)
+
+    generator = LoadGenerator(call=call, queries=load_queries(count=args.questions, seed=args.seed), max_in_flight=args.max_in_flight)
+    results = []
+    print(f"{'step':<20} {'ok/s':>9} {'requests':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    try:
+        for level in sorted(steps):
+            step = generator.run(mode=mode, level=level, duration=args.duration, warm_up=args.warm_up)
+            results.append(step)
+            print_step(step)
+    except KeyboardInterrupt:
+        print("Interrupted, reporting the finished steps")
+    finally:
+        if service_server is not None:
+            service_server.shutdown()
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "target": args.target,
+        "via": args.url or ("service" if args.service else "functions"),
+        "mode": mode,
+        "hermetic": args.hermetic,
+        "settings": {key: value for key, value in vars(args).items() if key not in ("concurrency", "rate")},
+        "steps": results
+    }
+    if len(results) > 1:
+        report["saturation"] = saturation_point(results, max_p95_ms=args.max_p95_ms, max_error_rate=args.max_error_rate)
+        saturation = report["saturation"]
+        if saturation["level"] is None:
+            print(f"Saturated from the first step: {saturation['reason']}")
+        else:
+            print(f"Saturation: highest healthy {mode} {saturation['level']:g} ({saturation['throughput_rps']} ok/s, p95 {saturation['p95_ms']} ms), next step: {saturation['reason']}")
+    if emulator is not None:
+        report["emulator"] = emulator.stats()
+        emulator_server.shutdown()
+    elif args.emulator_url:
+        report["emulator"] = requests.get(f"{args.emulator_url.rstrip('/')}/stats", timeout=REQUEST_TIMEOUT).json()
+    output = Path(args.output) if args.output else REPORTS_DIR / f"{args.target}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    save_json_file(file_path=output, data=report)
+    print(f"Report saved to {output}")
+    work_dir.cleanup()
@@ -0,0 +1,43 @@
+import sys
+import argparse
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from composables.files import save_json_file
+from composables.sharding import merge_shard_outputs, ShardIncompleteError
+
+# merge the per-shard outputs of a sharded run into the combined artifact and print its metrics
+# the merged file is identical whatever the shard count, rows come back in input order
+
+assets_path = project_root / "src" / "assets"
+ARTIFACTS = {
+    "questions": assets_path / "golden_questions.json",
+    "retrieval": assets_path / "retrieval_search_results.json",
+    "rag-gpt": assets_path / "evaluation_results_gpt_4o_mini.json",
+    "rag-anthropic": assets_path / "evaluation_results_claude_3_5_haiku.json",
+}
+
+parser = argparse.ArgumentParser(description="Merge shard outputs")
+parser.add_argument("--artifact", choices=list(ARTIFACTS), required=True)
+parser.add_argument("--shards", type=int, required=True, help="shard count the run was started with")
+args = parser.parse_args()
+
+artifact_path = ARTIFACTS[args.artifact]
+try:
+    merged = list(merge_shard_outputs(file_path=artifact_path, shard_count=args.shards))
+except (ShardIncompleteError, FileNotFoundError) as e:
+    # the combined artifact is left as it was
+    print(f"❌ Not merging {args.artifact}: {str(e)}")
+    sys.exit(1)
+save_json_file(file_path=artifact_path, data=merged)
+print(f"Merged {len(merged)} rows from {args.shards} shards into {artifact_path}")
+
+if args.artifact == "retrieval":
+    from retrieval_evaluation import get_strategies_list, generate_evaluations_per_strategy, print_evaluation_result
+    eval_result = generate_evaluations_per_strategy(search_results=merged, strategies=get_strategies_list())
+    print_evaluation_result(results=eval_result)
+elif args.artifact in ("rag-gpt", "rag-anthropic"):
+    from composables.eval_analysis import analyze_evaluation_result
+    judge = "gpt-4o-mini" if args.artifact == "rag-gpt" else "claude-3-5-haiku-20241022"
+    analyze_evaluation_result(file_path=artifact_path, judge=judge)
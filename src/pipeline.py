@@ -0,0 +1,203 @@
+import argparse
+import json
+import sys
+import pandas as pd
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from composables.files import open_json_file, save_json_file, open_jsonl_file, save_jsonl_file
+from composables.pipeline import Pipeline, Stage, print_timings, file_fingerprint, DEFAULT_PIPELINE_STATE_PATH, STAGE_FAILED
+from composables.run_report import track_run
+from composables.vectors import FULL_VECTOR_ON_DISK
+from composables.passages import SEARCH_GRANULARITY, PASSAGE_GRANULARITY
+import setup_qdrant
+
+# scrape -> clean -> prepare -> embed -> upsert -> passages_embed -> passages_upsert -> export -> questions -> eval
+# every stage declares its input and output files, src/pipeline.py only re-runs the stages
+# whose inputs changed since their last run (see composables/pipeline.py)
+
+ASSETS_DIR = project_root / "assets"
+# next to this script, src/ is mounted at /scripts in the worker container
+SRC_ASSETS_DIR = Path(__file__).resolve().parent / "assets"
+DIST_DIR = project_root / "dist"
+PIPELINE_DIR = project_root / ".cache" / "pipeline"
+
+SCRAPED_FILE_PATH = DIST_DIR / "lotr_characters.json"
+CHARACTERS_FILE_PATH = setup_qdrant.CHARACTERS_FILE_PATH
+CHARACTERS_CSV_FILE_PATH = SRC_ASSETS_DIR / "lotr_characters.csv"
+PREPARED_FILE_PATH = PIPELINE_DIR / "prepared_texts.jsonl"
+EMBEDDINGS_FILE_PATH = PIPELINE_DIR / "embeddings.jsonl"
+UPSERT_MANIFEST_FILE_PATH = PIPELINE_DIR / "upsert_manifest.json"
+PASSAGE_EMBEDDINGS_FILE_PATH = PIPELINE_DIR / "passage_embeddings.jsonl"
+PASSAGES_MANIFEST_FILE_PATH = PIPELINE_DIR / "passages_manifest.json"
+QDRANT_RECORDS_FILE_PATH = setup_qdrant.QDRANT_RECORDS_FILE_PATH
+GOLDEN_QUESTIONS_FILE_PATH = SRC_ASSETS_DIR / "golden_questions.json"
+RETRIEVAL_SEARCH_RESULTS_FILE_PATH = SRC_ASSETS_DIR / "retrieval_search_results.json"
+
+MAX_TOKENS_PER_TEXT = setup_qdrant.MAX_TOKENS_PER_TEXT
+MAX_TOKENS_PER_BATCH = setup_qdrant.MAX_TOKENS_PER_BATCH
+EVAL_QUESTION_LIMIT = 100
+
+
+def run_scrape():
+    from scrape_data import scrape_and_save_in_json
+    scrape_and_save_in_json(SCRAPED_FILE_PATH.stem)
+
+def clean_character(character: dict)-> dict:
+    """Strip surrounding whitespace from text fields, empty strings become null"""
+    cleaned = {}
+    for field, value in character.items():
+        if isinstance(value, str):
+            value = value.strip() or None
+        cleaned[field] = value
+    return cleaned
+
+def run_clean():
+    characters = [clean_character(character) for character in open_json_file(file_path=SCRAPED_FILE_PATH)]
+    with open(CHARACTERS_FILE_PATH, 'w') as file:
+        json.dump(characters, file, indent=4)
+    pd.DataFrame(characters).to_csv(CHARACTERS_CSV_FILE_PATH)
+    print(f"Cleaned {len(characters)} characters")
+
+def run_prepare():
+    prepared_data = setup_qdrant.prepare_character_texts(characters=open_json_file(file_path=CHARACTERS_FILE_PATH), max_tokens_per_text=MAX_TOKENS_PER_TEXT)
+    PIPELINE_DIR.mkdir(parents=True, exist_ok=True)
+    save_jsonl_file(file_path=PREPARED_FILE_PATH, data=prepared_data)
+
+def run_embed():
+    prepared_data = open_jsonl_file(file_path=PREPARED_FILE_PATH)
+    batches = setup_qdrant.build_token_batches(prepared_data=prepared_data, max_tokens_per_batch=MAX_TOKENS_PER_BATCH)
+    with track_run("ingest", collection=setup_qdrant.COLLECTION_NAME, max_tokens_per_batch=MAX_TOKENS_PER_BATCH) as report:
+        embedded = setup_qdrant.embed_batches(batches=batches, max_tokens_per_text=MAX_TOKENS_PER_TEXT)
+        report.add_items(len(embedded))
+    print(f"Embedded {len(embedded)}/{len(prepared_data)} texts")
+    save_jsonl_file(file_path=EMBEDDINGS_FILE_PATH, data=embedded)
+
+def run_upsert():
+    embedded = open_jsonl_file(file_path=EMBEDDINGS_FILE_PATH)
+    # blue/green: the live version keeps serving until the new one is validated and the alias switched
+    version = setup_qdrant.create_collection_version()
+    upserted = setup_qdrant.upsert_points(embedded=embedded, collection_name=version)
+    if upserted == 0:
+        setup_qdrant.qd_client.delete_collection(collection_name=version)
+        setup_qdrant.content_store.drop_version(version)
+        raise RuntimeError("nothing was upserted")
+    # every prepared text has to make it into the new version
+    setup_qdrant.publish_collection_version(collection_name=version, expected_points=len(open_jsonl_file(file_path=PREPARED_FILE_PATH)))
+    # the manifest only depends on what was upserted, so an identical re-upsert does not invalidate export
+    save_json_file(file_path=UPSERT_MANIFEST_FILE_PATH, data={
+        "collection": setup_qdrant.COLLECTION_NAME,
+        "points": upserted,
+        "embeddings_fingerprint": file_fingerprint(EMBEDDINGS_FILE_PATH)
+    })
+
+def run_passages_embed():
+    prepared_data = setup_qdrant.prepare_passage_texts(characters=open_json_file(file_path=CHARACTERS_FILE_PATH))
+    batches = setup_qdrant.build_token_batches(prepared_data=prepared_data, max_tokens_per_batch=MAX_TOKENS_PER_BATCH)
+    with track_run("ingest_passages", collection=setup_qdrant.PASSAGE_COLLECTION_NAME, max_tokens_per_batch=MAX_TOKENS_PER_BATCH) as report:
+        embedded = setup_qdrant.embed_batches(batches=batches, max_tokens_per_text=setup_qdrant.MAX_TOKENS)
+        report.add_items(len(embedded))
+    print(f"Embedded {len(embedded)}/{len(prepared_data)} passages")
+    PIPELINE_DIR.mkdir(parents=True, exist_ok=True)
+    save_jsonl_file(file_path=PASSAGE_EMBEDDINGS_FILE_PATH, data=embedded)
+
+def run_passages_upsert():
+    embedded = open_jsonl_file(file_path=PASSAGE_EMBEDDINGS_FILE_PATH)
+    setup_qdrant.reinitiate_passage_collection()
+    upserted = setup_qdrant.upsert_passage_points(embedded=embedded)
+    if upserted == 0:
+        raise RuntimeError("no passage was upserted")
+    save_json_file(file_path=PASSAGES_MANIFEST_FILE_PATH, data={
+        "collection": setup_qdrant.PASSAGE_COLLECTION_NAME,
+        "points": upserted,
+        "embeddings_fingerprint": file_fingerprint(PASSAGE_EMBEDDINGS_FILE_PATH)
+    })
+
+def run_export():
+    from composables.search import get_qdrant_records
+    records = sorted(get_qdrant_records(), key=lambda record: str(record["id"]))
+    save_json_file(file_path=QDRANT_RECORDS_FILE_PATH, data=records)
+
+def run_questions():
+    from retrieval_evaluation import generate_questions_and_save_json
+    generate_questions_and_save_json()
+
+def run_eval():
+    from retrieval_evaluation import get_formatted_search_result, get_strategies_list, generate_evaluations_per_strategy, print_evaluation_result
+    golden_questions = open_json_file(file_path=GOLDEN_QUESTIONS_FILE_PATH)[:EVAL_QUESTION_LIMIT]
+    search_results, _ = get_formatted_search_result(golden_questions=golden_questions)
+    save_json_file(file_path=RETRIEVAL_SEARCH_RESULTS_FILE_PATH, data=search_results)
+    eval_result = generate_evaluations_per_strategy(search_results=search_results, strategies=get_strategies_list())
+    print_evaluation_result(results=eval_result)
+
+
+def build_pipeline(state_path: str | Path = DEFAULT_PIPELINE_STATE_PATH)-> Pipeline:
+    embedding_params = {
+        "model": setup_qdrant.JINA_EMBEDDING_MODEL,
+        "dimensions": setup_qdrant.EMBEDDING_DIMENSION,
+        "task": setup_qdrant.INDEXING_TASK
+    }
+    return Pipeline(state_path=state_path, stages=[
+        Stage("scrape", run_scrape,
+              inputs=[ASSETS_DIR / "characters_with_link.csv", ASSETS_DIR / "characters_detail.csv"],
+              outputs=[SCRAPED_FILE_PATH]),
+        Stage("clean", run_clean,
+              inputs=[SCRAPED_FILE_PATH],
+              outputs=[CHARACTERS_FILE_PATH, CHARACTERS_CSV_FILE_PATH]),
+        # the exported records decide which point ids the characters keep (composables/point_ids.py)
+        Stage("prepare", run_prepare,
+              inputs=[CHARACTERS_FILE_PATH, QDRANT_RECORDS_FILE_PATH],
+              outputs=[PREPARED_FILE_PATH],
+              params={"max_tokens_per_text": MAX_TOKENS_PER_TEXT}),
+        Stage("embed", run_embed,
+              inputs=[PREPARED_FILE_PATH],
+              outputs=[EMBEDDINGS_FILE_PATH],
+              params={**embedding_params, "max_tokens_per_batch": MAX_TOKENS_PER_BATCH}),
+        Stage("upsert", run_upsert,
+              inputs=[EMBEDDINGS_FILE_PATH],
+              outputs=[UPSERT_MANIFEST_FILE_PATH],
+              params={"collection": setup_qdrant.COLLECTION_NAME, "small_dimension": setup_qdrant.SMALL_EMBEDDING_DIMENSION, "full_on_disk": FULL_VECTOR_ON_DISK}),
+        Stage("passages_embed", run_passages_embed,
+              inputs=[CHARACTERS_FILE_PATH, QDRANT_RECORDS_FILE_PATH],
+              outputs=[PASSAGE_EMBEDDINGS_FILE_PATH],
+              params={**embedding_params, "max_tokens_per_passage": setup_qdrant.PASSAGE_MAX_TOKENS, "max_tokens_per_batch": MAX_TOKENS_PER_BATCH}),
+        Stage("passages_upsert", run_passages_upsert,
+              inputs=[PASSAGE_EMBEDDINGS_FILE_PATH],
+              outputs=[PASSAGES_MANIFEST_FILE_PATH],
+              params={"collection": setup_qdrant.PASSAGE_COLLECTION_NAME, "small_dimension": setup_qdrant.SMALL_EMBEDDING_DIMENSION, "full_on_disk": FULL_VECTOR_ON_DISK}),
+        Stage("export", run_export,
+              inputs=[UPSERT_MANIFEST_FILE_PATH],
+              outputs=[QDRANT_RECORDS_FILE_PATH]),
+        Stage("questions", run_questions,
+              inputs=[QDRANT_RECORDS_FILE_PATH],
+              outputs=[GOLDEN_QUESTIONS_FILE_PATH]),
+        Stage("eval", run_eval,
+              inputs=[GOLDEN_QUESTIONS_FILE_PATH, UPSERT_MANIFEST_FILE_PATH] + ([PASSAGES_MANIFEST_FILE_PATH] if SEARCH_GRANULARITY == PASSAGE_GRANULARITY else []),
+              outputs=[RETRIEVAL_SEARCH_RESULTS_FILE_PATH],
+              params={"limit": EVAL_QUESTION_LIMIT, "granularity": SEARCH_GRANULARITY, **embedding_params})
+    ])
+
+
+parser = argparse.ArgumentParser(description="Run the scrape -> eval pipeline incrementally")
+parser.add_argument("--from", dest="from_stage", default=None, help="first stage to consider (earlier outputs are taken as they are)")
+parser.add_argument("--until", dest="until_stage", default=None, help="last stage to consider")
+parser.add_argument("--only", nargs="+", default=None, help="consider only these stages")
+parser.add_argument("--force", nargs="+", default=[], help="run these stages even if they are up to date")
+parser.add_argument("--status", action="store_true", help="show which stages are up to date and exit")
+parser.add_argument("--state", default=DEFAULT_PIPELINE_STATE_PATH, help="pipeline state file")
+
+# the guard keeps worker processes (e.g. the scraper's parser pool) from re-running the pipeline
+if __name__ == "__main__":
+    args = parser.parse_args()
+    pipeline = build_pipeline(state_path=args.state)
+    stages = pipeline.select(from_stage=args.from_stage, until_stage=args.until_stage, only=args.only)
+    if args.status:
+        for row in pipeline.status(stages=stages):
+            last_run = f"last run {row['last_run_seconds']:.2f}s" if row['last_run_seconds'] is not None else "never run"
+            print(f"{row['stage']:<12} {'up to date' if row['up_to_date'] else 'stale':<12} {last_run}")
+    else:
+        timings = pipeline.run(stages=stages, force=args.force)
+        print_timings(timings=timings)
+        if any(row["status"] == STAGE_FAILED for row in timings):
+            sys.exit(1)
@@ -0,0 +1,59 @@
+import argparse
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from composables.provider_emulator import ProviderEmulator, EMULATED_PROVIDERS, create_emulator_server, default_profiles, emulator_environment, DEFAULT_EMULATOR_HOST, DEFAULT_EMULATOR_PORT, DEFAULT_SEED
+
+# Local Jina / OpenAI / Anthropic stand-in (see composables/provider_emulator.py)
+#   python src/provider_emulator.py --port 8090 --rpm openai=500 --error-rate jina=0.02
+# then export the variables it prints (provider URLs and separate response caches) before running any script
+
+
+def parse_provider_values(values: list[str], cast=float)-> dict[str, float]:
+    """['openai=500', '0.01'] -> {'openai': 500.0, every provider: 0.01}, a bare value applies to every provider"""
+    parsed = {}
+    for value in values or []:
+        provider, _, number = value.rpartition("=")
+        if provider and provider not in EMULATED_PROVIDERS:
+            raise argparse.ArgumentTypeError(f"unknown provider '{provider}', expected one of {', '.join(EMULATED_PROVIDERS)}")
+        parsed.update({name: cast(number) for name in ([provider] if provider else EMULATED_PROVIDERS)})
+    return parsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local emulator of the Jina, OpenAI and Anthropic APIs")
+    parser.add_argument("--host", default=DEFAULT_EMULATOR_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_EMULATOR_PORT)
+    parser.add_argument("--latency-ms", action="append", help="median latency, [provider=]ms, repeatable")
+    parser.add_argument("--latency-sigma", type=float, default=None, help="spread of the lognormal latency (0 = constant)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplies every latency, 0 answers at once")
+    parser.add_argument("--rpm", action="append", help="requests per minute before 429, [provider=]n, repeatable")
+    parser.add_argument("--tpm", action="append", help="tokens per minute before 429, [provider=]n, repeatable")
+    parser.add_argument("--error-rate", action="append", help="share of requests answered with a 5xx, [provider=]rate, repeatable")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed of latencies and injected errors")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    profiles = default_profiles()
+    for option, attribute in (("latency_ms", "latency_ms"), ("rpm", "requests_per_minute"), ("tpm", "tokens_per_minute"), ("error_rate", "error_rate")):
+        for provider, value in parse_provider_values(getattr(args, option)).items():
+            setattr(profiles[provider], attribute, value)
+    if args.latency_sigma is not None:
+        for profile in profiles.values():
+            profile.latency_sigma = args.latency_sigma
+
+    server = create_emulator_server(emulator=ProviderEmulator(profiles=profiles, seed=args.seed, latency_scale=args.latency_scale), host=args.host, port=args.port, quiet=not args.verbose)
+    print(f"Provider emulator listening on http://{args.host}:{server.server_port}")
+    for provider, profile in profiles.items():
+        print(f"  {provider:<10} {profile.to_dict()}")
+    print("Point the clients at it with:")
+    for key, value in emulator_environment(f"http://{args.host}:{server.server_port}").items():
+        print(f"  export {key}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down")
+    finally:
+        server.server_close()
@@ -0,0 +1,258 @@
+import argparse
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import environ
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from composables.search import search, llm, format_hits_response, jina_client, query_batcher, qd_client, COLLECTION_NAME
+from composables.serving import SingleFlight, AdmissionControl, OverloadedError, DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_WAITING, DEFAULT_WAIT_TIMEOUT
+from composables.embedding_client import EmbeddingError
+from composables.content_store import SUMMARY_FIELDS, CONTEXT_FIELDS
+from composables.tracing import enable_tracing, export_prometheus, span
+from rag_evaluation_fn import format_rag_prompt
+
+# Long-running HTTP query service, the Qdrant, OpenAI and Jina clients are created once and reused
+#   GET  /health
+#   GET  /metrics                                   (Prometheus text: service counters + span latencies)
+#   POST /search  {"query": "...", "limit": 5, "threshold": 0.3, "fields": ["name", "biography"]}
+#   POST /answer  {"query": "...", "limit": 5}     (RAG answer with its context)
+# GET /search?query=...&limit=5 works too.
+
+DEFAULT_HOST = environ.get('QUERY_SERVICE_HOST', '127.0.0.1')
+DEFAULT_PORT = int(environ.get('QUERY_SERVICE_PORT', 8080))
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 20
+MAX_QUERY_CHARS = 2000
+MAX_BODY_BYTES = 64 * 1024
+SEARCH_FIELDS = (*SUMMARY_FIELDS, *CONTEXT_FIELDS)
+
+
+class BadRequestError(Exception):
+    pass
+
+
+class UpstreamError(Exception):
+    pass
+
+
+def normalize_query(query: str)-> str:
+    return " ".join(query.split())
+
+
+def parse_fields(fields)-> tuple[str, ...] | None:
+    """list or comma separated fields of /search hits, None for the summary fields"""
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+    if not isinstance(fields, list) or any(field not in SEARCH_FIELDS for field in fields):
+        raise BadRequestError(f"'fields' must be a list of: {', '.join(SEARCH_FIELDS)}")
+    return tuple(dict.fromkeys(fields))
+
+
+def parse_query_params(params: dict)-> tuple[str, int, float | None]:
+    query = params.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise BadRequestError("'query' must be a non-empty string")
+    if len(query) > MAX_QUERY_CHARS:
+        raise BadRequestError(f"'query' is longer than {MAX_QUERY_CHARS} characters")
+    try:
+        limit = int(params.get("limit", DEFAULT_LIMIT))
+        threshold = float(params["threshold"]) if params.get("threshold") is not None else None
+    except (TypeError, ValueError):
+        raise BadRequestError("'limit' must be an integer and 'threshold' a number")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequestError(f"'limit' must be between 1 and {MAX_LIMIT}")
+    return normalize_query(query), limit, threshold
+
+
+class QueryService:
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, max_waiting: int = DEFAULT_MAX_WAITING, wait_timeout: float = DEFAULT_WAIT_TIMEOUT):
+        self.flights = SingleFlight()
+        self.admission = AdmissionControl(max_concurrency=max_concurrency, max_waiting=max_waiting, wait_timeout=wait_timeout)
+        self.started = time.monotonic()
+
+    def _run(self, key: tuple, fn)-> tuple[object, bool]:
+        """Identical in-flight requests share one call, only that call takes a concurrency slot"""
+        def admitted():
+            with self.admission.slot():
+                return fn()
+        return self.flights.do(key, admitted)
+
+    def _search(self, query: str, limit: int, threshold: float | None, fields: tuple[str, ...] | None = None)-> list[dict]:
+        results = search(query=query, limit=limit, threshold=threshold, fields=fields)
+        if results is None:
+            raise UpstreamError("search failed, see the service log")
+        return results
+
+    def search(self, query: str, limit: int, threshold: float | None, fields: tuple[str, ...] | None = None)-> dict:
+        results, shared = self._run(("search", query, limit, threshold, fields), lambda: self._search(query=query, limit=limit, threshold=threshold, fields=fields))
+        return {"query": query, "results": results, "coalesced": shared}
+
+    def answer(self, query: str, limit: int, threshold: float | None)-> dict:
+        def run():
+            context = format_hits_response(hits=self._search(query=query, limit=limit, threshold=threshold))
+            user_prompt, system_prompt = format_rag_prompt(query=query, search_results=context)
+            return {"answer": llm(user_prompt=user_prompt, system_prompt=system_prompt), "context": context}
+        result, shared = self._run(("answer", query, limit, threshold), run)
+        return {"query": query, **result, "coalesced": shared}
+
+    def health(self)-> dict:
+        embedding = jina_client.metrics()
+        return {
+            "status": "degraded" if embedding["circuit"] != "closed" else "ok",
+            "uptime_seconds": round(time.monotonic() - self.started, 1),
+            "admission": self.admission.stats(),
+            "single_flight": self.flights.stats(),
+            "embedding": embedding,
+            "embedding_batching": query_batcher.metrics()
+        }
+
+    def metrics(self)-> str:
+        lines = []
+        for prefix, stats in (("admission", self.admission.stats()), ("single_flight", self.flights.stats()), ("embedding_batching", query_batcher.metrics())):
+            for key, value in stats.items():
+                if isinstance(value, (int, float)):
+                    lines.append(f"lotr_rag_service_{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n" + export_prometheus()
+
+    def warm_up(self, embed: bool = False):
+        """Open the Qdrant connection (and the Jina one with embed=True) before the first user request"""
+        with span("warm_up"):
+            qd_client.get_collection(collection_name=COLLECTION_NAME)
+            if embed:
+                self._search(query="warm up", limit=1, threshold=None)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    # keep-alive, clients reuse their connection for the next query
+    protocol_version = "HTTP/1.1"
+    service: QueryService = None
+    quiet = False
+
+    def log_message(self, format: str, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: dict, headers: dict | None = None):
+        self._send(status, json.dumps(body, ensure_ascii=False, default=str).encode("utf-8"), "application/json", headers)
+
+    def _send(self, status: int, data: bytes, content_type: str, headers: dict | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self)-> bytes:
+        """
+        The whole request body, read before routing so that no route (not even a 404) leaves bytes behind
+        that the next request on the keep-alive connection would be parsed from. A body that is not read
+        (too large, unknown length) closes the connection after the response.
+        """
+        if "Transfer-Encoding" in self.headers:
+            self.close_connection = True
+            raise BadRequestError("chunked request bodies are not supported, send a Content-Length")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self.close_connection = True
+            raise BadRequestError("Content-Length must be an integer")
+        if length < 0:
+            self.close_connection = True
+            raise BadRequestError("Content-Length must not be negative")
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise BadRequestError(f"request body larger than {MAX_BODY_BYTES} bytes")
+        return self.rfile.read(length) if length else b""
+
+    def _params(self, body: bytes)-> dict:
+        if self.command == "GET":
+            return {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+        try:
+            params = json.loads(body or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise BadRequestError("request body must be JSON")
+        if not isinstance(params, dict):
+            raise BadRequestError("request body must be a JSON object")
+        return params
+
+    def _handle(self):
+        path = urlparse(self.path).path
+        try:
+            body = self._read_body()
+            if path == "/health" and self.command == "GET":
+                self._send_json(200, self.service.health())
+            elif path == "/metrics" and self.command == "GET":
+                self._send(200, self.service.metrics().encode("utf-8"), "text/plain; version=0.0.4")
+            elif path in ("/search", "/answer"):
+                params = self._params(body)
+                query, limit, threshold = parse_query_params(params)
+                if path == "/search":
+                    self._send_json(200, self.service.search(query=query, limit=limit, threshold=threshold, fields=parse_fields(params.get("fields"))))
+                else:
+                    self._send_json(200, self.service.answer(query=query, limit=limit, threshold=threshold))
+            else:
+                self._send_json(404, {"error": f"no route for {self.command} {path}"})
+        except BadRequestError as e:
+            self._send_json(400, {"error": str(e)})
+        except OverloadedError as e:
+            self._send_json(503, {"error": f"overloaded: {str(e)}"}, headers={"Retry-After": str(int(e.retry_after))})
+        except (UpstreamError, EmbeddingError) as e:
+            self._send_json(502, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {str(e)}"})
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+
+class QueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # connections beyond the backlog are refused by the OS, admitted requests are bounded by AdmissionControl
+    request_queue_size = 128
+
+
+def create_server(service: QueryService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, quiet: bool = False)-> QueryServer:
+    handler = type("BoundQueryHandler", (QueryHandler,), {"service": service, "quiet": quiet})
+    return QueryServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP query service for search and RAG answers")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help="requests processed at once")
+    parser.add_argument("--max-waiting", type=int, default=DEFAULT_MAX_WAITING, help="requests queued for a slot before new ones get 503")
+    parser.add_argument("--wait-timeout", type=float, default=DEFAULT_WAIT_TIMEOUT, help="seconds a queued request waits for a slot")
+    parser.add_argument("--warm-up-embedding", action="store_true", help="also send one query embedding at startup")
+    parser.add_argument("--no-tracing", action="store_true", help="do not record span latencies for /metrics")
+    parser.add_argument("--quiet", action="store_true", help="do not log every request")
+    args = parser.parse_args()
+
+    enable_tracing(not args.no_tracing)
+    service = QueryService(max_concurrency=args.concurrency, max_waiting=args.max_waiting, wait_timeout=args.wait_timeout)
+    try:
+        service.warm_up(embed=args.warm_up_embedding)
+    except Exception as e:
+        print(f"Warm up failed, serving anyway: {type(e).__name__}: {str(e)}")
+    server = create_server(service=service, host=args.host, port=args.port, quiet=args.quiet)
+    print(f"Query service listening on http://{args.host}:{args.port} ({args.concurrency} concurrent, {args.max_waiting} queued)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down")
+    finally:
+        server.server_close()
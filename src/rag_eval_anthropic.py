@@ -1,22 +1,33 @@
 import json
 import sys
+import argparse
 from pathlib import Path
 from tqdm import tqdm
 from os import environ
-from anthropic import Anthropic
-from rag_evaluation_fn import format_rag_prompt
+from anthropic import Anthropic, APIConnectionError
+from rag_evaluation_fn import format_rag_prompt, generate_rag_eval_result_batch, dry_run_judge
 
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
-from composables.files import open_json_file, save_json_file
+from composables.files import open_json_file, save_json_file, iter_records
 from composables.search import llm, format_hits_response
+from composables.cache import llm_cache, make_cache_key, print_cache_stats
+from composables.batch import LocalBatchBackend, AnthropicBatchBackend
+from composables.sharding import parse_shard, run_sharded, shard_output_path
+from composables.eval_analysis import analyze_evaluation_result
+from composables.rate_limit import get_limiter, estimate_tokens, ANTHROPIC
+from composables.tracing import span
+from composables.run_report import run_report, track_run
+from composables.content_store import hydrate
 
 # Modified fns that are specific for RAG using Anthropic
 
 ANTHROPIC_API_KEY = environ.get("ANTHROPIC_API_KEY")
 ANTHROPIC_MODEL = "claude-3-5-haiku-20241022"
+ANTHROPIC_MAX_TOKENS = 1024
 
-anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY)
+# retries are left to the rate limit governor so it sees every 429
+anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY, max_retries=0)
 
 ## Evaluation prompt created optimized for claude-3-5-haiku-20241022
 def format_eval_prompt (payload: dict[str,str])-> tuple[str, str]:
@@ -74,19 +85,39 @@ No markdown formatting, no additional text, just the JSON object.
     
     return user_prompt, system_prompt
 
-def llm_anthropic(user_prompt: str, system_prompt: str):
-    message = anthropic_client.messages.create(
-        model="claude-3-5-haiku-20241022",
-        system=system_prompt,
-        max_tokens=1024,
-        messages=[
-            {"role": "user", "content": user_prompt}
-        ]
-    )
-    return message.content[0].text
+def llm_anthropic(user_prompt: str, system_prompt: str, use_cache: bool = True):
+    with span("llm", provider=ANTHROPIC, model=ANTHROPIC_MODEL, prompt_chars=len(system_prompt) + len(user_prompt)) as s:
+        cache_key = make_cache_key(model=ANTHROPIC_MODEL, temperature=None, system_prompt=system_prompt, user_prompt=user_prompt, max_tokens=ANTHROPIC_MAX_TOKENS)
+        if use_cache:
+            cached = llm_cache.get(cache_key)
+            run_report.record_cache(ANTHROPIC, hit=cached is not None)
+            if cached is not None:
+                s.set("cache_hits", 1)
+                return cached
+        message = get_limiter(ANTHROPIC).call(
+            lambda: anthropic_client.messages.create(
+                model=ANTHROPIC_MODEL,
+                system=system_prompt,
+                max_tokens=ANTHROPIC_MAX_TOKENS,
+                messages=[
+                    {"role": "user", "content": user_prompt}
+                ]
+            ),
+            tokens=estimate_tokens(system_prompt, user_prompt) + ANTHROPIC_MAX_TOKENS,
+            usage=lambda message: message.usage.input_tokens + message.usage.output_tokens,
+            transient_errors=(APIConnectionError,)
+        )
+        content = message.content[0].text
+        s.set("prompt_tokens", message.usage.input_tokens)
+        s.set("completion_tokens", message.usage.output_tokens)
+        run_report.record_request(ANTHROPIC, model=ANTHROPIC_MODEL, prompt_tokens=message.usage.input_tokens, completion_tokens=message.usage.output_tokens)
+        if use_cache:
+            llm_cache.set(cache_key, content, model=ANTHROPIC_MODEL)
+        return content
 
 def rag_eval_with_retrieval_results_anthropic(data: dict):
-    search_result = data.get('search_results')
+    # biography and history for the answer and the judge's context, search results only carry the summary fields
+    search_result = hydrate(data.get('search_results'))
     question = data.get('question')
     formatted_search_result = format_hits_response(hits=search_result)
     rag_user_prompt, rag_sys_prompt = format_rag_prompt(query=question, search_results=formatted_search_result)
@@ -101,81 +132,57 @@ def rag_eval_with_retrieval_results_anthropic(data: dict):
 
     if type(res) == str:
         json_res = json.loads(res)
-        return {"question": question, "answer": answer, **json_res}
+        return {"id": data.get('id'), "question": question, "answer": answer, **json_res}
     else:
-        return {"question": question, "answer": answer, **res}
+        return {"id": data.get('id'), "question": question, "answer": answer, **res}
     
 def generate_rag_eval_result_with_retrieval_results_anthropic(data: list[dict]):
     eval_results = []
-    for retrieval_result in tqdm(data, desc="Processing documents"):
-        result = rag_eval_with_retrieval_results_anthropic(data=retrieval_result)
-        eval_results.append(result)
+    with track_run("rag_eval_anthropic", judge=ANTHROPIC_MODEL) as report:
+        for retrieval_result in tqdm(data, desc="Processing documents"):
+            result = rag_eval_with_retrieval_results_anthropic(data=retrieval_result)
+            eval_results.append(result)
+            report.add_items(1)
     return eval_results
 
-def analyze_evaluation_result_anthropic (file_path: str | Path):
-    eval_data: list[dict] = open_json_file(file_path=file_path)
-    num_entries = len(eval_data)
-    
-    relevance_total = 0
-    groundedness_total = 0
-    completeness_total = 0
-    faithfulness_total = 0
-
-    for entry in tqdm(eval_data, desc="Processing data"):
-        relevance = entry.get("relevance")
-        groundedness = entry.get("groundedness")
-        completeness = entry.get("completeness")
-        faithfulness = entry.get("faithfulness")
-
-        relevance_total += relevance
-        groundedness_total += groundedness
-        completeness_total += completeness
-        faithfulness_total += faithfulness
-    
-    avg_relevance = relevance_total / num_entries
-    avg_groundedness = groundedness_total / num_entries
-    avg_completeness = completeness_total / num_entries
-    avg_faithfulness = faithfulness_total / num_entries
-    total_avg_score = (relevance_total + groundedness_total + completeness_total + faithfulness_total) / (num_entries * 4)
-
-    print("""
-Evaluation using claude-3-5-haiku-20241022
-Evaluate on four criteria:
-1. Relevance (0-3): Does the answer directly address the question?
-   - 3: Fully addresses the question
-   - 2: Mostly relevant with minor tangents
-   - 1: Partially relevant, significant gaps
-   - 0: Irrelevant or off-topic
-
-2. Groundedness (0-3): Are all facts supported by the context?
-   - 3: All claims supported, no hallucinations
-   - 2: Mostly grounded, one minor unsupported detail
-   - 1: Multiple unsupported claims
-   - 0: Significant hallucinations or contradicts context
-
-3. Completeness (0-3): Does the answer include key details from context?
-   - 3: All important information included
-   - 2: Most key details present, minor omissions
-   - 1: Missing significant information
-   - 0: Incomplete or vague
-
-4. Faithfulness (0-3): Is the answer concise, factual, and honest about limitations?
-   - 3: Concise, factual, admits gaps appropriately
-   - 2: Mostly faithful, slightly verbose or assumes minor details
-   - 1: Invents information or doesn't admit uncertainty
-   - 0: Violates multiple guidelines
-""")
-    print(f"Number of entries: {num_entries}")
-    print(f"Average Relevance Score: {avg_relevance}")
-    print(f"Average Groundedness Score: {avg_groundedness}")
-    print(f"Average Completeness Score: {avg_completeness}")
-    print(f"Average Faithfulness Score: {avg_faithfulness}")
-    print(f"Total Average Score: {total_avg_score}")
+parser = argparse.ArgumentParser(description="RAG evaluation with claude-3-5-haiku as judge")
+parser.add_argument("--batch", choices=["anthropic", "local"], default=None, help="run judge calls as a batch job (local = dry run without API calls)")
+parser.add_argument("--poll-interval", type=float, default=30.0, help="seconds between batch status checks")
+parser.add_argument("--shard", type=parse_shard, default=(0, 1), help="evaluate only shard <index>/<count>, merge with src/merge_shards.py --artifact rag-anthropic")
+args = parser.parse_args()
+shard_index, shard_count = args.shard
+if shard_count > 1 and args.batch is not None:
+    parser.error("--batch and --shard cannot be combined, a batch job already runs on the provider's capacity")
 
 # Running evaluations using claude-3-5-haiku-20241022 using LLM as a judge method
 retrieval_search_results_path = project_root / "src" / "assets" / "retrieval_search_results.json"
+if shard_count > 1:
+    shard_path = shard_output_path(project_root / "src" / "assets" / "evaluation_results_claude_3_5_haiku.json", shard_index, shard_count)
+    with track_run("rag_eval_anthropic", judge=ANTHROPIC_MODEL, shard=f"{shard_index}/{shard_count}"):
+        run_sharded(data=iter_records(file_path=retrieval_search_results_path), process_fn=rag_eval_with_retrieval_results_anthropic, output_path=shard_path, shard_index=shard_index, shard_count=shard_count)
+    print_cache_stats()
+    sys.exit(0)
 raw_search_results = open_json_file(file_path=retrieval_search_results_path)
-eval_results_anthropic = generate_rag_eval_result_with_retrieval_results_anthropic(data=raw_search_results)
-evaluation_results_claude_3_5_haiku_path = project_root / "src" / "assets" / "evaluation_results_claude_3_5_haiku.json"
+if args.batch is None:
+    eval_results_anthropic = generate_rag_eval_result_with_retrieval_results_anthropic(data=raw_search_results)
+else:
+    backend = AnthropicBatchBackend(client=anthropic_client) if args.batch == "anthropic" else LocalBatchBackend(responder=dry_run_judge)
+    batch_job_dir = project_root / ".cache" / "batch_jobs"
+    eval_results_anthropic = generate_rag_eval_result_batch(
+        data=raw_search_results,
+        backend=backend,
+        job_dir=batch_job_dir,
+        job_name=f"rag_eval_anthropic_{args.batch}",
+        format_eval_prompt_fn=format_eval_prompt,
+        model=ANTHROPIC_MODEL,
+        temperature=None,
+        max_tokens=ANTHROPIC_MAX_TOKENS,
+        poll_interval=args.poll_interval,
+        use_cache=args.batch != "local"
+    )
+# dry runs must not overwrite (or be cached as) real verdicts
+results_suffix = "_dry_run" if args.batch == "local" else ""
+evaluation_results_claude_3_5_haiku_path = project_root / "src" / "assets" / f"evaluation_results_claude_3_5_haiku{results_suffix}.json"
 save_json_file(data=eval_results_anthropic, file_path=evaluation_results_claude_3_5_haiku_path)
-analyze_evaluation_result_anthropic(file_path=evaluation_results_claude_3_5_haiku_path)
\ No newline at end of file
+analyze_evaluation_result(file_path=evaluation_results_claude_3_5_haiku_path, judge=ANTHROPIC_MODEL)
+print_cache_stats()
\ No newline at end of file
@@ -1,23 +1,46 @@
 import sys
+import argparse
 from pathlib import Path
 import pandas as pd
-from rag_evaluation_fn import generate_rag_eval_result_with_retrieval_results, analyze_evaluation_result
+from rag_evaluation_fn import generate_rag_eval_result_with_retrieval_results, generate_rag_eval_result_batch, dry_run_judge, analyze_evaluation_result, rag_eval_with_retrieval_results
 
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
-from composables.files import open_json_file, save_json_file
+from composables.files import open_json_file, save_json_file, iter_records
 from composables.search import llm, format_hits_response
-from composables.data_processing import format_list_in_batch
+from composables.sharding import parse_shard, run_sharded, shard_output_path
+from composables.cache import print_cache_stats
+from composables.batch import LocalBatchBackend, OpenAIBatchBackend
+from composables.run_report import track_run
+
+parser = argparse.ArgumentParser(description="RAG evaluation with gpt-4o-mini as judge")
+parser.add_argument("--batch", choices=["openai", "local"], default=None, help="run judge calls as a batch job (local = dry run without API calls)")
+parser.add_argument("--poll-interval", type=float, default=30.0, help="seconds between batch status checks")
+parser.add_argument("--shard", type=parse_shard, default=(0, 1), help="evaluate only shard <index>/<count>, merge with src/merge_shards.py --artifact rag-gpt")
+args = parser.parse_args()
+shard_index, shard_count = args.shard
+if shard_count > 1 and args.batch is not None:
+    parser.error("--batch and --shard cannot be combined, a batch job already runs on the provider's capacity")
 
 # run AI evaluation using LLM as Judge method
-golden_questions_path = project_root / "src" / "assets" / "golden_questions.json"
-golden_questions = open_json_file(file_path=golden_questions_path)
 retrieval_search_results_path = project_root / "src" / "assets" / "retrieval_search_results.json"
+if shard_count > 1:
+    shard_path = shard_output_path(project_root / "src" / "assets" / "evaluation_results_gpt_4o_mini.json", shard_index, shard_count)
+    with track_run("rag_eval_gpt", shard=f"{shard_index}/{shard_count}"):
+        run_sharded(data=iter_records(file_path=retrieval_search_results_path), process_fn=rag_eval_with_retrieval_results, output_path=shard_path, shard_index=shard_index, shard_count=shard_count)
+    print_cache_stats()
+    sys.exit(0)
 raw_search_results = open_json_file(file_path=retrieval_search_results_path)
-batched_data = format_list_in_batch(data=golden_questions, batch_size=50)
-golden_questions_batch_1 = batched_data[0]
-eval_results = generate_rag_eval_result_with_retrieval_results(data=raw_search_results)
-evaluation_results_gpt_4o_mini_path = project_root / "src" / "assets" / "evaluation_results_gpt_4o_mini.json"
+if args.batch is None:
+    eval_results = generate_rag_eval_result_with_retrieval_results(data=raw_search_results)
+else:
+    backend = OpenAIBatchBackend() if args.batch == "openai" else LocalBatchBackend(responder=dry_run_judge)
+    batch_job_dir = project_root / ".cache" / "batch_jobs"
+    eval_results = generate_rag_eval_result_batch(data=raw_search_results, backend=backend, job_dir=batch_job_dir, job_name=f"rag_eval_gpt_{args.batch}", poll_interval=args.poll_interval, use_cache=args.batch != "local")
+print_cache_stats()
+# dry runs must not overwrite (or be cached as) real verdicts
+results_suffix = "_dry_run" if args.batch == "local" else ""
+evaluation_results_gpt_4o_mini_path = project_root / "src" / "assets" / f"evaluation_results_gpt_4o_mini{results_suffix}.json"
 save_json_file(data=eval_results, file_path=evaluation_results_gpt_4o_mini_path)
 analyze_evaluation_result(file_path=evaluation_results_gpt_4o_mini_path)
 gpt_4o_mini_eval_df = pd.DataFrame(data=eval_results)
\ No newline at end of file
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from composables.eval_analysis import analyze_evaluation_result, load_group_lookup, compare_judges, print_judge_agreement
+
+# print both judges' results with per-race / per-realm breakdowns and their agreement with each other
+assets_path = project_root / "src" / "assets"
+evaluation_results_gpt_4o_mini_path = assets_path / "evaluation_results_gpt_4o_mini.json"
+evaluation_results_claude_3_5_haiku_path = assets_path / "evaluation_results_claude_3_5_haiku.json"
+group_lookup = load_group_lookup(golden_questions_path=assets_path / "golden_questions.json", records_path=assets_path / "qdrant_records.json")
+
+analyze_evaluation_result(file_path=evaluation_results_gpt_4o_mini_path, judge="gpt-4o-mini", group_lookup=group_lookup)
+analyze_evaluation_result(file_path=evaluation_results_claude_3_5_haiku_path, judge="claude-3-5-haiku-20241022", group_lookup=group_lookup)
+agreement = compare_judges(file_path_a=evaluation_results_gpt_4o_mini_path, file_path_b=evaluation_results_claude_3_5_haiku_path)
+print_judge_agreement(agreement=agreement, label_a="gpt-4o-mini", label_b="claude-3-5-haiku")
@@ -5,8 +5,12 @@ from pathlib import Path
 
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
-from composables.files import open_json_file
-from composables.search import llm, format_hits_response
+from composables.search import llm, format_hits_response, OPENAI_MODEL, OPENAI_TEMPERATURE
+from composables.batch import run_batch_job
+from composables.eval_analysis import analyze_evaluation_result
+from composables.tracing import span
+from composables.run_report import track_run
+from composables.content_store import hydrate
 
 def format_rag_prompt (query: str, search_results: list[dict[str,str]]):
     raw_user_prompt = """
@@ -32,7 +36,9 @@ Guidelines:
 - If the user asks for speculation (e.g., "what would happen if X met Y?"), you can summarize based only on what the context says about their traits.
 """.strip()
     
-    user_prompt = raw_user_prompt.format(retrieved_context=search_results, user_question=query).strip()
+    with span("prompt_assembly", hits=len(search_results)) as s:
+        user_prompt = raw_user_prompt.format(retrieved_context=search_results, user_question=query).strip()
+        s.set("prompt_chars", len(system_prompt) + len(user_prompt))
     return user_prompt, system_prompt
 
 ## Evaluation prompt created optimized for gpt-4o-mini
@@ -85,12 +91,18 @@ Output only the JSON object — no markdown, no extra text.
     
     return user_prompt, system_prompt
 
-def rag_eval_with_retrieval_results(data: dict):
-    search_result = data.get('search_results')
+def generate_rag_answer(data: dict)-> tuple[str, str, list[dict]]:
+    """Answer the question of a retrieval result with the RAG prompt, returns (question, answer, search_result)"""
+    # biography and history for the answer and the judge's context, search results only carry the summary fields
+    search_result = hydrate(data.get('search_results'))
     question = data.get('question')
     formatted_search_result = format_hits_response(hits=search_result)
     rag_user_prompt, rag_sys_prompt = format_rag_prompt(query=question, search_results=formatted_search_result)
     answer = llm(user_prompt=rag_user_prompt, system_prompt=rag_sys_prompt)
+    return question, answer, search_result
+
+def rag_eval_with_retrieval_results(data: dict):
+    question, answer, search_result = generate_rag_answer(data=data)
     payload = {
         "question": question,
         "context": search_result,
@@ -101,60 +113,78 @@ def rag_eval_with_retrieval_results(data: dict):
 
     if type(res) == str:
         json_res = json.loads(res)
-        return {"question": question, "answer": answer, **json_res}
+        return {"id": data.get('id'), "question": question, "answer": answer, **json_res}
     else:
-        return {"question": question, "answer": answer, **res}
+        return {"id": data.get('id'), "question": question, "answer": answer, **res}
     
 def generate_rag_eval_result_with_retrieval_results(data: list[dict]):
     eval_results = []
-    for retrieval_result in tqdm(data, desc="Processing documents"):
-        result = rag_eval_with_retrieval_results(data=retrieval_result)
-        eval_results.append(result)
+    with track_run("rag_eval_gpt", judge=OPENAI_MODEL) as report:
+        for retrieval_result in tqdm(data, desc="Processing documents"):
+            result = rag_eval_with_retrieval_results(data=retrieval_result)
+            eval_results.append(result)
+            report.add_items(1)
     return eval_results
 
-def analyze_evaluation_result (file_path: str | Path):
-    eval_data: list[dict] = open_json_file(file_path=file_path)
-    num_entries = len(eval_data)
-    
-    relevance_total = 0
-    groundedness_total = 0
-    completeness_total = 0
-    faithfulness_total = 0
-
-    for entry in tqdm(eval_data, desc="Processing data"):
-        relevance = entry.get("relevance")
-        groundedness = entry.get("groundedness")
-        completeness = entry.get("completeness")
-        faithfulness = entry.get("faithfulness")
-
-        relevance_total += relevance
-        groundedness_total += groundedness
-        completeness_total += completeness
-        faithfulness_total += faithfulness
-    
-    avg_relevance = relevance_total / num_entries
-    avg_groundedness = groundedness_total / num_entries
-    avg_completeness = completeness_total / num_entries
-    avg_faithfulness = faithfulness_total / num_entries
-    total_avg_score = (relevance_total + groundedness_total + completeness_total + faithfulness_total) / (num_entries * 4)
-
-    print("""
-Evaluation using gpt-4o-mini
-Evaluate on four criteria:
-1. Relevance — Does the answer directly address the question?
-2. Groundedness — Are all facts supported by the provided context (no hallucinations)?
-3. Completeness — Does the answer include all key details from the context?
-4. Faithfulness — Does it follow the system rules (concise, factual, no invention, admits missing info)?
+def build_judge_requests(data: list[dict], format_eval_prompt_fn=format_eval_prompt, model: str = OPENAI_MODEL, temperature: float | None = OPENAI_TEMPERATURE, max_tokens: int | None = None):
+    """
+    Generate the RAG answers (interactive, cached) and one judge request per retrieval result.
+    Returns (items, requests), items keep question/answer by custom_id for merging the verdicts back.
+    """
+    items = []
+    requests = []
+    for idx, retrieval_result in enumerate(tqdm(data, desc="Generating answers")):
+        question, answer, search_result = generate_rag_answer(data=retrieval_result)
+        payload = {
+            "question": question,
+            "context": search_result,
+            "answer": answer
+        }
+        eval_user_prompt, eval_sys_prompt = format_eval_prompt_fn(payload=payload)
+        custom_id = f"eval-{idx:06d}"
+        items.append({"custom_id": custom_id, "id": retrieval_result.get('id'), "question": question, "answer": answer})
+        requests.append({
+            "custom_id": custom_id,
+            "model": model,
+            "system_prompt": eval_sys_prompt,
+            "user_prompt": eval_user_prompt,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        })
+    return items, requests
+
+def generate_rag_eval_result_batch(data: list[dict], backend, job_dir: str | Path, job_name: str = "rag_eval_gpt", format_eval_prompt_fn=format_eval_prompt, model: str = OPENAI_MODEL, temperature: float | None = OPENAI_TEMPERATURE, max_tokens: int | None = None, poll_interval: float = 30.0, use_cache: bool = True):
+    """
+    Same output as generate_rag_eval_result_with_retrieval_results, but every judge call goes
+    through a batch backend (see composables.batch) instead of the interactive endpoint.
+    Items whose verdict is missing or not valid JSON are left out and reported.
+    """
+    # judge tokens of the batch job are billed by the provider's batch API and not counted in the run report
+    with track_run(job_name, judge=model, batch=True) as report:
+        items, requests = build_judge_requests(data=data, format_eval_prompt_fn=format_eval_prompt_fn, model=model, temperature=temperature, max_tokens=max_tokens)
+        verdicts = run_batch_job(requests=requests, backend=backend, job_dir=job_dir, job_name=job_name, poll_interval=poll_interval, use_cache=use_cache)
+        report.add_items(len(verdicts))
 
-Scoring Guide (0–3 for each):
-- 3: Excellent — fully meets the criterion
-- 2: Fair — mostly correct, minor omissions or minor unsupported detail
-- 1: Weak — noticeable errors, missing or irrelevant info
-- 0: None — fails completely or contradicts context
-""")
-    print(f"Number of entries: {num_entries}")
-    print(f"Average Relevance Score: {avg_relevance}")
-    print(f"Average Groundedness Score: {avg_groundedness}")
-    print(f"Average Completeness Score: {avg_completeness}")
-    print(f"Average Faithfulness Score: {avg_faithfulness}")
-    print(f"Total Average Score: {total_avg_score}")
\ No newline at end of file
+    eval_results = []
+    failed_ids = []
+    for item in items:
+        res = verdicts.get(item["custom_id"])
+        try:
+            json_res = json.loads(res)
+        except (TypeError, json.JSONDecodeError):
+            failed_ids.append(item["custom_id"])
+            continue
+        eval_results.append({"id": item["id"], "question": item["question"], "answer": item["answer"], **json_res})
+    if failed_ids:
+        print(f"{len(failed_ids)} judge requests returned no valid verdict: {failed_ids[:10]}{' ...' if len(failed_ids) > 10 else ''}")
+    return eval_results
+
+def dry_run_judge(request: dict)-> str:
+    """Responder for LocalBatchBackend that returns a fixed verdict without calling any API"""
+    return json.dumps({
+        "relevance": 0,
+        "groundedness": 0,
+        "completeness": 0,
+        "faithfulness": 0,
+        "comments": f"dry run verdict for {request['custom_id']}"
+    })
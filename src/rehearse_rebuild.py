@@ -0,0 +1,169 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from qdrant_client import QdrantClient, models
+from composables.blue_green import publish_version, rollback, alias_target, version_name, vector_schema, ValidationError, VALIDATION_SAMPLE_SIZE, LEGACY_VERSION_TIMESTAMP
+from composables.content_store import ContentStore
+from composables.qdrant_backend import create_qdrant_client, MEMORY_BACKEND
+from composables.point_ids import character_ids, known_point_ids
+from composables.provider_emulator import hashed_embedding
+from composables.vectors import named_vectors, vectors_config, SMALL_EMBEDDING_DIMENSION
+
+# Rehearses blue/green rebuilds of the character collection without network access: an in-memory Qdrant and the
+# provider emulator's hashed embeddings (composables/provider_emulator.py) instead of Jina.
+#   python src/rehearse_rebuild.py
+# Starts from a collection created before blue/green rebuilds, with the single unnamed vector setup_qdrant.py used to
+# create (migrated to a version with named vectors by the first publish),
+# publishes two rebuilds validated with golden queries, rolls back, and checks that a rebuild whose point ids
+# changed is rejected. After every step the live content store must hold the content of the live version.
+# Exits 1 when a check fails.
+
+# as in setup_qdrant.py
+ALIAS = 'lotr-characters'
+EMBEDDING_DIMENSION = 512
+CHARACTERS_FILE_PATH = project_root / "src" / "assets" / "lotr_characters.json"
+GOLDEN_QUESTIONS_FILE_PATH = project_root / "src" / "assets" / "golden_questions.json"
+QDRANT_RECORDS_FILE_PATH = project_root / "src" / "assets" / "qdrant_records.json"
+# hashed embeddings are bags of words, they find fewer of the golden characters than Jina does
+REHEARSAL_MIN_HIT_RATE = 0.25
+
+
+def embed(text: str)-> list[float]:
+    return hashed_embedding(text, dimensions=EMBEDDING_DIMENSION)
+
+
+def create_collection(client: QdrantClient, collection_name: str):
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=vectors_config(full_dimension=EMBEDDING_DIMENSION, small_dimension=SMALL_EMBEDDING_DIMENSION),
+        on_disk_payload=True
+    )
+
+
+def build_collection(client: QdrantClient, collection_name: str, ids: list[str], characters: list[dict], embeddings: dict[str, list[float]], legacy: bool = False)-> int:
+    """
+    Collection of the characters under `ids`, embedded from the exported texts.
+    legacy: the schema collections had before named vectors, a single unnamed vector.
+    """
+    if legacy:
+        client.create_collection(collection_name=collection_name, vectors_config=models.VectorParams(size=EMBEDDING_DIMENSION, distance=models.Distance.COSINE))
+    else:
+        create_collection(client, collection_name)
+    points = [
+        models.PointStruct(id=point_id, vector=embeddings[character["name"]] if legacy else named_vectors(embeddings[character["name"]], small_dimension=SMALL_EMBEDDING_DIMENSION), payload={"name": character["name"]})
+        for point_id, character in zip(ids, characters)
+    ]
+    client.upsert(collection_name=collection_name, points=points)
+    return len(points)
+
+
+def write_content(store: ContentStore, ids: list[str], characters: list[dict], label: str):
+    """Content tagged with the build it comes from, so the live content shows which version it belongs to"""
+    store.put_many({point_id: {"biography": f"{label}: {character['name']}"} for point_id, character in zip(ids, characters)})
+
+
+def golden_probes(sample_size: int = VALIDATION_SAMPLE_SIZE)-> list[dict]:
+    """The sample setup_qdrant.golden_query_probes validates with, embedded the way the emulator embeds queries"""
+    with open(GOLDEN_QUESTIONS_FILE_PATH, 'r') as file:
+        golden_questions = json.load(file)
+    sample = golden_questions[::max(len(golden_questions) // sample_size, 1)][:sample_size]
+    return [{"id": entry["id"], "embedding": embed(entry["questions"][0])} for entry in sample]
+
+
+class Rehearsal:
+    def __init__(self):
+        self.failures = []
+
+    def check(self, condition: bool, message: str):
+        print(f"{'ok' if condition else 'FAILED':>6}  {message}")
+        if not condition:
+            self.failures.append(message)
+
+
+def rehearse(client: QdrantClient, store: ContentStore, sample_size: int = VALIDATION_SAMPLE_SIZE)-> list[str]:
+    with open(QDRANT_RECORDS_FILE_PATH, 'r') as file:
+        records = json.load(file)
+    with open(CHARACTERS_FILE_PATH, 'r') as file:
+        characters = json.load(file)
+    embeddings = {record["payload"]["name"]: embed(record["payload"].get("embedded_text") or record["payload"]["name"]) for record in records}
+    characters = [character for character in characters if character.get("name") in embeddings]
+    probes = golden_probes(sample_size=sample_size)
+    rehearsal = Rehearsal()
+
+    def live_content(collection_name: str)-> str:
+        """Where the live biography of the first probe comes from, reported when it is not collection_name"""
+        content = store.get_many(point_ids=[probes[0]["id"]], fields=("biography",))
+        label = next(iter(content.values()), {}).get("biography", "none").split(":")[0]
+        return "" if label == collection_name else f", but it comes from {label}"
+
+    def build_version(collection_name: str, ids: list[str])-> int:
+        version_store = store.for_version(collection_name)
+        write_content(version_store, ids=ids, characters=characters, label=collection_name)
+        version_store.close()
+        return build_collection(client, collection_name, ids=ids, characters=characters, embeddings=embeddings)
+
+    # one second apart, version names have a resolution of one second
+    now = int(time.time())
+
+    legacy_ids = [record["id"] for record in records]
+    legacy_points = build_collection(client, ALIAS, ids=legacy_ids, characters=[record["payload"] for record in records], embeddings=embeddings, legacy=True)
+    write_content(store, ids=legacy_ids, characters=[record["payload"] for record in records], label=ALIAS)
+    print(f"Legacy collection {ALIAS}: {legacy_points} points")
+
+    versions = []
+    for step in range(2):
+        collection_name = version_name(ALIAS, now - 2 + step)
+        points = build_version(collection_name, ids=character_ids(characters, known_ids=known_point_ids(QDRANT_RECORDS_FILE_PATH)))
+        try:
+            report = publish_version(client, alias=ALIAS, collection_name=collection_name, expected_points=points, probes=probes, min_hit_rate=REHEARSAL_MIN_HIT_RATE, store=store)
+            mismatch = live_content(collection_name)
+            rehearsal.check(alias_target(client, ALIAS) == collection_name and not mismatch, f"rebuild {step + 1} published with its content: hit rate {report['hit_rate']:.2f}, live {report.get('live_hit_rate', 0):.2f} ({report.get('live_collection')}){mismatch}")
+            versions.append(collection_name)
+        except ValidationError as e:
+            rehearsal.check(False, f"rebuild {step + 1} published: {str(e)}")
+            return rehearsal.failures
+        if step == 0:
+            legacy_version = version_name(ALIAS, LEGACY_VERSION_TIMESTAMP)
+            migrated = client.collection_exists(legacy_version) and client.count(collection_name=legacy_version, exact=True).count
+            legacy_content = 0
+            if store.version_path(legacy_version).is_file():
+                legacy_store = store.for_version(legacy_version)
+                legacy_content = legacy_store.count()
+                legacy_store.close()
+            same_vectors = migrated and vector_schema(client, legacy_version) == vector_schema(client, collection_name)
+            rehearsal.check(migrated == legacy_points and legacy_content == legacy_points and same_vectors, f"legacy collection kept as {legacy_version} ({migrated} points, {legacy_content} content rows, {'named' if same_vectors else 'unnamed'} vectors)")
+
+    previous = rollback(client, alias=ALIAS, store=store)
+    mismatch = live_content(versions[0])
+    rehearsal.check(previous == versions[0] and alias_target(client, ALIAS) == versions[0] and not mismatch, f"rollback to {versions[0]} with its content{mismatch}")
+
+    # what a rebuild with ids derived from names only did: none of the golden ids exist any more
+    collection_name = version_name(ALIAS, now)
+    points = build_version(collection_name, ids=character_ids(characters, known_ids={}))
+    try:
+        publish_version(client, alias=ALIAS, collection_name=collection_name, expected_points=points, probes=probes, min_hit_rate=REHEARSAL_MIN_HIT_RATE, store=store)
+        rehearsal.check(False, "rebuild with changed point ids rejected")
+    except ValidationError as e:
+        mismatch = live_content(versions[0])
+        rejected = alias_target(client, ALIAS) == versions[0] and not client.collection_exists(collection_name) and not store.version_path(collection_name).exists()
+        rehearsal.check(rejected and not mismatch, f"rebuild with changed point ids rejected, its content dropped{mismatch}: {str(e)[:100]}")
+    return rehearsal.failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rehearse blue/green rebuilds of the character collection without network access")
+    parser.add_argument("--sample-size", type=int, default=VALIDATION_SAMPLE_SIZE, help="golden queries validating each rebuild")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = ContentStore(path=Path(work_dir) / "content_store.sqlite")
+        failures = rehearse(create_qdrant_client(backend=MEMORY_BACKEND), store=store, sample_size=args.sample_size)
+        store.close()
+    print(f"{len(failures)} failed check(s)")
+    sys.exit(1 if failures else 0)
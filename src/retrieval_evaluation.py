@@ -1,20 +1,24 @@
 import json
 from tqdm import tqdm
-import time
 import itertools
 import sys
 from pathlib import Path
+from typing import Iterable, Iterator
 
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
 from composables.files import open_json_file, save_json_file
 from composables.search import search, llm
+from composables.sharding import run_sharded, shard_output_path
+from composables.run_report import track_run
 
 # open json file that contains data stored in qdrant
 # duplicate of data stored in qdrant cloud, and formatted and saved in json for convenience.
 qdrant_records_file_path = project_root / "src" / "assets" / "qdrant_records.json"
 qdrant_records = open_json_file(file_path=qdrant_records_file_path)
+golden_questions_file_path = project_root / "src" / "assets" / "golden_questions.json"
+retrieval_search_results_file_path = project_root / "src" / "assets" / "retrieval_search_results.json"
 
 def format_prompt (payload: dict[str,str])-> tuple[str, str]:
     raw_user_prompt = """
@@ -42,20 +46,23 @@ If a field is null or missing, do not ask about it. If there is limited informat
     
     return user_prompt, system_prompt
 
-def format_records (data: list[dict])->list[dict]:
+def iter_formatted_records (data: Iterable[dict])-> Iterator[dict]:
     """
-    format character information
+    lazily format character information
     """
-    formatted_records = []
-    for record in tqdm(data):
-        basic_fields = ['name', 'race', 'gender', 'realm', 'culture', 'birth', 'death', 'spouse', 'hair', 'height', 'biography', 'history']
+    basic_fields = ['name', 'race', 'gender', 'realm', 'culture', 'birth', 'death', 'spouse', 'hair', 'height', 'biography', 'history']
+    for record in data:
         character = {
             "id": record["id"]
         }
         character.update([(field, record["payload"][field]) for field in basic_fields if record["payload"].get(field)])
-        formatted_records.append(character)
+        yield character
 
-    return formatted_records
+def format_records (data: list[dict])->list[dict]:
+    """
+    format character information
+    """
+    return list(iter_formatted_records(data=tqdm(data)))
 
 # generate questions using open ai based on system_prompt and user_prompt provided
 def generate_question(ctx: dict[str,str])->dict:
@@ -70,57 +77,88 @@ def generate_question(ctx: dict[str,str])->dict:
 def generate_questions_and_save_json():
     records = format_records(data=qdrant_records)
     formatted_questions = []
-    for record in tqdm(records):
-        questions = generate_question(ctx=record)
-        formatted_questions.append(questions)
-    save_path = project_root / "src" / "assets" / "golden_questions.json"
-    save_json_file(file_path=save_path, data=formatted_questions)
+    with track_run("questions", records=len(records)) as report:
+        for record in tqdm(records):
+            questions = generate_question(ctx=record)
+            formatted_questions.append(questions)
+            report.add_items(1)
+    save_json_file(file_path=golden_questions_file_path, data=formatted_questions)
 
-def get_formatted_search_result(golden_questions: list[dict]=None, previous_results=None, start_index: int=0, requests_per_minute: int=400):
+def generate_questions_sharded(shard_index: int, shard_count: int):
+    """Generate questions for one shard of the qdrant records, merge with src/merge_shards.py --artifact questions"""
+    output_path = shard_output_path(golden_questions_file_path, shard_index, shard_count)
+    with track_run("questions", shard=f"{shard_index}/{shard_count}"):
+        run_sharded(data=iter_formatted_records(data=qdrant_records), process_fn=generate_question, output_path=output_path, shard_index=shard_index, shard_count=shard_count)
+
+def get_formatted_search_result(golden_questions: list[dict]=None, previous_results=None, start_index: int=0):
+    """Search every golden question, query embeddings are paced by the shared Jina rate limiter"""
     search_results = previous_results if previous_results is not None else []
     current_index = start_index
 
-    # Calculate delay between requests to stay under rate limit
-    delay_seconds = 60.0 / requests_per_minute
-
-    try:
-        for obj in tqdm(golden_questions, desc="Processing documents"):
-            doc_id = obj["id"]
-            for q_idx, question in enumerate(obj["questions"]):
-                if current_index < start_index:
-                    current_index += 1
-                    continue
-
-                try:
-                    results = search(query=question, limit=5, threshold=0.3)
-                    if results is None:
-                        raise ValueError("Search returned None")
-                    search_result = {
-                        "id": doc_id,
-                        "question": question,
-                        "question_idx": q_idx,
-                        "search_results": results
-                    }
-                    search_results.append(search_result)
-                    current_index += 1
-
-                    # Add delay to respect rate limit
-                    time.sleep(delay_seconds)
-                except Exception as e:
-                    print(f"\n❌ Error at index {current_index}")
-                    print(f"   Document ID: {doc_id}")
-                    print(f"   Question {q_idx + 1}/{len(obj['questions'])}: {question}")
-                    print(f"   Error: {type(e).__name__}: {str(e)}")
-                    print(f"\n💾 Processed {len(search_results)} questions before failure")
-                    print(f"   Returning (relevance_total, {current_index}) for resume")
-                    return search_results, current_index
+    with track_run("retrieval_search", start_index=start_index) as report:
+        try:
+            for obj in tqdm(golden_questions, desc="Processing documents"):
+                doc_id = obj["id"]
+                for q_idx, question in enumerate(obj["questions"]):
+                    if current_index < start_index:
+                        current_index += 1
+                        continue
+
+                    try:
+                        results = search(query=question, limit=5, threshold=0.3)
+                        if results is None:
+                            raise ValueError("Search returned None")
+                        search_result = {
+                            "id": doc_id,
+                            "question": question,
+                            "question_idx": q_idx,
+                            "search_results": results
+                        }
+                        search_results.append(search_result)
+                        current_index += 1
+                        report.add_items(1)
+                    except Exception as e:
+                        print(f"\n❌ Error at index {current_index}")
+                        print(f"   Document ID: {doc_id}")
+                        print(f"   Question {q_idx + 1}/{len(obj['questions'])}: {question}")
+                        print(f"   Error: {type(e).__name__}: {str(e)}")
+                        print(f"\n💾 Processed {len(search_results)} questions before failure")
+                        print(f"   Returning (relevance_total, {current_index}) for resume")
+                        return search_results, current_index
     
-    except KeyboardInterrupt:
-        print(f"\n⚠️  Interrupted by user at index {current_index}")
-        print(f"💾 Processed {len(search_results)} questions")
-        return search_results, current_index
+        except KeyboardInterrupt:
+            print(f"\n⚠️  Interrupted by user at index {current_index}")
+            print(f"💾 Processed {len(search_results)} questions")
+            return search_results, current_index
     
-    return search_results, current_index
+        return search_results, current_index
+
+def search_golden_question(obj: dict)-> list[dict]:
+    """Search every question of one golden question entry, returns one row per question"""
+    rows = []
+    for q_idx, question in enumerate(obj["questions"]):
+        results = search(query=question, limit=5, threshold=0.3)
+        if results is None:
+            raise ValueError(f"Search returned None for question {q_idx + 1}: {question}")
+        rows.append({
+            "id": obj["id"],
+            "question": question,
+            "question_idx": q_idx,
+            "search_results": results
+        })
+    return rows
+
+def get_search_results_sharded(golden_questions: Iterable[dict], shard_index: int, shard_count: int):
+    """Search one shard of the golden questions, merge with src/merge_shards.py --artifact retrieval"""
+    output_path = shard_output_path(retrieval_search_results_file_path, shard_index, shard_count)
+    with track_run("retrieval_search", shard=f"{shard_index}/{shard_count}"):
+        run_sharded(
+            data=golden_questions,
+            process_fn=search_golden_question,
+            output_path=output_path,
+            shard_index=shard_index,
+            shard_count=shard_count
+        )
 
 def filter_results(data: list[dict], filters: dict):
     """
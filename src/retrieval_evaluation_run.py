@@ -1,22 +1,41 @@
-from retrieval_evaluation import generate_questions_and_save_json, get_formatted_search_result, get_strategies_list, generate_evaluations_per_strategy, print_evaluation_result
+from retrieval_evaluation import generate_questions_and_save_json, generate_questions_sharded, get_formatted_search_result, get_search_results_sharded, get_strategies_list, generate_evaluations_per_strategy, print_evaluation_result, golden_questions_file_path, retrieval_search_results_file_path
 import sys
+import argparse
+from itertools import islice
 from pathlib import Path
 
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
-from composables.files import open_json_file, save_json_file
+from composables.files import open_json_file, save_json_file, iter_records
 from composables.data_processing import format_list_in_batch
+from composables.sharding import parse_shard
 
 # process data and print retrieval evaluation from scratch
+# sharded: run each stage with --shard i/N (or via src/run_shards.py), then src/merge_shards.py between stages
 
-generate_questions_and_save_json()
-golden_questions_file_path = project_root / "src" / "assets" / "golden_questions.json"
-all_golden_questions = open_json_file(file_path=golden_questions_file_path)
-batched_data = format_list_in_batch(data=all_golden_questions, batch_size=100)
-golden_questions_batch_1 = batched_data[0]
-search_results, last_index = get_formatted_search_result(golden_questions=golden_questions_batch_1)
-retrieval_search_results_file_path = project_root / "src" / "assets" / "retrieval_search_results.json"
-save_json_file(file_path=retrieval_search_results_file_path, data=search_results)
-strategies = get_strategies_list()
-eval_result = generate_evaluations_per_strategy(search_results=search_results, strategies=strategies)
-print_evaluation_result(results=eval_result)
\ No newline at end of file
+parser = argparse.ArgumentParser(description="Retrieval evaluation")
+parser.add_argument("--shard", type=parse_shard, default=(0, 1), help="run only shard <index>/<count> of the stage")
+parser.add_argument("--stage", choices=["all", "questions", "search"], default="all", help="stage to run, sharded runs need a single stage")
+parser.add_argument("--limit", type=int, default=100, help="number of golden question entries to search")
+args = parser.parse_args()
+shard_index, shard_count = args.shard
+
+if shard_count > 1:
+    if args.stage == "all":
+        parser.error("sharded runs need --stage questions or --stage search (merge the questions in between)")
+    if args.stage == "questions":
+        generate_questions_sharded(shard_index=shard_index, shard_count=shard_count)
+    else:
+        golden_questions = islice(iter_records(file_path=golden_questions_file_path), args.limit)
+        get_search_results_sharded(golden_questions=golden_questions, shard_index=shard_index, shard_count=shard_count)
+else:
+    if args.stage in ("all", "questions"):
+        generate_questions_and_save_json()
+    if args.stage in ("all", "search"):
+        all_golden_questions = open_json_file(file_path=golden_questions_file_path)
+        golden_questions_batch_1 = next(format_list_in_batch(data=all_golden_questions, batch_size=args.limit))
+        search_results, last_index = get_formatted_search_result(golden_questions=golden_questions_batch_1)
+        save_json_file(file_path=retrieval_search_results_file_path, data=search_results)
+        strategies = get_strategies_list()
+        eval_result = generate_evaluations_per_strategy(search_results=search_results, strategies=strategies)
+        print_evaluation_result(results=eval_result)
@@ -0,0 +1,45 @@
+import sys
+import argparse
+import subprocess
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+
+# launch N shards of an evaluation script as local processes, optionally merging afterwards
+# e.g. python ./src/run_shards.py --shards 4 --merge rag-gpt ./src/rag_eval_gpt.py
+# on several machines run the script itself with --shard i/N, copy src/assets/shards/ together and merge
+
+parser = argparse.ArgumentParser(description="Run a script as N shard processes")
+parser.add_argument("--shards", type=int, required=True)
+parser.add_argument("--merge", default=None, help="artifact to merge once every shard succeeded (see merge_shards.py)")
+parser.add_argument("script", help="script accepting --shard i/N")
+parser.add_argument("script_args", nargs=argparse.REMAINDER, help="extra arguments passed to every shard")
+args = parser.parse_args()
+
+log_dir = project_root / "src" / "assets" / "shards" / "logs"
+log_dir.mkdir(parents=True, exist_ok=True)
+script_name = Path(args.script).stem
+
+processes = []
+start = time.perf_counter()
+for shard_index in range(args.shards):
+    log_path = log_dir / f"{script_name}.shard-{shard_index:03d}-of-{args.shards:03d}.log"
+    log_file = open(log_path, 'w')
+    command = [sys.executable, args.script, *args.script_args, "--shard", f"{shard_index}/{args.shards}"]
+    processes.append((shard_index, subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT), log_file, log_path))
+    print(f"Started shard {shard_index}/{args.shards} -> {log_path}")
+
+failed = []
+for shard_index, process, log_file, log_path in processes:
+    return_code = process.wait()
+    log_file.close()
+    if return_code != 0:
+        failed.append(shard_index)
+        print(f"❌ Shard {shard_index}/{args.shards} exited with {return_code}, see {log_path}")
+print(f"{args.shards - len(failed)}/{args.shards} shards finished in {time.perf_counter() - start:.1f}s")
+
+if failed:
+    sys.exit(1)
+if args.merge:
+    subprocess.run([sys.executable, str(Path(__file__).resolve().parent / "merge_shards.py"), "--artifact", args.merge, "--shards", str(args.shards)], check=True)
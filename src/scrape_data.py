@@ -1,140 +1,148 @@
 import pandas as pd
 import json
+import sys
+import argparse
 import requests
-from bs4 import BeautifulSoup
-from tqdm.auto import tqdm
-import unicodedata
+from pathlib import Path
 
-character_csv = pd.read_csv('../assets/characters_with_link.csv', encoding='utf-8')
-character_csv.to_json('../assets/characters_with_link.json', orient='records', indent=4)
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from composables.scraping import fetch_all_cached, read_all_cached, PAGE_UNCHANGED, DEFAULT_CONCURRENCY, DEFAULT_PER_HOST_CONCURRENCY, DEFAULT_REQUESTS_PER_SECOND
+from composables.html_cache import HtmlCache, DEFAULT_HTML_CACHE_DIR
+from composables.sections import extract_sections, extract_sections_many, PARSER_VERSION
+from composables.name_index import NameIndex, MATCH_FUZZY
 
-char_detail_csv = pd.read_csv('../assets/characters_detail.csv', encoding='utf-8')
-char_detail_csv.to_json('../assets/characters_detail.json', orient='records', indent=4)
+ASSETS_DIR = project_root / "assets"
+DIST_DIR = project_root / "dist"
+CHARACTERS_WITH_LINK_CSV = ASSETS_DIR / "characters_with_link.csv"
+CHARACTERS_DETAIL_CSV = ASSETS_DIR / "characters_detail.csv"
 
-with open('../assets/characters_with_link.json', 'r') as file:
+character_csv = pd.read_csv(CHARACTERS_WITH_LINK_CSV, encoding='utf-8')
+character_csv.to_json(ASSETS_DIR / 'characters_with_link.json', orient='records', indent=4)
+
+char_detail_csv = pd.read_csv(CHARACTERS_DETAIL_CSV, encoding='utf-8')
+char_detail_csv.to_json(ASSETS_DIR / 'characters_detail.json', orient='records', indent=4)
+
+with open(ASSETS_DIR / 'characters_with_link.json', 'r') as file:
     character_json = json.load(file)
 
-with open('../assets/characters_detail.json', 'r') as file:
+with open(ASSETS_DIR / 'characters_detail.json', 'r') as file:
     character_detail_json = json.load(file)
 
-def format_biography(soup: BeautifulSoup)-> str | None:
-    try:
-        biography_section = soup.find('h2', id='Biography')
-        if not biography_section:
-            span_with_id = soup.find('span', id='Biography')
-            if span_with_id and span_with_id.parent.name == 'h2':
-                biography_section = span_with_id.parent
-        if not biography_section:
-            return None
-        biography_content = []
-        biography_current_elem = biography_section.next_sibling
-        while biography_current_elem:
-            # Skip text nodes that are just whitespace
-            if biography_current_elem.name:
-                # Stop if hit another h2
-                if biography_current_elem.name == 'h2':
-                    break
-                text_content = biography_current_elem.get_text().strip()
-                biography_content.append(text_content)
-            biography_current_elem = biography_current_elem.next_sibling
-        biography_text = '\n'.join(biography_content)
-        return biography_text
-    except Exception as e:
-        print(f"Error parsing content: {e}")
-        return None
-    
-def format_history(soup: BeautifulSoup)-> str | None:
-    try:
-        history_section = soup.find('h2', id='History')
-        if not history_section:
-            span_with_id = soup.find('span', id='History')
-            if span_with_id and span_with_id.parent.name == 'h2':
-                history_section = span_with_id.parent
-        if not history_section:
-            return None
-        history_content = []
-        history_current_elem = history_section.next_sibling
-        while history_current_elem:
-            # skip text nodes that are just whitespace
-            if history_current_elem.name:
-                # Stop if hit another h2
-                if history_current_elem.name == 'h2':
-                    break
-                text_content = history_current_elem.get_text().strip()
-                history_content.append(text_content)
-            history_current_elem = history_current_elem.next_sibling
-        history_text = '\n'.join(history_content)
-        return history_text
-    except Exception as e:
-        print(f"Error parsing content: {e}")
-        return None
-    
+def parse_content(content: bytes)-> dict[str, str | None]:
+    return extract_sections(content=content)
+
 def scrape_content(url: str)-> dict[str, str | None]:
     try:
-        res = requests.get(url)
+        res = requests.get(url, timeout=30)
         res.raise_for_status()
-        soup = BeautifulSoup(res.content, 'html.parser')
-
-        biography_text = format_biography(soup=soup)
-        history_text = format_history(soup=soup)
-        
-        return {
-            "biography": biography_text,
-            "history": history_text
-        }
+        return parse_content(content=res.content)
     except requests.RequestException as e:
         print(f"Error fetching page: {e}")
         return {
             "biography": None,
             "history": None
         }
-    
-    except Exception as e:
-        print(f"Error parsing content: {e}")
-        return {
-            "biography": None,
-            "history": None
-        }
 
-def normalize_name(name: str):
-    # remove accents and convert to lower case for comparison
-    # Normalize to NFD (decomposed form)
-    normalized = unicodedata.normalize('NFD', name)
-    # filter out combining characters (accents, diacritics)
-    ascii_text = ''.join(c for c in normalized if unicodedata.category(c) != 'Mn')
-    return ascii_text.lower().strip()
+character_name_index = NameIndex(items=character_detail_json, name_field='name')
 
 def get_character_detail(name: str)-> dict | None:
-    normalized_search_name = normalize_name(name)
-    found_object = None
-
-    for item in character_detail_json:
-        if normalize_name(item['name']) == normalized_search_name:
-            found_object = item
-            break # Exit loop after finding the first match
-
-    if found_object:
-        return found_object
-    else:
+    match = character_name_index.resolve(name)
+    if match is None:
         print(f"No object with found with name: {name}")
         return None
+    return match["item"]
 
+def get_all_page_sections(pages: dict[str, tuple[str, bytes | None]], cache: HtmlCache, reparse: bool = False, workers: int | None = None)-> dict[str, dict[str, str | None]]:
+    """
+    {url: sections} for every fetched page. Pages that did not change since the last run reuse
+    their cached parse result (when it comes from the current PARSER_VERSION), the rest are parsed in a
+    process pool and their result is cached.
+    """
+    sections_by_url = {}
+    to_parse = []
+    reused = 0
+    for url, (status, content) in pages.items():
+        if content is None:
+            sections_by_url[url] = {
+                "biography": None,
+                "history": None
+            }
+            continue
+        if status == PAGE_UNCHANGED and not reparse:
+            parsed = cache.get_parsed(url, version=PARSER_VERSION)
+            if parsed is not None:
+                sections_by_url[url] = parsed
+                reused += 1
+                continue
+        to_parse.append(url)
 
-def scrape_and_save_in_json(file_name: str):
+    print(f"Parsing {len(to_parse)} pages, reusing {reused} cached parse results")
+    parsed_list = extract_sections_many([pages[url][1] for url in to_parse], workers=workers)
+    for url, parsed in zip(to_parse, parsed_list):
+        cache.store_parsed(url, parsed, version=PARSER_VERSION)
+        sections_by_url[url] = parsed
+    return sections_by_url
+
+def scrape_and_save_in_json(file_name: str, concurrency: int = DEFAULT_CONCURRENCY, per_host_concurrency: int = DEFAULT_PER_HOST_CONCURRENCY, requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND, cache_dir: str | Path = DEFAULT_HTML_CACHE_DIR, offline: bool = False, reparse: bool = False, workers: int | None = None):
+    """
+    Join character links with details and scrape biography/history of every page.
+    Pages are fetched concurrently first, then parsed in a process pool,
+    the saved list keeps the original order so it is the same as scraping them one by one.
+    Raw HTML is kept in an on-disk cache: re-scrapes send conditional requests and only re-parse
+    pages with new content, offline mode rebuilds everything from the cache without network access.
+    """
+    matched_characters = []
+    fuzzy_matches = []
+    # resolved together: a fuzzy match can only take a detail that no other link matched (exactly or before it)
+    matches = character_name_index.resolve_all([character['Name'] for character in character_json])
+    for character, match in zip(character_json, matches):
+        if match is None:
+            print(f"No object with found with name: {character['Name']}")
+            continue
+        matched_characters.append((match["item"], character['Url']))
+        if match["method"] == MATCH_FUZZY:
+            fuzzy_matches.append(match)
+    character_name_index.print_report(fuzzy_matches=fuzzy_matches)
+
+    cache = HtmlCache(cache_dir=cache_dir)
+    urls = [url for _, url in matched_characters if url is not None]
+    if offline:
+        pages = read_all_cached(urls=urls, cache=cache)
+    else:
+        pages = fetch_all_cached(urls=urls, cache=cache, concurrency=concurrency, per_host_concurrency=per_host_concurrency, requests_per_second=requests_per_second)
+    status_counts = {}
+    for status, content in pages.values():
+        key = status if content is not None else "missing"
+        status_counts[key] = status_counts.get(key, 0) + 1
+    print(f"Pages: {status_counts}")
+
+    sections_by_url = get_all_page_sections(pages=pages, cache=cache, reparse=reparse, workers=workers)
     characters = []
-    for character in tqdm(character_json):
+    for detail, url in matched_characters:
         character_detail = {
             "biography": None,
             "history": None
         }
-        detail = get_character_detail(name=character['Name'])
-        if detail is not None:
-            if character['Url'] is not None:
-                character_detail = scrape_content(url=character['Url'])
-            character_obj = {**detail, **character_detail}
-            characters.append(character_obj)
-    with open(f"../dist/{file_name}.json", "w") as file:
+        if url is not None:
+            character_detail = sections_by_url[url]
+        character_obj = {**detail, **character_detail}
+        characters.append(character_obj)
+    DIST_DIR.mkdir(parents=True, exist_ok=True)
+    with open(DIST_DIR / f"{file_name}.json", "w") as file:
         json.dump(characters, file, indent=4)
     print(f"Successfully saved {len(characters)} entries to {file_name}.json")
 
-scrape_and_save_in_json('lotr_characters')
\ No newline at end of file
+# the guard keeps parser worker processes from re-running the scrape when they import this module
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape LOTR character pages")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="max open requests in total")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST_CONCURRENCY, help="max open requests per host")
+    parser.add_argument("--rps", type=float, default=DEFAULT_REQUESTS_PER_SECOND, help="max request starts per second per host")
+    parser.add_argument("--cache-dir", default=DEFAULT_HTML_CACHE_DIR, help="raw HTML cache directory")
+    parser.add_argument("--offline", action="store_true", help="rebuild the JSON from cached HTML only, no network access")
+    parser.add_argument("--reparse", action="store_true", help="parse every page again even if it did not change")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: one per CPU, 1 parses in-process)")
+    args = parser.parse_args()
+
+    scrape_and_save_in_json('lotr_characters', concurrency=args.concurrency, per_host_concurrency=args.per_host, requests_per_second=args.rps, cache_dir=args.cache_dir, offline=args.offline, reparse=args.reparse, workers=args.workers)
@@ -1,36 +1,60 @@
-from qdrant_client import QdrantClient, models
+from qdrant_client import models
 from dotenv import load_dotenv
+import argparse
 import uuid
 import json
-import requests
 from os import environ
 import tiktoken
 import re
-import time
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+from composables.embedding_client import EmbeddingClient, DEFAULT_JINA_URL
+from composables.run_report import track_run
+from composables.vectors import named_vectors, vectors_config, FULL_VECTOR, SMALL_EMBEDDING_DIMENSION
+from composables.passages import character_passages, PASSAGE_COLLECTION_NAME, PASSAGE_MAX_TOKENS, PARENT_FIELD
+from composables.content_store import content_store, split_payload
+from composables.blue_green import version_name, publish_version, rollback, alias_target, VALIDATION_SAMPLE_SIZE, KEEP_COLLECTION_VERSIONS
+from composables.qdrant_backend import get_qdrant_client, is_remote_backend
+from composables.point_ids import character_ids, known_point_ids
+from composables.snapshots import source_fingerprint, export_snapshot, restore_snapshot, SnapshotError, DEFAULT_SNAPSHOT_DIR
 
 load_dotenv()
 
 QDRANT_URL = environ.get('QDRANT_URL')
 QDRANT_API_KEY = environ.get('QDRANT_API_KEY')
+# alias of the live versioned collection (composables/blue_green.py)
 COLLECTION_NAME = 'lotr-characters'
 EMBEDDING_DIMENSION = 512
 JINA_EMBEDDING_MODEL = "jina-embeddings-v4"
-JINA_URL = "https://api.jina.ai/v1/embeddings"
+JINA_URL = environ.get('JINA_URL', DEFAULT_JINA_URL)
 JINA_API_KEY = environ.get('JINA_API_KEY')
 INDEXING_TASK = "retrieval.passage"
 QUERYING_TASK = "retrieval.query"
 MAX_TOKENS = 8000
+MAX_TOKENS_PER_TEXT = 6000
+MAX_TOKENS_PER_BATCH = 7000
+PASSAGE_UPSERT_BATCH_SIZE = 256
+CHARACTERS_FILE_PATH = Path(__file__).resolve().parent / "assets" / "lotr_characters.json"
+GOLDEN_QUESTIONS_FILE_PATH = Path(__file__).resolve().parent / "assets" / "golden_questions.json"
+# point ids a rebuild keeps (composables/point_ids.py)
+QDRANT_RECORDS_FILE_PATH = Path(__file__).resolve().parent / "assets" / "qdrant_records.json"
 
-# init qdrant
-qd_client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+# init qdrant: remote server, embedded on-disk or in-memory store depending on QDRANT_BACKEND
+qd_client = get_qdrant_client()
 
-tokenizer = tiktoken.get_encoding("cl100k_base")
+# indexing batches are large and billed per token, so they are retried but never hedged
+jina_client = EmbeddingClient(url=JINA_URL, api_key=JINA_API_KEY, model=JINA_EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSION, task=INDEXING_TASK, timeout=120, deadline=300, hedge=False)
 
-# read json file
-with open('./assets/lotr_characters.json', 'r') as file:
-    characters = json.load(file)
+tokenizer = tiktoken.get_encoding("cl100k_base")
 
-print(f"Loaded {len(characters)} entries.")
+def load_characters(file_path: str | Path = CHARACTERS_FILE_PATH)-> list[dict]:
+    with open(file_path, 'r') as file:
+        characters = json.load(file)
+    print(f"Loaded {len(characters)} entries.")
+    return characters
 
 def count_token(text: str)-> int:
     return len(tokenizer.encode(text=text))
@@ -40,26 +64,7 @@ def create_jina_embedding(input_text: str, task = INDEXING_TASK)-> list:
     Create embedding using Jina API
     Returns a single embedding vector (list of floats)
     """
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {JINA_API_KEY}",
-    }
-    data = {
-        "input": [input_text],
-        "model": JINA_EMBEDDING_MODEL,
-        "dimensions": EMBEDDING_DIMENSION,
-        "task": task,
-        "late_chunking": True,
-    }
-    try:
-        res = requests.post(url=JINA_URL, headers=headers, json=data, timeout=30)
-        if res.status_code == 200:
-            embedding = res.json()["data"][0]["embedding"]
-            return embedding
-        else:
-            raise Exception(f"Jina API error: {res.status_code} - {res.text}")
-    except requests.RequestException as e:
-        raise Exception(f"Request failed: {str(e)}")
+    return jina_client.embed_one(input_text, task=task)
     
 def truncate_text_smart(text: str, max_tokens: int = 8000)-> str:
     """
@@ -167,91 +172,86 @@ def create_jina_embedding_batch_safe(input_texts: list, max_token_per_text: int
         safe_text = truncate_text_smart(text=text, max_tokens=max_token_per_text)
         safe_texts.append(safe_text)
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {JINA_API_KEY}",
-    }
-    data = {
-        "input": safe_texts,
-        "model": JINA_EMBEDDING_MODEL,
-        "dimensions": EMBEDDING_DIMENSION,
-        "task": INDEXING_TASK,
-        "late_chunking": True,
-    }
-
-    try:
-        res = requests.post(url=JINA_URL, headers=headers, json=data, timeout=120)
-        if res.status_code == 200:
-            embeddings = [d["embedding"] for d in res.json()["data"]]
-            return embeddings
-        else:
-            raise Exception(f"Jina API error: {res.status_code} - {res.text}")
-    except requests.RequestException as e:
-        raise Exception(f"Request failed: {str(e)}")
+    return jina_client.embed(safe_texts)
 
 
-def reinitiate_collection():
-    is_collection_exist = qd_client.collection_exists(collection_name=COLLECTION_NAME)
+def reinitiate_collection(collection_name: str = COLLECTION_NAME):
+    """Drop and recreate a collection, searches on it fail until it is filled again (see create_collection_version)"""
+    if alias_target(qd_client, collection_name) is not None:
+        raise RuntimeError(f"{collection_name} is an alias of a versioned collection, rebuild it with create_collection_version / publish_collection_version")
+    is_collection_exist = qd_client.collection_exists(collection_name=collection_name)
     if is_collection_exist:
-        qd_client.delete_collection(collection_name=COLLECTION_NAME)
-        print(f"Deleted existing collection: {COLLECTION_NAME}")
-    print(f"Collection {COLLECTION_NAME} didn't exist, creating new one")
+        qd_client.delete_collection(collection_name=collection_name)
+        print(f"Deleted existing collection: {collection_name}")
+    print(f"Collection {collection_name} didn't exist, creating new one")
     qd_client.create_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config=models.VectorParams(
-            size=EMBEDDING_DIMENSION, # Dimensionality of the vectors
-            distance=models.Distance.COSINE # Distance metric for similarity search
-        )
+        collection_name=collection_name,
+        # full 512d vector + its first SMALL_EMBEDDING_DIMENSION dimensions for two-stage search (composables/vectors.py)
+        vectors_config=vectors_config(full_dimension=EMBEDDING_DIMENSION, small_dimension=SMALL_EMBEDDING_DIMENSION),
+        # payloads are read only for the hits returned, not during the vector search
+        on_disk_payload=True
     )
     print("Created the new collection")
 
 
-"""
-strategy: adaptive batching:
-- Add texts to the current batch until you're near the token budget.
-- If adding the next text would exceed the budget, start a new batch.
-- For very large texts that nearly hit the limit on their own → process them individually.
-"""
+def create_collection_version()-> str:
+    """New empty versioned collection for a blue/green rebuild, the live one keeps serving COLLECTION_NAME"""
+    collection_name = version_name(COLLECTION_NAME)
+    reinitiate_collection(collection_name=collection_name)
+    return collection_name
 
-def upsert_to_qdrant_adaptive(max_tokens_per_batch: int = 7000, max_tokens_per_text: int = 6000):
-    """
-    Upsert to Qdrant with dynamic batch sizing based on token usage.
-    Each batch is sized to stay under max_tokens_per_batch.
-    Individual texts that nearly hit the limit are embedded one by one.
-    """
 
-    # Calculate delay between requests to stay under rate limit
-    requests_per_minute=400
-    delay_seconds = 60.0 / requests_per_minute
+def golden_query_probes(sample_size: int = VALIDATION_SAMPLE_SIZE, file_path: str | Path = GOLDEN_QUESTIONS_FILE_PATH)-> list[dict]:
+    """First question of `sample_size` golden entries (a fixed sample) with their query embeddings"""
+    if sample_size <= 0 or not Path(file_path).exists():
+        return []
+    with open(file_path, 'r') as file:
+        golden_questions = json.load(file)
+    sample = golden_questions[::max(len(golden_questions) // sample_size, 1)][:sample_size]
+    embeddings = jina_client.embed([entry["questions"][0] for entry in sample], task=QUERYING_TASK)
+    return [{"id": entry["id"], "embedding": embedding} for entry, embedding in zip(sample, embeddings)]
+
 
-    if not qd_client.collection_exists(collection_name=COLLECTION_NAME):
-        print(f'Collection {COLLECTION_NAME} does not exist.')
-        return
-    # prepare safe character texts
+def publish_collection_version(collection_name: str, expected_points: int, keep: int = KEEP_COLLECTION_VERSIONS)-> dict:
+    """Validate a rebuilt version and move the COLLECTION_NAME alias to it, raises ValidationError otherwise"""
+    report = publish_version(qd_client, alias=COLLECTION_NAME, collection_name=collection_name, expected_points=expected_points, probes=golden_query_probes(), keep=keep, store=content_store)
+    print(f"Published {collection_name}: {report['points']} points" + (f", golden query hit rate {report['hit_rate']:.2f}" if "hit_rate" in report else ""))
+    return report
+
+
+def prepare_character_texts(characters: list[dict], max_tokens_per_text: int = 6000)-> list[dict]:
+    """
+    Embedding text of every character with its token count and point id, shortest first
+    (more likely to fill batches efficiently).
+    """
     print("Preparing safe character texts...")
     prepared_data = []
-    for character in characters:
+    for character, character_id in zip(characters, character_ids(characters, known_ids=known_point_ids(QDRANT_RECORDS_FILE_PATH))):
         try:
             text = create_character_text_safe(character=character, max_tokens=max_tokens_per_text)
             token_count = count_token(text)
             prepared_data.append({
+                "id": character_id,
                 "character": character,
                 "text": text,
                 "token_count": token_count
             })
         except Exception as e:
             print(f"Error preparing text for {character.get('name', 'Unknown')}: {str(e)}")
-    
-    if not prepared_data:
-        print("No valid character data to process")
-        return
-    
-    print(f"Prepared {len(prepared_data)} characters for processing")
 
-    # Sort shortest first → more likely to fill batches efficiently
+    print(f"Prepared {len(prepared_data)} characters for processing")
     prepared_data.sort(key=lambda x: x['token_count'])
+    return prepared_data
 
-    # build dynamic batches
+
+"""
+strategy: adaptive batching:
+- Add texts to the current batch until you're near the token budget.
+- If adding the next text would exceed the budget, start a new batch.
+- For very large texts that nearly hit the limit on their own → process them individually.
+"""
+
+def build_token_batches(prepared_data: list[dict], max_tokens_per_batch: int = 7000)-> list[list[dict]]:
     batches = []
     current_batch = []
     current_tokens = 0
@@ -279,12 +279,18 @@ def upsert_to_qdrant_adaptive(max_tokens_per_batch: int = 7000, max_tokens_per_t
 
     if current_batch:
         batches.append(current_batch)
-    
+
     print(f"built {len(batches)} batches for processing")
-    
-    # process batches and collect points
-    all_points = []
-    total_processed = 0
+    return batches
+
+
+def embed_batches(batches: list[list[dict]], max_tokens_per_text: int = 6000)-> list[dict]:
+    """
+    Embed every batch, falling back to one request per text when a batch fails.
+    Returns the prepared entries that got an embedding, with an "embedding" field added.
+    Requests are paced by the shared Jina rate limiter (requests and tokens per minute).
+    """
+    embedded = []
 
     for batch_num, batch in enumerate(batches, start=1):
         texts = [e['text'] for e in batch]
@@ -293,43 +299,130 @@ def upsert_to_qdrant_adaptive(max_tokens_per_batch: int = 7000, max_tokens_per_t
 
         try:
             embeddings = create_jina_embedding_batch_safe(texts, max_token_per_text=max_tokens_per_text)
-            time.sleep(delay_seconds)
         except Exception as batch_error:
             print(f"batch {batch_num} failed: {str(batch_error)}")
             # fallback: process individually
             embeddings = []
-            
+
             for entry in batch:
                 try:
                     emb = create_jina_embedding(entry['text'])
                     embeddings.append(emb)
                 except Exception as e:
-                    print(f"failed individual embedding for {entry['character'].get('name', 'Unknown')}: {str(e)}")
+                    print(f"failed individual embedding for {entry.get('name') or entry['character'].get('name', 'Unknown')}: {str(e)}")
                     embeddings.append(None)
-                
-        # convert to qdrant points
+
         for entry, embedding in zip(batch, embeddings):
             if embedding is not None:
-                point = models.PointStruct(
-                    id=uuid.uuid4().hex,
-                    vector=embedding,
-                    payload={
-                        **entry["character"],
-                        "embedded_text": entry["text"],
-                        "token_count": entry["token_count"]
-                    }
-                )
-                all_points.append(point)
-                total_processed += 1
-    # final upsert in one shot
-    if all_points:
+                embedded.append({**entry, "embedding": embedding})
+    return embedded
+
+
+def upsert_points(embedded: list[dict], total: int | None = None, collection_name: str = COLLECTION_NAME)-> int:
+    """Convert embedded entries to qdrant points and upsert them in one shot, returns the number upserted"""
+    if not embedded:
+        print("no valid embeddings to upsert")
+        return 0
+    points = []
+    content = {}
+    for entry in embedded:
+        # biography, history and the embedded text go to the local content store, qdrant keeps the small fields
+        payload, content[entry["id"]] = split_payload({**entry["character"], "embedded_text": entry["text"]})
+        points.append(models.PointStruct(
+            id=entry["id"],
+            vector=named_vectors(entry["embedding"], small_dimension=SMALL_EMBEDDING_DIMENSION),
+            payload={**payload, "token_count": entry["token_count"]}
+        ))
+    # a new version's content stays out of the live store until the version is published (composables/blue_green.py)
+    store = content_store if collection_name == COLLECTION_NAME else content_store.for_version(collection_name)
+    try:
+        store.put_many(content)
+        qd_client.upsert(collection_name=collection_name, points=points)
+        print(f"successfully upserted {len(points)}/{total if total is not None else len(points)} entries to qdrant")
+        return len(points)
+    except Exception as e:
+        print(f"final upsert failed: {str(e)}")
+        return 0
+    finally:
+        if store is not content_store:
+            store.close()
+
+
+def upsert_to_qdrant_adaptive(characters: list[dict], max_tokens_per_batch: int = 7000, max_tokens_per_text: int = 6000, collection_name: str = COLLECTION_NAME, prepared_data: list[dict] | None = None)-> int:
+    """
+    Upsert to Qdrant with dynamic batch sizing based on token usage.
+    Each batch is sized to stay under max_tokens_per_batch.
+    Individual texts that nearly hit the limit are embedded one by one.
+    prepared_data (prepare_character_texts of the characters) is prepared here when not given.
+    """
+    if not qd_client.collection_exists(collection_name=collection_name):
+        print(f'Collection {collection_name} does not exist.')
+        return 0
+    with track_run("ingest", collection=collection_name, max_tokens_per_batch=max_tokens_per_batch) as report:
+        if prepared_data is None:
+            prepared_data = prepare_character_texts(characters=characters, max_tokens_per_text=max_tokens_per_text)
+        if not prepared_data:
+            print("No valid character data to process")
+            return 0
+        batches = build_token_batches(prepared_data=prepared_data, max_tokens_per_batch=max_tokens_per_batch)
+        embedded = embed_batches(batches=batches, max_tokens_per_text=max_tokens_per_text)
+        upserted = upsert_points(embedded=embedded, total=len(prepared_data), collection_name=collection_name)
+        report.add_items(upserted)
+        return upserted
+
+
+def prepare_passage_texts(characters: list[dict], max_tokens_per_passage: int = PASSAGE_MAX_TOKENS)-> list[dict]:
+    """Profile, biography and history passages of every character, nothing truncated (see composables/passages.py)"""
+    prepared_data = []
+    for character, character_id in zip(characters, character_ids(characters, known_ids=known_point_ids(QDRANT_RECORDS_FILE_PATH))):
+        # qdrant returns point ids in dashed form, grouped results must compare equal to them
+        prepared_data.extend(character_passages(character=character, character_id=str(uuid.UUID(character_id)), max_tokens=max_tokens_per_passage, count_tokens=count_token))
+    print(f"Prepared {len(prepared_data)} passages of {len(characters)} characters")
+    return prepared_data
+
+
+def reinitiate_passage_collection():
+    if qd_client.collection_exists(collection_name=PASSAGE_COLLECTION_NAME):
+        qd_client.delete_collection(collection_name=PASSAGE_COLLECTION_NAME)
+        print(f"Deleted existing collection: {PASSAGE_COLLECTION_NAME}")
+    qd_client.create_collection(
+        collection_name=PASSAGE_COLLECTION_NAME,
+        vectors_config=vectors_config(full_dimension=EMBEDDING_DIMENSION, small_dimension=SMALL_EMBEDDING_DIMENSION)
+    )
+    # grouped searches group by the parent character
+    qd_client.create_payload_index(collection_name=PASSAGE_COLLECTION_NAME, field_name=PARENT_FIELD, field_schema=models.PayloadSchemaType.KEYWORD)
+    print(f"Created collection {PASSAGE_COLLECTION_NAME}")
+
+
+def upsert_passage_points(embedded: list[dict])-> int:
+    """Upsert embedded passages in chunks, returns the number upserted"""
+    upserted = 0
+    for start in range(0, len(embedded), PASSAGE_UPSERT_BATCH_SIZE):
+        points = [
+            models.PointStruct(
+                id=entry["id"],
+                vector=named_vectors(entry["embedding"], small_dimension=SMALL_EMBEDDING_DIMENSION),
+                payload={field: entry[field] for field in (PARENT_FIELD, "name", "section", "passage_index", "passage", "token_count")}
+            )
+            for entry in embedded[start:start + PASSAGE_UPSERT_BATCH_SIZE]
+        ]
         try:
-            qd_client.upsert(collection_name=COLLECTION_NAME, points=all_points)
-            print(f"successfully upserted {total_processed}/{len(prepared_data)} entries to qdrant")
+            qd_client.upsert(collection_name=PASSAGE_COLLECTION_NAME, points=points)
+            upserted += len(points)
         except Exception as e:
-            print(f"final upsert failed: {str(e)}")
-    else:
-        print("no valid embeddings to upsert")
+            print(f"passage upsert failed at {start}: {str(e)}")
+    print(f"successfully upserted {upserted}/{len(embedded)} passages to qdrant")
+    return upserted
+
+
+def index_passages(characters: list[dict], max_tokens_per_batch: int = 7000, max_tokens_per_passage: int = PASSAGE_MAX_TOKENS):
+    """Build the passage collection next to the character collection (grouped search needs both)"""
+    with track_run("ingest_passages", collection=PASSAGE_COLLECTION_NAME, max_tokens_per_passage=max_tokens_per_passage) as report:
+        prepared_data = prepare_passage_texts(characters=characters, max_tokens_per_passage=max_tokens_per_passage)
+        batches = build_token_batches(prepared_data=prepared_data, max_tokens_per_batch=max_tokens_per_batch)
+        embedded = embed_batches(batches=batches, max_tokens_per_text=MAX_TOKENS)
+        reinitiate_passage_collection()
+        report.add_items(upsert_passage_points(embedded=embedded))
 
 
 def search(query: str, limit: int = 1):
@@ -343,6 +436,7 @@ def search(query: str, limit: int = 1):
         query_points = qd_client.query_points(
             collection_name=COLLECTION_NAME,
             query=query_embedding,
+            using=FULL_VECTOR,
             limit=limit,
             with_payload=True
         )
@@ -364,6 +458,7 @@ def search_with_score_threshold(query: str, limit: int = 5, score_threshold: flo
         query_points = qd_client.query_points(
             collection_name=COLLECTION_NAME,
             query=query_embedding,
+            using=FULL_VECTOR,
             limit=limit,
             with_payload=True,
             score_threshold=score_threshold
@@ -375,5 +470,68 @@ def search_with_score_threshold(query: str, limit: int = 5, score_threshold: flo
         return None
     
 
-reinitiate_collection()
-upsert_to_qdrant_adaptive()
\ No newline at end of file
+def snapshot_fingerprint(characters_file_path: str | Path = CHARACTERS_FILE_PATH)-> str:
+    """What the character collection is built from: the characters file and every setting that changes its points"""
+    return source_fingerprint(source_files=[characters_file_path], params={
+        "model": JINA_EMBEDDING_MODEL,
+        "dimensions": EMBEDDING_DIMENSION,
+        "task": INDEXING_TASK,
+        "max_tokens_per_text": MAX_TOKENS_PER_TEXT,
+        # late chunking makes embeddings depend on the batch composition
+        "max_tokens_per_batch": MAX_TOKENS_PER_BATCH,
+        "small_dimension": SMALL_EMBEDDING_DIMENSION
+    })
+
+
+def create_snapshot(snapshot_dir: str | Path = DEFAULT_SNAPSHOT_DIR)-> dict:
+    """Export the live character collection, it has to be built from the current characters file"""
+    if not is_remote_backend():
+        raise SnapshotError("snapshots are exported from a Qdrant server, QDRANT_BACKEND=local keeps its data in QDRANT_PATH already")
+    return export_snapshot(qd_client, url=QDRANT_URL, api_key=QDRANT_API_KEY, alias=COLLECTION_NAME, fingerprint=snapshot_fingerprint(), snapshot_dir=snapshot_dir)
+
+
+def restore_from_snapshot(snapshot_dir: str | Path = DEFAULT_SNAPSHOT_DIR)-> bool:
+    """Restore the character collection from a matching snapshot, False (with the reason printed) when there is none"""
+    try:
+        if not is_remote_backend():
+            raise SnapshotError("snapshots are restored into a Qdrant server (QDRANT_BACKEND=remote)")
+        restore_snapshot(qd_client, url=QDRANT_URL, api_key=QDRANT_API_KEY, alias=COLLECTION_NAME, fingerprint=snapshot_fingerprint(), snapshot_dir=snapshot_dir)
+        return True
+    except SnapshotError as e:
+        print(f"Not restoring from snapshot: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the qdrant collections and upsert the characters")
+    parser.add_argument("--passages", action="store_true", help="also build the passage collection used by SEARCH_GRANULARITY=passage")
+    parser.add_argument("--in-place", action="store_true", help="drop and refill the collection itself instead of a blue/green rebuild (searches fail meanwhile)")
+    parser.add_argument("--rollback", action="store_true", help="point the alias back to the previous version and exit")
+    parser.add_argument("--keep", type=int, default=KEEP_COLLECTION_VERSIONS, help="versions kept after a rebuild, live one included")
+    parser.add_argument("--restore-snapshot", action="store_true", help="load the snapshot bundle instead of embedding when it matches the characters file and settings")
+    parser.add_argument("--create-snapshot", action="store_true", help="export a snapshot bundle of the live character collection")
+    parser.add_argument("--no-build", action="store_true", help="only the snapshot steps, fail when --restore-snapshot finds no matching snapshot")
+    parser.add_argument("--snapshot-dir", default=DEFAULT_SNAPSHOT_DIR, help="where snapshot bundles are kept")
+    args = parser.parse_args()
+    if args.rollback:
+        print(f"{COLLECTION_NAME} rolled back to {rollback(qd_client, alias=COLLECTION_NAME, store=content_store)}")
+        sys.exit(0)
+    restored = args.restore_snapshot and restore_from_snapshot(snapshot_dir=args.snapshot_dir)
+    if args.restore_snapshot and not restored and args.no_build:
+        sys.exit(1)
+    characters = load_characters() if not args.no_build else []
+    if not restored and not args.no_build:
+        if args.in_place:
+            reinitiate_collection()
+            upsert_to_qdrant_adaptive(characters=characters, max_tokens_per_batch=MAX_TOKENS_PER_BATCH, max_tokens_per_text=MAX_TOKENS_PER_TEXT)
+        else:
+            version = create_collection_version()
+            prepared_data = prepare_character_texts(characters=characters, max_tokens_per_text=MAX_TOKENS_PER_TEXT)
+            upsert_to_qdrant_adaptive(characters=characters, max_tokens_per_batch=MAX_TOKENS_PER_BATCH, max_tokens_per_text=MAX_TOKENS_PER_TEXT, collection_name=version, prepared_data=prepared_data)
+            # every prepared text has to make it into the new version, not just what was upserted
+            publish_collection_version(collection_name=version, expected_points=len(prepared_data), keep=args.keep)
+    # a restored collection is the snapshot itself, there is nothing new to export
+    if args.create_snapshot and not restored:
+        create_snapshot(snapshot_dir=args.snapshot_dir)
+    if args.passages and not args.no_build:
+        index_passages(characters=characters)
@@ -0,0 +1,43 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from composables.embedding_batcher import EmbeddingBatcher
+
+CALL_SECONDS = 0.1
+
+
+class SlowClient:
+    """Stand-in for EmbeddingClient: every call takes CALL_SECONDS, well within its deadline"""
+    late_chunking = False
+    task = "retrieval.query"
+    deadline = CALL_SECONDS * 2
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def embed(self, texts: list[str], task: str | None = None)-> list[list[float]]:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(CALL_SECONDS)
+        with self._lock:
+            self.in_flight -= 1
+        return [[float(len(text))] for text in texts]
+
+
+def test_batches_queued_behind_max_in_flight_do_not_time_out():
+    client = SlowClient()
+    # one text per batch, one batch at a time: the last caller waits for every batch ahead of it,
+    # far longer than the client deadline
+    batcher = EmbeddingBatcher(client, max_wait_ms=1, max_batch_size=1, max_in_flight=1)
+    texts = [f"query {'x' * length}" for length in range(6)]
+    with ThreadPoolExecutor(max_workers=len(texts)) as executor:
+        vectors = list(executor.map(batcher.embed_one, texts))
+
+    assert vectors == [[float(len(text))] for text in texts]
+    assert client.max_in_flight == 1
+    assert batcher.metrics()["batches"] == len(texts)
+    assert batcher.metrics()["queue_delay_p95_ms"] > client.deadline * 1000
@@ -0,0 +1,41 @@
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+
+# setup_qdrant.prepare_character_texts run the way the worker container runs it: src/ mounted at /scripts,
+# composables/ at /composables, the script started from /scripts. Dummy keys and the byte tokenizer of the
+# benchmarks keep it offline.
+PREPARE_IN_CONTAINER = """
+import json, os, sys
+for key in ("OPENAI_API_KEY", "JINA_API_KEY"):
+    os.environ.setdefault(key, "test")
+sys.path.append(sys.argv[1])
+from benchmarks.cases import use_offline_tokenizer
+use_offline_tokenizer()
+sys.path.insert(0, "scripts")
+import setup_qdrant
+with open(setup_qdrant.CHARACTERS_FILE_PATH) as file:
+    characters = json.load(file)
+prepared = setup_qdrant.prepare_character_texts(characters=characters)
+print(json.dumps({"records_file": str(setup_qdrant.QDRANT_RECORDS_FILE_PATH), "ids": {item["character"]["name"]: item["id"] for item in prepared}}))
+"""
+
+
+def test_character_ids_in_container_layout(tmp_path):
+    shutil.copytree(project_root / "src", tmp_path / "scripts", ignore=shutil.ignore_patterns("__pycache__"))
+    shutil.copytree(project_root / "composables", tmp_path / "composables", ignore=shutil.ignore_patterns("__pycache__"))
+    result = subprocess.run([sys.executable, "-c", PREPARE_IN_CONTAINER, str(project_root)], cwd=tmp_path, capture_output=True, text=True, check=True)
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert Path(output["records_file"]).parent.parent == tmp_path / "scripts"
+    with open(project_root / "src" / "assets" / "qdrant_records.json") as file:
+        records = json.load(file)
+    exported = {}
+    for record in records:
+        exported.setdefault(record["payload"]["name"], str(record["id"]))
+    kept = {name: point_id for name, point_id in output["ids"].items() if name in exported}
+    assert kept and kept == {name: exported[name] for name in kept}